@@ -0,0 +1,58 @@
+"""Measure the client-side CPU cost of building LLM requests and rendering docstrings.
+
+Usage:
+    python -m benchmarks.bench_client_overhead [--number 20000]
+"""
+import argparse
+import json
+import os
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from docgen.docstrings import add_indentation, build_function_docstring_from_object, calculate_indentation, render_function_docstring
+from docgen.llm import build_chat_request, build_function_docstring_request, FUNCTION_DOCSTRING_TOOL_DESCRIPTION
+from docgen.pydantic_models import FunctionDocstring, FunctionPrompt
+from docgen.system_prompts import FUNCTION_DOCSTRING_SYSTEM_PROMPT
+
+CODE = "def foo(x, y):\n" + "".join(f"    z{i} = bar{i % 20}(x, y)\n" for i in range(50)) + "    return z0"
+USED_FUNCTIONS = [(f"bar{i}", f"Summary of bar{i}, which does something useful with x and y.") for i in range(20)]
+DOCSTRING = FunctionDocstring(
+    function_name="foo",
+    summary="Summary of foo",
+    description="A longer description of foo.",
+    parameters=[f"x{i}: parameter {i}" for i in range(10)],
+    returns="int",
+    raises=["ValueError"],
+    example="foo(1, 2)\nfoo(3, 4)",
+)
+
+
+def uncached_request() -> dict:
+    """Build a request the way it was built before the schemas were precomputed."""
+    prompt = FunctionPrompt(code=CODE, used_functions=USED_FUNCTIONS).build_prompt()
+    return build_chat_request(
+            FUNCTION_DOCSTRING_SYSTEM_PROMPT,
+            prompt,
+            "FunctionDocstring",
+            FUNCTION_DOCSTRING_TOOL_DESCRIPTION,
+            FunctionDocstring.model_json_schema()
+    )
+
+
+def report(name: str, statement, number: int) -> None:
+    seconds = min(timeit.repeat(statement, number=number, repeat=3)) / number
+    print(f"{name:<40} {seconds * 1e6:8.2f} us/call {1 / seconds:12,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the client-side CPU cost of building LLM requests")
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    report("request, schema rebuilt per call", uncached_request, args.number // 10)
+    report("request, precomputed schema", lambda: build_function_docstring_request(CODE, USED_FUNCTIONS), args.number)
+    report("request + json serialisation", lambda: json.dumps(build_function_docstring_request(CODE, USED_FUNCTIONS)), args.number)
+    report("render function docstring", lambda: build_function_docstring_from_object(DOCSTRING), args.number)
+    report("render + regex indentation", lambda: add_indentation('"""' + build_function_docstring_from_object(DOCSTRING) + '"""', calculate_indentation(CODE)), args.number)
+    report("render with offset indentation", lambda: render_function_docstring(DOCSTRING, "    ", "    "), args.number)
@@ -0,0 +1,45 @@
+"""Measure removing the docstring of very long functions with the tokenizer against the previous regex.
+
+Usage:
+    python -m benchmarks.bench_docstring_removal [--lines 5000] [--number 20]
+"""
+import argparse
+import os
+import re
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from docgen.functions import remove_current_docstring_from_source_code
+
+
+def regex_removal(function_code: str) -> str:
+    """Remove the docstring the way it was removed before the tokenizer was used."""
+    return re.sub(r'\n\s+\"\"\"(.|\n)*\"\"\"', '', function_code)
+
+
+def build_function(lines: int, docstring: bool, literals: bool) -> str:
+    body = "".join(
+        f'    x{i} = """literal {i}"""\n' if literals and i % 10 == 0 else f"    x{i} = bar(x{i - 1})\n"
+        for i in range(1, lines)
+    )
+    return "def foo(x0):\n" + ('    """Summary of foo\n\n    Description of foo.\n    """\n' if docstring else "") + body
+
+
+def report(name: str, statement, number: int) -> None:
+    seconds = min(timeit.repeat(statement, number=number, repeat=3)) / number
+    print(f"{name:<50} {seconds * 1e3:10.3f} ms/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure docstring removal on very long functions")
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    for docstring, literals in ((True, False), (False, False), (True, True)):
+        code = build_function(args.lines, docstring, literals)
+        name = f"{args.lines} lines, docstring={docstring}, literals={literals}"
+        # the regex also swallows every later string literal, so it is timed but its output is not comparable
+        report(f"regex    {name}", lambda: regex_removal(code), args.number)
+        report(f"tokenize {name}", lambda: remove_current_docstring_from_source_code(code), args.number)
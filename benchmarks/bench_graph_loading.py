@@ -0,0 +1,55 @@
+"""Measure loading a large dependency graph from pydeps JSON, the streaming loader, the binary cache and GML.
+
+Usage:
+    python -m benchmarks.bench_graph_loading [--modules 50000] [--imports 5]
+"""
+import argparse
+import json
+import networkx as nx
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from docgen.dependencies import build_graph_from_json, build_graph_from_json_stream, load_graph_cache, save_graph_cache
+
+
+def write_deps(file_path: str, modules: int, imports: int) -> None:
+    rng = random.Random(0)
+    deps = {
+        f"pkg.m{i}": {
+            "name": f"pkg.m{i}",
+            "path": f"/src/pkg/m{i}.py",
+            "bacon": 1,
+            "imports": [f"pkg.m{j}" for j in rng.sample(range(i), min(i, imports))],
+        }
+        for i in range(modules)
+    }
+    with open(file_path, "w") as f:
+        json.dump(deps, f, indent=4)
+
+
+def report(name: str, function) -> nx.DiGraph:
+    start = time.perf_counter()
+    result = function()
+    print(f"{name:<30} {(time.perf_counter() - start) * 1e3:10.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure dependency graph loading")
+    parser.add_argument("--modules", type=int, default=50000)
+    parser.add_argument("--imports", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        deps_file = os.path.join(tmp_dir, "deps.json")
+        write_deps(deps_file, args.modules, args.imports)
+        G = report("json.load", lambda: build_graph_from_json(deps_file))
+        report("streaming json", lambda: build_graph_from_json_stream(deps_file))
+        save_graph_cache(G, os.path.join(tmp_dir, "graph"))
+        report("binary cache", lambda: load_graph_cache(os.path.join(tmp_dir, "graph")))
+        nx.write_gml(G, os.path.join(tmp_dir, "graph.gml"))
+        report("gml", lambda: nx.read_gml(os.path.join(tmp_dir, "graph.gml")))
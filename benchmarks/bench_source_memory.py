@@ -0,0 +1,77 @@
+"""Measure the time and peak memory of splicing function docstrings into a generated multi-megabyte module.
+
+The splice through the line index of the module is compared against the previous approach, which extracted each
+function with `ast.get_source_segment` and replaced it in the whole module with `str.replace`. That splits the whole module into lines in Python for every function, so it is only run for the
+first `--baseline` functions.
+
+Usage:
+    python -m benchmarks.bench_source_memory [--functions 2000] [--lines 30] [--baseline 2]
+"""
+import argparse
+import ast
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from docgen.functions import set_function_docstring
+from docgen.modules import get_all_internal_functions, insert_function_docstrings
+from docgen.pydantic_models import FunctionDocstring
+from docgen.sources import open_source
+
+
+def build_module(functions: int, lines: int) -> str:
+    body = "".join(f"    x{j} = bar(x{j - 1}, 'ünïcode {j}')\n" for j in range(1, lines))
+    return "".join(
+        f'def foo{i}(x0):\n    """Old docstring of foo{i}."""\n{body}    return x{lines - 1}\n\n'
+        for i in range(functions)
+    )
+
+
+def replace_each_function(source_code: str, docstrings: list[tuple[ast.FunctionDef, FunctionDocstring]]) -> str:
+    """Insert the docstrings the way they were inserted before the line index was used."""
+    new_source_code = source_code
+    for function, docstring_obj in docstrings:
+        function_code = ast.get_source_segment(source_code, function)
+        new_source_code = new_source_code.replace(function_code, set_function_docstring(function_code, function, docstring_obj)) # type: ignore
+    return new_source_code
+
+
+def measure(name: str, size: int, statement) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    statement()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<30} {seconds:8.2f} s {peak / 2 ** 20:10.1f} MiB peak ({peak / size:.1f}x the module)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure splicing docstrings into a huge module")
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=30)
+    parser.add_argument("--baseline", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "huge.py")
+        with open(path, "w") as f:
+            f.write(build_module(args.functions, args.lines))
+        size = os.path.getsize(path)
+        print(f"{args.functions} functions of {args.lines} lines, {size / 2 ** 20:.1f} MiB")
+
+        with open(path) as f:
+            source_code = f.read()
+        docstrings = [
+            (function, FunctionDocstring(function_name=name, summary=f"New {name}.", description="Desc."))
+            for name, function in get_all_internal_functions(ast.parse(source_code))
+        ]
+        baseline = docstrings[:args.baseline]
+        measure(f"replace, {len(baseline)} functions", size, lambda: replace_each_function(source_code, baseline))
+        del source_code
+
+        with open_source(path) as index:
+            measure(f"splice, {len(docstrings)} functions", size, lambda: insert_function_docstrings(index, docstrings))
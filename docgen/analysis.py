@@ -0,0 +1,138 @@
+"""This module contains functions for analysing modules ahead of docstring generation, optionally across processes."""
+import ast
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from docgen.imports import get_module_imports
+from docgen.pydantic_models import FunctionAnalysis, ModuleAnalysis
+
+
+def resolve_call(
+        call: ast.Call,
+        module_name: str,
+        internal_functions: set[str],
+        imported_functions: dict[str, str]
+) -> str | None:
+    """Resolve a call to the fully qualified name of a function in the package.
+
+    Follows the same rules as `docgen.functions.handle_call`, but returns the name of the callee instead of its summary.
+
+    Args:
+        call: The call AST object.
+        module_name: The fully qualified name of the module containing the call.
+        internal_functions: The names of the functions defined in the module.
+        imported_functions: The dictionary of imported functions from other modules in the package.
+
+    Returns:
+        The fully qualified name of the function called. None if the callee is not a function in the package.
+    """
+    func = call.func
+    if isinstance(func, ast.Name) and func.id in imported_functions:
+        return imported_functions[func.id]
+
+    if isinstance(func, ast.Name) and func.id in internal_functions:
+        return module_name + '.' + func.id
+
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Call):
+        return resolve_call(func.value, module_name, internal_functions, imported_functions)
+
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in imported_functions:
+        return imported_functions[func.value.id] + '.' + func.attr
+
+    return None
+
+
+def analyze_source(source_code: str, file_path: str, module_name: str, imported_modules: list[str]) -> ModuleAnalysis:
+    """Analyse the source code of a module.
+
+    Args:
+        source_code: The source code of the module.
+        file_path: The path to the module.
+        module_name: The fully qualified name of the module.
+        imported_modules: The fully qualified names of the package modules imported by the module.
+
+    Returns:
+        The function spans, resolved calls and imports of the module.
+    """
+    tree = ast.parse(source_code)
+    package_name = ".".join(module_name.split(".")[:-1])
+    imported_functions = get_module_imports(tree, set(imported_modules), package_name)
+    function_nodes = [node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+    internal_names = {node.name for node in function_nodes}
+
+    functions = []
+    for node in function_nodes:
+        calls = []
+        for child in ast.walk(node):
+            if not isinstance(child, ast.Call):
+                continue
+            callee = resolve_call(child, module_name, internal_names, imported_functions)
+            if callee and callee not in calls:
+                calls.append(callee)
+        functions.append(FunctionAnalysis(
+            name=node.name,
+            lineno=node.lineno,
+            end_lineno=node.end_lineno or node.lineno,
+            col_offset=node.col_offset,
+            calls=calls
+        ))
+
+    return ModuleAnalysis(module_name=module_name, file_path=file_path, imports=imported_functions, functions=functions)
+
+
+def analyze_module(job: tuple[str, str, list[str]]) -> ModuleAnalysis:
+    """Read and analyse a single module. This is the unit of work sent to the process pool.
+
+    Args:
+        job: The path to the module, its fully qualified name and the package modules it imports.
+
+    Returns:
+        The analysis of the module.
+    """
+    file_path, module_name, imported_modules = job
+    with open(file_path, "r") as f:
+        source_code = f.read()
+    return analyze_source(source_code, file_path, module_name, imported_modules)
+
+
+def calculate_chunksize(n_jobs: int, max_workers: int) -> int:
+    """Calculate how many modules to send to a worker per submission.
+
+    Aims for roughly four chunks per worker so that the work is balanced without paying IPC overhead per module.
+
+    Args:
+        n_jobs: The number of modules to analyse.
+        max_workers: The number of worker processes.
+
+    Returns:
+        The number of modules per chunk.
+    """
+    return max(1, n_jobs // (max_workers * 4))
+
+
+def analyze_modules(
+        jobs: list[tuple[str, str, list[str]]],
+        max_workers: int | None = None,
+        chunksize: int | None = None
+) -> dict[str, ModuleAnalysis]:
+    """Analyse many modules in parallel using a process pool.
+
+    Args:
+        jobs: The path, fully qualified name and imported package modules for each module.
+        max_workers: The number of worker processes. Defaults to the number of CPUs. If 1, the analysis runs in this process.
+        chunksize: The number of modules sent to a worker per submission. Calculated from the number of jobs if not given.
+
+    Returns:
+        A dictionary mapping the path of each module to its analysis.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(jobs) <= 1:
+        return {job[0]: analyze_module(job) for job in jobs}
+
+    chunksize = chunksize or calculate_chunksize(len(jobs), max_workers)
+    logging.info(f"Analysing {len(jobs)} modules with {max_workers} processes (chunksize={chunksize})")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        analyses = executor.map(analyze_module, jobs, chunksize=chunksize)
+        return {job[0]: analysis for job, analysis in zip(jobs, analyses)}
@@ -0,0 +1,444 @@
+"""Generate docstrings for an entire python package through a provider batch API, one dependency wave at a time."""
+import argparse
+import ast
+import functools
+import json
+import logging
+import networkx as nx
+import shutil
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from pydantic import BaseModel
+from typing import Callable, Optional
+
+from docgen.dedup import DocstringCache, fingerprint_function
+from docgen.dependencies import get_module_generations, load_graph
+from docgen.docgen import file_path_to_module_name, get_imported_modules
+from docgen.exceptions import BatchFailedError, InternalFunctionCalledError
+from docgen.functions import get_used_functions, prepare_function_for_llm
+from docgen.imports import get_module_imports
+from docgen import llm
+from docgen.llm import build_function_docstring_request, build_module_docstring_request, build_repair_request
+from docgen.modules import (
+        find_if_name_main,
+        get_all_internal_functions,
+        insert_function_docstrings,
+        replace_top_level_docstring
+)
+from docgen.docstrings import build_module_docstring_from_object
+from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
+from docgen.validation import CompiledSchema, check_function_docstring, validate_tool_output
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def write_batch_file(requests: dict[str, dict], file_path: str | Path) -> None:
+    """Write chat completion requests to a JSONL batch input file.
+
+    Args:
+        requests: The request bodies keyed by their custom id.
+        file_path: The path of the batch input file.
+    """
+    with open(file_path, "w") as f:
+        for custom_id, body in requests.items():
+            f.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}) + "\n")
+
+
+def read_batch_file(file_path: str | Path) -> dict[str, dict]:
+    """Read the requests from a JSONL batch input file.
+
+    Args:
+        file_path: The path of the batch input file.
+
+    Returns:
+        The request bodies keyed by their custom id.
+    """
+    with open(file_path) as f:
+        return {line["custom_id"]: line["body"] for line in map(json.loads, f) if line}
+
+
+def read_batch_results(file_path: str | Path) -> dict[str, str]:
+    """Read the tool call arguments from a JSONL batch output file.
+
+    Requests which failed are left out, so that they can be resubmitted in the next batch.
+
+    Args:
+        file_path: The path of the batch output file.
+
+    Returns:
+        The tool call arguments keyed by the custom id of the request.
+    """
+    results = {}
+    with open(file_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                logging.warning(f"Batch request {result['custom_id']} failed: {result.get('error')}")
+                continue
+            message = response["body"]["choices"][0]["message"]
+            results[result["custom_id"]] = message["tool_calls"][0]["function"]["arguments"]
+    return results
+
+
+class LocalBatchBackend:
+    """A stand-in for a provider batch API which answers every request in the input file with `handler`."""
+
+    def __init__(self, handler: Callable[[dict], dict], work_dir: str | Path):
+        self.handler = handler
+        self.work_dir = Path(work_dir)
+        self.batches: dict[str, Path] = {}
+
+    def submit(self, input_file: str | Path) -> str:
+        batch_id = f"batch_{len(self.batches)}"
+        output_file = self.work_dir / f"{batch_id}_output.jsonl"
+        with open(output_file, "w") as f:
+            for custom_id, body in read_batch_file(input_file).items():
+                response = {"status_code": 200, "body": self.handler(body)}
+                f.write(json.dumps({"custom_id": custom_id, "response": response}) + "\n")
+        self.batches[batch_id] = output_file
+        return batch_id
+
+    def poll(self, batch_id: str) -> str:
+        return "completed" if batch_id in self.batches else "failed"
+
+    def download(self, batch_id: str, output_file: str | Path) -> None:
+        shutil.copyfile(self.batches[batch_id], output_file)
+
+
+class OpenAIBatchBackend:
+    """Submit batch files to the OpenAI batch endpoint."""
+
+    def __init__(self, completion_window: str = "24h"):
+        self.completion_window = completion_window
+        self.output_files: dict[str, str] = {}
+
+    def submit(self, input_file: str | Path) -> str:
+        with open(input_file, "rb") as f:
+            uploaded = llm.client.files.create(file=f, purpose="batch") # type: ignore
+        batch = llm.client.post(
+                "/batches",
+                cast_to=dict,
+                body={"input_file_id": uploaded.id, "endpoint": BATCH_ENDPOINT, "completion_window": self.completion_window}
+        )
+        return batch["id"]
+
+    def poll(self, batch_id: str) -> str:
+        batch = llm.client.get(f"/batches/{batch_id}", cast_to=dict)
+        if batch.get("output_file_id"):
+            self.output_files[batch_id] = batch["output_file_id"]
+        return batch["status"]
+
+    def download(self, batch_id: str, output_file: str | Path) -> None:
+        llm.client.files.content(self.output_files[batch_id]).write_to_file(output_file)
+
+
+def run_batch(backend, requests: dict[str, dict], work_dir: Path, name: str, poll_interval: float) -> dict[str, str]:
+    """Submit a batch of requests, wait for it to finish and return the tool call arguments.
+
+    Args:
+        backend: The batch backend to submit to.
+        requests: The request bodies keyed by their custom id.
+        work_dir: The folder to write the batch input and output files to.
+        name: The name of the batch, used for the file names.
+        poll_interval: The number of seconds to wait between polls.
+
+    Returns:
+        The tool call arguments keyed by custom id.
+
+    Raises:
+        BatchFailedError: If the batch does not complete.
+    """
+    input_file = work_dir / f"{name}_input.jsonl"
+    output_file = work_dir / f"{name}_output.jsonl"
+    write_batch_file(requests, input_file)
+
+    batch_id = backend.submit(input_file)
+    logging.info(f"Submitted batch {name} ({batch_id}) with {len(requests)} requests")
+    status = backend.poll(batch_id)
+    while status not in TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        status = backend.poll(batch_id)
+
+    if status != "completed":
+        raise BatchFailedError(f"Batch {batch_id} finished with status {status}")
+
+    backend.download(batch_id, output_file)
+    return read_batch_results(output_file)
+
+
+def run_batch_until_parsed(
+        backend,
+        requests: dict[str, dict],
+        model: type[FunctionDocstring] | type[ModuleDocstring],
+        work_dir: Path,
+        name: str,
+        poll_interval: float,
+        max_attempts: int,
+        checks: Optional[dict[str, Callable[[BaseModel], list[str]]]] = None,
+        defaults: Optional[dict[str, dict]] = None
+) -> dict:
+    """Run a batch and resubmit the requests which failed or could not be parsed.
+
+    Parsed responses are then checked locally by the check of their custom id, if any. Only the responses which fail
+    their check are resubmitted, as repair requests, and a response still failing on the last attempt is kept.
+
+    Args:
+        backend: The batch backend to submit to.
+        requests: The request bodies keyed by their custom id.
+        model: The pydantic model to parse the tool call arguments into.
+        work_dir: The folder to write the batch files to.
+        name: The name of the batch, used for the file names.
+        poll_interval: The number of seconds to wait between polls.
+        max_attempts: The maximum number of times a request is submitted.
+        checks: Local checks of the parsed docstrings keyed by custom id, returning the problems of each docstring.
+        defaults: Values for fields missing from each response keyed by custom id, such as the name of the function.
+
+    Returns:
+        The parsed docstrings keyed by custom id.
+
+    Raises:
+        BatchFailedError: If a request still has no valid response after `max_attempts` batches.
+    """
+    parsed = {}
+    schema = CompiledSchema(model)
+    checks = checks or {}
+    defaults = defaults or {}
+    for attempt in range(max_attempts):
+        results = run_batch(backend, requests, work_dir, f"{name}_{attempt}", poll_interval)
+        retry = {}
+        for custom_id, body in requests.items():
+            data, errors = (
+                validate_tool_output(results[custom_id], schema, defaults.get(custom_id)) if custom_id in results else (None, [])
+            )
+            if data is None or errors:
+                # a failed repair keeps the docstring which only failed its check
+                if custom_id not in parsed:
+                    retry[custom_id] = body
+                continue
+            parsed[custom_id] = schema.build(data)
+            problems = checks[custom_id](parsed[custom_id]) if custom_id in checks else []
+            if problems and attempt + 1 < max_attempts:
+                logging.warning(f"Response for {custom_id} disagrees with its code: {problems}")
+                fragment = json.dumps({key: value for key, value in data.items() if value is not None})
+                retry[custom_id] = build_repair_request(fragment, problems, body)
+        if not retry:
+            return parsed
+        logging.warning(f"Resubmitting {len(retry)} requests from batch {name}")
+        requests = retry
+    raise BatchFailedError(f"No valid response for {list(requests)} after {max_attempts} attempts")
+
+
+@dataclass
+class BatchModule:
+    file_path: str
+    module_name: str
+    source_code: str
+    tree: ast.Module
+    imported_functions: dict[str, str]
+    remaining: list[tuple[str, ast.FunctionDef]]
+    positions: dict[ast.FunctionDef, int] = field(default_factory=dict)
+    docstrings: dict[int, FunctionDocstring] = field(default_factory=dict)
+
+
+def load_batch_module(G: nx.DiGraph, node: str, package_name: str) -> BatchModule:
+    module_name = file_path_to_module_name(node, package_name)
+    with open(node, "r") as f:
+        source_code = f.read()
+    tree = ast.parse(source_code)
+    imported_functions = get_module_imports(
+            tree,
+            set(get_imported_modules(G, node, package_name)),
+            ".".join(module_name.split(".")[:-1])
+    )
+    functions = get_all_internal_functions(tree)
+    # functions are keyed by position, as methods of different classes may share a name
+    positions = {function: index for index, (_, function) in enumerate(functions)}
+    return BatchModule(node, module_name, source_code, tree, imported_functions, functions, positions)
+
+
+def get_ready_functions(module: BatchModule, visited: dict) -> list[tuple[str, ast.FunctionDef]]:
+    """Return the functions of the module which do not call a function in the module that is not yet documented.
+
+    If every remaining function calls another remaining function (mutual recursion), all of them are returned.
+
+    Args:
+        module: The module being documented.
+        visited: The dictionary of visited functions.
+
+    Returns:
+        The functions which can be sent in the next wave.
+    """
+    remaining_names = [name for name, _ in module.remaining]
+    ready = []
+    for name, function in module.remaining:
+        others = [other for other in remaining_names if other != name]
+        try:
+            get_used_functions(function, others, module.imported_functions, visited)
+        except InternalFunctionCalledError:
+            continue
+        ready.append((name, function))
+    return ready or list(module.remaining)
+
+
+def document_functions_in_waves(
+        modules: list[BatchModule],
+        visited: dict,
+        backend,
+        work_dir: Path,
+        name: str,
+        poll_interval: float,
+        max_attempts: int,
+        cache: Optional[DocstringCache] = None
+) -> dict:
+    """Generate function docstrings for a set of independent modules, one batch per wave of ready functions.
+
+    Identical functions, by fingerprint, are only sent once and functions already in the cache are not sent at all.
+
+    Args:
+        modules: The modules to document. None of them may import another.
+        visited: The dictionary of visited functions.
+        backend: The batch backend to submit to.
+        work_dir: The folder to write the batch files to.
+        name: The name of the dependency wave, used for the file names.
+        poll_interval: The number of seconds to wait between polls.
+        max_attempts: The maximum number of times a request is submitted.
+        cache: The cache used to deduplicate requests for identical functions.
+
+    Returns:
+        The dictionary of visited functions.
+    """
+    wave = 0
+    cache = cache if cache is not None else DocstringCache()
+    while any(module.remaining for module in modules):
+        requests, keys, checks, defaults, functions, seen = {}, {}, {}, {}, [], set()
+        for module in modules:
+            for function_name, function in get_ready_functions(module, visited):
+                function_code, used_functions = prepare_function_for_llm(function, [], module.imported_functions, visited)
+                key = fingerprint_function(function, used_functions)
+                functions.append((module, function_name, function, key))
+                if key not in seen and cache.get(key, function_name) is None:
+                    seen.add(key)
+                    custom_id = f"function:{module.module_name}.{function_name}:{module.positions[function]}"
+                    requests[custom_id] = build_function_docstring_request(function_code, used_functions)
+                    keys[custom_id] = key
+                    checks[custom_id] = functools.partial(check_function_docstring, function)
+                    defaults[custom_id] = {"function_name": function_name}
+
+        if requests:
+            docstrings = run_batch_until_parsed(
+                    backend, requests, FunctionDocstring, work_dir, f"{name}_functions_{wave}", poll_interval, max_attempts, checks,
+                    defaults
+            )
+            for custom_id, docstring in docstrings.items():
+                cache.put(keys[custom_id], docstring)
+
+        for module, function_name, function, key in functions:
+            docstring = cache.get(key, function_name)
+            module.remaining.remove((function_name, function))
+            module.docstrings[module.positions[function]] = docstring # type: ignore
+            visited[f"{module.module_name}.{function_name}"] = docstring.summary # type: ignore
+        wave += 1
+    return visited
+
+
+def document_modules(
+        modules: list[BatchModule],
+        backend,
+        work_dir: Path,
+        name: str,
+        poll_interval: float,
+        max_attempts: int
+) -> None:
+    """Splice the function docstrings into each module, then generate and write the module docstrings in one batch.
+
+    Args:
+        modules: The modules to document, with all of their function docstrings generated.
+        backend: The batch backend to submit to.
+        work_dir: The folder to write the batch files to.
+        name: The name of the dependency wave, used for the file names.
+        poll_interval: The number of seconds to wait between polls.
+        max_attempts: The maximum number of times a request is submitted.
+    """
+    requests, new_sources = {}, {}
+    for module in modules:
+        docstrings = []
+        functions_in_module = []
+        for index, (function_name, function) in enumerate(get_all_internal_functions(module.tree)):
+            docstring_obj = module.docstrings[index]
+            docstrings.append((function, docstring_obj))
+            functions_in_module.append((f"{module.module_name}.{function_name}", docstring_obj.summary))
+        new_source_code = insert_function_docstrings(module.source_code, docstrings).rstrip() + "\n"
+
+        custom_id = f"module:{module.module_name}"
+        new_sources[custom_id] = (module, new_source_code)
+        requests[custom_id] = build_module_docstring_request(
+                module.module_name, functions_in_module, find_if_name_main(new_source_code)
+        )
+
+    docstrings = run_batch_until_parsed(
+            backend, requests, ModuleDocstring, work_dir, f"{name}_modules", poll_interval, max_attempts
+    )
+    for custom_id, (module, new_source_code) in new_sources.items():
+        docstring = build_module_docstring_from_object(docstrings[custom_id])
+        new_source_code = replace_top_level_docstring(new_source_code, ast.parse(new_source_code), docstring)
+        logging.info(f"Writing updated source code to {module.module_name}")
+        with open(module.file_path, "w") as f:
+            f.write(new_source_code)
+
+
+def docgen_batch(
+        G: nx.DiGraph,
+        package_name: str,
+        backend,
+        work_dir: str | Path,
+        poll_interval: float = 60.0,
+        max_attempts: int = 3,
+        visited: Optional[dict] = None,
+        cache: Optional[DocstringCache] = None
+) -> dict:
+    """Generate docstrings for an entire python package, submitting one batch per dependency wave.
+
+    Modules in the same topological generation of the dependency graph do not import each other, so all of their
+    function requests that are ready are compiled into a single batch. The results are ingested before the next
+    wave is built. The modules of an import cycle are put in the same generation and use the summaries available.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        backend: The batch backend to submit to.
+        work_dir: The folder to write the batch files to.
+        poll_interval: The number of seconds to wait between polls.
+        max_attempts: The maximum number of times a request is submitted.
+        visited: The dictionary of visited functions, if resuming.
+        cache: The cache used to deduplicate requests for identical functions.
+
+    Returns:
+        The dictionary of visited functions.
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    visited = visited if visited is not None else {}
+    for generation_number, generation in enumerate(get_module_generations(G)):
+        modules = [load_batch_module(G, node, package_name) for node in generation]
+        name = f"wave_{generation_number}"
+        logging.info(f"Documenting dependency wave {generation_number} ({len(modules)} modules)")
+        visited = document_functions_in_waves(modules, visited, backend, work_dir, name, poll_interval, max_attempts, cache)
+        document_modules(modules, backend, work_dir, name, poll_interval, max_attempts)
+    return visited
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate docstrings for an entire python package using the batch API")
+    parser.add_argument("--dependencies_file", "-d", help="The file containing the dependencies of the package.")
+    parser.add_argument("--package_name", "-p", help="The name of the package.")
+    parser.add_argument("--work_dir", default="batches", help="The folder to write the batch files to.")
+    parser.add_argument("--poll_interval", type=float, default=60.0, help="The number of seconds between polls.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, encoding="utf-8")
+    docgen_batch(load_graph(args.dependencies_file), args.package_name, OpenAIBatchBackend(), args.work_dir, args.poll_interval)
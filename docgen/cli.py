@@ -0,0 +1,91 @@
+"""The `docgen` command: document a package from anywhere inside it, without a separate pydeps step."""
+import argparse
+import logging
+
+from docgen.dependencies import build_graph_from_package, find_package_root, load_graph
+from docgen.docgen import run_docgen
+from docgen.docstrings import render_options
+from docgen.llm import configure_client
+from docgen.packages import DEFAULT_BATCH_SIZE, docgen_packages
+from docgen.planner import plan_run
+from docgen.transport import ClientOptions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="docgen", description="Generate docstring for an entire python package")
+    parser.add_argument("path", nargs="?", default=".", help="The package, or any module or directory inside it.")
+    parser.add_argument("--dependencies_file", "-d", help="Use a pydeps dependencies file instead of parsing the imports.")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Analyse modules in parallel with this many processes.")
+    parser.add_argument("--cache_file", help="A JSON file to reuse docstrings for identical functions across runs.")
+    parser.add_argument("--cache_prompt_prefix", action="store_true", help="Share a cacheable prompt prefix between the functions of a module.")
+    parser.add_argument("--pipelined", action="store_true", help="Start each module as soon as the summaries it uses are available.")
+    parser.add_argument("--max_concurrency", type=int, default=4, help="The number of modules or functions documented at once.")
+    parser.add_argument("--function_granularity", action="store_true", help="Schedule each function as soon as the functions it calls are documented.")
+    parser.add_argument("--streaming", action="store_true", help="Stream modules through bounded read, analyse, document and write stages.")
+    parser.add_argument("--docstring_style", choices=["google", "numpy", "rest"], default="google", help="The style of the function docstrings written.")
+    parser.add_argument("--line_width", type=int, default=None, help="Wrap docstrings to this line length, including indentation.")
+    parser.add_argument("--package_docstrings", action="store_true", help="Also document every __init__.py from the summaries of its modules.")
+    parser.add_argument("--package_batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="The most modules and subpackages in a package docstring request.")
+    parser.add_argument("--max_connections", type=int, default=100, help="The most connections to the LLM provider open at once.")
+    parser.add_argument("--max_keepalive_connections", type=int, default=20, help="The most idle connections kept open for reuse.")
+    parser.add_argument("--keepalive_expiry", type=float, default=30.0, help="The number of seconds an idle connection is kept open.")
+    parser.add_argument("--request_timeout", type=float, default=600.0, help="The number of seconds each request may wait for data.")
+    parser.add_argument("--connect_timeout", type=float, default=5.0, help="The number of seconds to establish a connection.")
+    parser.add_argument("--http2", action="store_true", help="Multiplex requests over HTTP/2 connections (needs httpx[http2]).")
+    parser.add_argument("--plan", action="store_true", help="Print the predicted tokens, cost and wall time instead of running.")
+    parser.add_argument("--requests_per_minute", type=float, default=None, help="The request rate limit used by --plan.")
+    parser.add_argument("--tokens_per_minute", type=float, default=None, help="The token rate limit used by --plan.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Discover the package containing a path, build its dependency graph in-process and document it.
+
+    Args:
+        argv: The command line arguments, defaulting to `sys.argv`.
+    """
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, encoding="utf-8")
+    render_options.style = args.docstring_style
+    render_options.width = args.line_width
+    configure_client(ClientOptions(
+            max_connections=args.max_connections,
+            max_keepalive_connections=args.max_keepalive_connections,
+            keepalive_expiry=args.keepalive_expiry,
+            timeout=args.request_timeout,
+            connect_timeout=args.connect_timeout,
+            http2=args.http2
+    ))
+    package_root = find_package_root(args.path)
+    if args.dependencies_file:
+        G = load_graph(args.dependencies_file)
+    else:
+        G = build_graph_from_package(package_root)
+    if args.plan:
+        print(plan_run(
+                G,
+                package_root.name,
+                args.max_concurrency,
+                args.requests_per_minute,
+                args.tokens_per_minute,
+                workers=args.workers
+        ))
+        return
+    logging.info(f"Documenting {G.number_of_nodes()} modules of package {package_root.name} at {package_root}")
+    run_docgen(
+            G,
+            package_root.name,
+            args.workers,
+            args.cache_file,
+            args.cache_prompt_prefix,
+            args.pipelined,
+            args.max_concurrency,
+            args.function_granularity,
+            args.streaming
+    )
+    if args.package_docstrings:
+        docgen_packages(package_root, args.package_batch_size, args.max_concurrency)
+
+
+if __name__ == "__main__":
+    main()
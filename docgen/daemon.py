@@ -0,0 +1,281 @@
+"""Keep the dependency graph, parsed modules and summaries in memory and document functions as they are saved."""
+import argparse
+import ast
+import copy
+import hashlib
+import json
+import logging
+import networkx as nx
+import os
+import socket
+import socketserver
+import threading
+
+from docgen.analysis import analyze_source
+from docgen.dedup import DocstringCache
+from docgen.dependencies import build_symbol_graph, get_affected_functions, load_graph
+from docgen.docgen import file_path_to_module_name, get_imported_modules
+from docgen.modules import generate_docstrings_for_selected_functions, get_all_internal_functions, get_existing_summaries
+from docgen.pydantic_models import ModuleAnalysis
+from docgen.store import SummaryStore
+
+
+def hash_functions(tree: ast.Module) -> dict[str, str]:
+    """Hash every function in the module, ignoring docstrings and positions, so that only edits to the code are detected.
+
+    Args:
+        tree: The module AST object.
+
+    Returns:
+        The hash of each function, keyed by name.
+    """
+    hashes = {}
+    for name, function in get_all_internal_functions(tree):
+        if ast.get_docstring(function):
+            function = copy.copy(function)
+            function.body = function.body[1:]
+        hashes[name] = hashlib.sha1(ast.dump(function).encode("utf-8")).hexdigest()
+    return hashes
+
+
+class DocgenDaemon:
+    """Document the functions of a package as they change, without paying for startup and a full run on every change.
+
+    The summary store is seeded from the existing docstrings, so the package is expected to have been documented once.
+    When a module changes on disk, only the functions whose code changed and the functions calling them are documented.
+    """
+
+    def __init__(
+            self,
+            G: nx.DiGraph,
+            package_name: str,
+            cache: DocstringCache | None = None,
+            update_module_docstrings: bool = True
+    ):
+        self.G = G
+        self.package_name = package_name
+        self.cache = cache or DocstringCache()
+        self.update_module_docstrings = update_module_docstrings
+        self.visited = SummaryStore()
+        self.analyses: dict[str, ModuleAnalysis] = {}
+        self.mtimes: dict[str, int] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.pending: dict[str, set[str]] = {}
+        self.symbol_graph = nx.DiGraph()
+        self.lock = threading.RLock()
+        self.documented = 0
+
+    def parse(self, node: str) -> tuple[str, ast.Module]:
+        with open(node, "r") as f:
+            source_code = f.read()
+        self.mtimes[node] = os.stat(node).st_mtime_ns
+        return source_code, ast.parse(source_code)
+
+    def analyse(self, node: str, source_code: str) -> ModuleAnalysis:
+        module_name = file_path_to_module_name(node, self.package_name)
+        analysis = analyze_source(source_code, node, module_name, get_imported_modules(self.G, node, self.package_name))
+        self.analyses[node] = analysis
+        return analysis
+
+    def load(self) -> None:
+        """Parse every module in the package and seed the summary store from the existing docstrings."""
+        with self.lock:
+            for node in self.G.nodes:
+                source_code, tree = self.parse(node)
+                analysis = self.analyse(node, source_code)
+                self.hashes[node] = hash_functions(tree)
+                self.visited.update(get_existing_summaries(tree, analysis.module_name))
+            self.symbol_graph = build_symbol_graph(self.analyses)
+        logging.info(f"Loaded {len(self.analyses)} modules and {len(self.visited)} summaries")
+
+    def has_changed(self, node: str) -> bool:
+        try:
+            return os.stat(node).st_mtime_ns != self.mtimes.get(node)
+        except FileNotFoundError:
+            return False
+
+    def check(self, node: str) -> list[str]:
+        """Document the functions of the module that changed since it was last seen, and the functions calling them.
+
+        Args:
+            node: The path of the module.
+
+        Returns:
+            The fully qualified names of the functions documented.
+        """
+        with self.lock:
+            source_code, tree = self.parse(node)
+            analysis = self.analyse(node, source_code)
+            hashes = hash_functions(tree)
+            previous = self.hashes.get(node, {})
+            changed = {f"{analysis.module_name}.{name}" for name, digest in hashes.items() if previous.get(name) != digest}
+            # callers which could not be written when a module they call changed
+            changed |= {f"{analysis.module_name}.{name}" for name in self.pending.pop(node, set())}
+            if not changed:
+                return []
+
+            self.symbol_graph = build_symbol_graph(self.analyses)
+            affected = get_affected_functions(self.symbol_graph, changed)
+            by_module: dict[str, set[str]] = {}
+            for symbol in affected:
+                module = self.symbol_graph.nodes[symbol]["module"] if symbol in self.symbol_graph else node
+                by_module.setdefault(module, set()).add(symbol.rsplit(".", 1)[1])
+
+            # document the changed module first, so its callers get the new summaries
+            documented = []
+            for module in sorted(by_module, key=lambda m: m != node):
+                names = self.document_functions(module, by_module[module])
+                if names is None and module == node:
+                    # the hashes are kept, so the next check sees the same changes
+                    return documented
+                if names is None:
+                    self.pending.setdefault(module, set()).update(by_module[module])
+                    continue
+                if module == node:
+                    self.hashes[node] = hashes
+                documented.extend(names)
+            return documented
+
+    def document_functions(self, node: str, function_names: set[str]) -> list[str] | None:
+        """Document some of the functions of a module and write it, unless it was edited in the meantime.
+
+        Args:
+            node: The path of the module.
+            function_names: The names of the functions to document.
+
+        Returns:
+            The fully qualified names of the functions documented, or None if the module was edited in the meantime,
+            in which case the summaries of the functions are left as they were.
+        """
+        with open(node, "r") as f:
+            source_code = f.read()
+        analysis = self.analyses[node]
+        keys = [f"{analysis.module_name}.{name}" for name in function_names]
+        previous = {key: self.visited[key] for key in keys if key in self.visited}
+        logging.info(f"Documenting {sorted(function_names)} in {analysis.module_name}")
+        new_source_code, _ = generate_docstrings_for_selected_functions(
+                source_code,
+                analysis.module_name,
+                analysis.imports,
+                function_names,
+                self.visited,
+                self.cache,
+                self.update_module_docstrings
+        )
+
+        with open(node, "r") as f:
+            if f.read() != source_code:
+                logging.warning(f"{node} was edited while it was being documented, it will be documented again")
+                self.mtimes.pop(node, None)
+                for key in keys:
+                    if key in previous:
+                        self.visited[key] = previous[key]
+                    else:
+                        self.visited.pop(key, None)
+                return None
+        with open(node, "w") as f:
+            f.write(new_source_code)
+        self.mtimes[node] = os.stat(node).st_mtime_ns
+        self.documented += len(function_names)
+        return sorted(f"{analysis.module_name}.{name}" for name in function_names)
+
+    def scan(self) -> list[str]:
+        """Check every module whose modification time changed.
+
+        Returns:
+            The fully qualified names of the functions documented.
+        """
+        documented = []
+        for node in list(self.G.nodes):
+            if self.has_changed(node):
+                documented.extend(self.check(node))
+        return documented
+
+    def watch(self, poll_interval: float, stop: threading.Event) -> None:
+        while not stop.wait(poll_interval):
+            try:
+                self.scan()
+            except Exception:
+                logging.exception("Failed to document changed modules")
+
+    def handle(self, request: dict) -> dict:
+        """Handle a request from the socket API.
+
+        Commands:
+            status: the number of modules, summaries and functions documented since startup.
+            document: check the module at `path` now, rather than waiting for the next poll.
+            summary: the summary of the function `function`.
+        """
+        command = request.get("command")
+        if command == "status":
+            return {"modules": len(self.analyses), "summaries": len(self.visited), "documented": self.documented}
+        if command == "document":
+            path = os.path.abspath(request["path"])
+            if path not in self.G:
+                return {"error": f"{path} is not a module of the package"}
+            return {"documented": self.check(path)}
+        if command == "summary":
+            return {"summary": self.visited.get(request["function"])}
+        return {"error": f"Unknown command {command}"}
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Answer one JSON request per line."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            request = json.loads(line)
+            if request.get("command") == "shutdown":
+                self.wfile.write(b'{"shutdown": true}\n')
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            try:
+                response = self.server.daemon.handle(request) # type: ignore
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class DaemonServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, daemon: DocgenDaemon, address: tuple[str, int]):
+        super().__init__(address, DaemonRequestHandler)
+        self.daemon = daemon
+
+
+def send_command(request: dict, host: str = "127.0.0.1", port: int = 8765) -> dict:
+    """Send a request to a running daemon and return its response, e.g. from an editor or a pre-commit hook."""
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r") as f:
+            return json.loads(f.readline())
+
+
+def serve(daemon: DocgenDaemon, host: str, port: int, poll_interval: float) -> None:
+    """Load the package, watch it for changes and answer requests until a shutdown request is received."""
+    daemon.load()
+    stop = threading.Event()
+    watcher = threading.Thread(target=daemon.watch, args=(poll_interval, stop), daemon=True)
+    watcher.start()
+    with DaemonServer(daemon, (host, port)) as server:
+        logging.info(f"Listening on {host}:{server.server_address[1]}")
+        server.serve_forever()
+    stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Document a python package as its modules are saved")
+    parser.add_argument("--dependencies_file", "-d", help="The file containing the dependencies of the package.")
+    parser.add_argument("--package_name", "-p", help="The name of the package.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--poll_interval", type=float, default=1.0, help="The number of seconds between checks for changes.")
+    parser.add_argument("--command", help="Send a JSON request to a running daemon instead of starting one.")
+    args = parser.parse_args()
+    if args.command:
+        print(json.dumps(send_command(json.loads(args.command), args.host, args.port)))
+    else:
+        logging.basicConfig(level=logging.INFO, encoding="utf-8")
+        serve(DocgenDaemon(load_graph(args.dependencies_file), args.package_name), args.host, args.port, args.poll_interval)
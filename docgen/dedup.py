@@ -0,0 +1,184 @@
+"""This module contains functions for deduplicating docstring requests for identical functions."""
+import ast
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from docgen.pydantic_models import FunctionDocstring
+
+
+class LocalNameNormalizer(ast.NodeTransformer):
+    """Rename the local variables of a function to placeholders, in order of first appearance.
+
+    Parameter names, globals and attributes are kept, as they change the meaning of the function or appear in its docstring.
+    """
+
+    def __init__(self, local_names: set[str]):
+        self.names: dict[str, str] = {}
+        self.local_names = local_names
+
+    def rename(self, name: str) -> str:
+        if name not in self.local_names:
+            return name
+        if name not in self.names:
+            self.names[name] = f"_v{len(self.names)}"
+        return self.names[name]
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        node.id = self.rename(node.id)
+        return node
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.ExceptHandler:
+        if node.name:
+            node.name = self.rename(node.name)
+        self.generic_visit(node)
+        return node
+
+
+def get_local_names(function: ast.FunctionDef) -> set[str]:
+    """Return the names assigned in the function which are not parameters, globals or nonlocals.
+
+    Args:
+        function: The function AST object.
+
+    Returns:
+        The names of the local variables.
+    """
+    arguments = function.args
+    parameters = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+    parameters |= {arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg}
+
+    assigned, declared = set(), set()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            assigned.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            assigned.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+    return assigned - parameters - declared
+
+
+def normalize_function(function: ast.FunctionDef) -> str:
+    """Unparse the function with its name, docstring and local variable names replaced by placeholders.
+
+    Args:
+        function: The function AST object.
+
+    Returns:
+        The normalized source code of the function.
+    """
+    function = copy.deepcopy(function)
+    function.name = "_f"
+    if ast.get_docstring(function):
+        function.body = function.body[1:] or [ast.Pass()]
+    LocalNameNormalizer(get_local_names(function)).visit(function)
+    return ast.unparse(function)
+
+
+def fingerprint_function(function: ast.FunctionDef, used_functions: list[tuple[str, str]]) -> str:
+    """Fingerprint a function together with the context sent alongside it to the LLM.
+
+    Args:
+        function: The function AST object.
+        used_functions: The functions used in the function with their summaries.
+
+    Returns:
+        A hex digest which is identical for functions that only differ by name, docstring or local variable names.
+    """
+    context = json.dumps(sorted(set(map(tuple, used_functions))))
+    return hashlib.sha256((normalize_function(function) + "\n" + context).encode("utf-8")).hexdigest()
+
+
+class DocstringCache:
+    """A docstring cache keyed by function fingerprint.
+
+    Concurrent requests for the same fingerprint are coalesced into one, and completed docstrings can be saved to a
+    JSON file to be reused by later runs.
+    """
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path
+        self.docstrings: dict[str, FunctionDocstring] = {}
+        self.in_flight: dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        if file_path and os.path.exists(file_path):
+            with open(file_path) as f:
+                self.docstrings = {key: FunctionDocstring(**value) for key, value in json.load(f).items()}
+
+    def get(self, key: str, function_name: str) -> FunctionDocstring | None:
+        with self._lock:
+            docstring = self.docstrings.get(key)
+            if docstring is not None:
+                self.hits += 1
+        return docstring.model_copy(update={"function_name": function_name}) if docstring else None
+
+    def put(self, key: str, docstring: FunctionDocstring) -> None:
+        with self._lock:
+            self.docstrings[key] = docstring
+
+    def get_or_generate(
+            self,
+            key: str,
+            function_name: str,
+            generate: Callable[[], FunctionDocstring]
+    ) -> FunctionDocstring:
+        """Return the cached docstring for the fingerprint, or generate it once however many callers ask at the same time.
+
+        Args:
+            key: The fingerprint of the function.
+            function_name: The name of the function, used for the returned docstring.
+            generate: The function which makes the LLM request.
+
+        Returns:
+            The docstring for the function.
+        """
+        with self._lock:
+            docstring = self.docstrings.get(key)
+            future = self.in_flight.get(key)
+            owner = docstring is None and future is None
+            if docstring is not None:
+                self.hits += 1
+            elif future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self.in_flight[key] = Future()
+
+        if docstring is not None:
+            return docstring.model_copy(update={"function_name": function_name})
+
+        if not owner:
+            logging.info(f"Waiting for identical in-flight request for {function_name}")
+            return future.result().model_copy(update={"function_name": function_name}) # type: ignore
+
+        try:
+            docstring = generate()
+        except BaseException as e:
+            with self._lock:
+                del self.in_flight[key]
+            future.set_exception(e) # type: ignore
+            raise
+
+        with self._lock:
+            self.docstrings[key] = docstring
+            del self.in_flight[key]
+        future.set_result(docstring) # type: ignore
+        return docstring
+
+    def save(self) -> None:
+        if not self.file_path:
+            return
+        with self._lock:
+            data = {key: docstring.model_dump() for key, docstring in self.docstrings.items()}
+        with open(self.file_path, "w") as f:
+            json.dump(data, f)
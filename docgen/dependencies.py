@@ -1,8 +1,15 @@
 import argparse
+import ast
+import hashlib
 import json
 import networkx as nx
+import pickle
 
+from array import array
 from pathlib import Path
+from typing import IO, Iterator
+
+from docgen.pydantic_models import ModuleAnalysis
 
 def build_graph_from_json(file_path: str | Path) -> nx.DiGraph:
     with open(file_path) as f:
@@ -21,12 +28,317 @@ def build_graph_from_json(file_path: str | Path) -> nx.DiGraph:
 
         return build_graph_from_nodes_and_edges(nodes, edges)
 
+def iter_json_object(f: IO[str], chunk_size: int = 1 << 16) -> Iterator[tuple[str, object]]:
+    """Yield the items of a top level JSON object one at a time, reading the file in chunks.
+
+    Only the item being decoded is held in memory, so dependency files of any size can be read.
+
+    Args:
+        f: The open JSON file.
+        chunk_size: The number of characters read at a time.
+
+    Yields:
+        The key and decoded value of each item.
+
+    Raises:
+        ValueError: If the file is not a JSON object.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+        return bool(chunk)
+
+    def skip_whitespace() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position:position + 1]
+
+    def decode() -> object:
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            # a number could continue in the next chunk
+            if end == len(buffer) and not eof and fill():
+                continue
+            position = end
+            return value
+
+    if skip_whitespace() != "{":
+        raise ValueError("The dependencies file must contain a JSON object")
+    position += 1
+    if skip_whitespace() == "}":
+        return
+    while True:
+        skip_whitespace()
+        key = decode()
+        if skip_whitespace() != ":":
+            raise ValueError(f"Expected ':' after key {key}")
+        position += 1
+        skip_whitespace()
+        yield key, decode() # type: ignore
+        separator = skip_whitespace()
+        position += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or '}}' after the value of {key}")
+
+def build_graph_from_json_stream(file_path: str | Path) -> nx.DiGraph:
+    """Build the same graph as `build_graph_from_json`, streaming the dependencies file instead of loading it whole."""
+    nodes = []
+    paths = {}
+    imports = []
+    with open(file_path) as f:
+        for name, value in iter_json_object(f):
+            path = value['path'] # type: ignore
+            paths[name] = path
+            if is_documentable_file(path):
+                nodes.append(path)
+            imports.extend((imp, path) for imp in get_imports(value)) # type: ignore
+
+    return build_graph_from_nodes_and_edges(nodes, [(paths[imp], path) for imp, path in imports])
+
+def hash_file(file_path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_graph_cache(G: nx.DiGraph, file_path: str | Path) -> None:
+    """Save the graph as a list of nodes and two arrays of node indices, one for the sources and one for the targets."""
+    index = {node: i for i, node in enumerate(G.nodes)}
+    cache = {
+        "nodes": list(G.nodes),
+        "sources": array("I", (index[u] for u, _ in G.edges)),
+        "targets": array("I", (index[v] for _, v in G.edges)),
+    }
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(f"{file_path}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(file_path)
+
+def load_graph_cache(file_path: str | Path) -> nx.DiGraph:
+    with open(file_path, "rb") as f:
+        cache = pickle.load(f)
+    nodes = cache["nodes"]
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(zip(map(nodes.__getitem__, cache["sources"]), map(nodes.__getitem__, cache["targets"])))
+    return G
+
+def load_graph(dependencies_file: str | Path, cache_dir: str | Path | None = ".docgen_cache") -> nx.DiGraph:
+    """Load the dependency graph from the binary cache, building and caching it if the dependencies file changed.
+
+    Args:
+        dependencies_file: The pydeps dependencies file.
+        cache_dir: The folder of the graph cache, or None to always build the graph from the dependencies file.
+
+    Returns:
+        The dependency graph.
+    """
+    if cache_dir is None:
+        return build_graph_from_json_stream(dependencies_file)
+    cache_path = Path(cache_dir, f"{hash_file(dependencies_file)}.graph")
+    if cache_path.exists():
+        return load_graph_cache(cache_path)
+    G = build_graph_from_json_stream(dependencies_file)
+    save_graph_cache(G, cache_path)
+    return G
+
 def build_graph_from_nodes_and_edges(nodes: list[str], edges: list[tuple[str, str]]) -> nx.DiGraph:
     G = nx.DiGraph()
     G.add_nodes_from(nodes)
     G.add_edges_from(edges)
     return G
 
+def build_symbol_graph(analyses: dict[str, ModuleAnalysis]) -> nx.DiGraph:
+    """Build a graph of the functions in the package, with an edge from each function to every function that calls it.
+
+    Calls are resolved through the import aliases of each module (see `docgen.analysis`), so a function only depends on
+    the exact functions it calls, wherever they are defined in the package. Recursive calls are ignored.
+
+    Args:
+        analyses: The analysis of each module, keyed by path.
+
+    Returns:
+        The symbol graph. Each node is the fully qualified name of a function, with the path of its module in the
+        `module` attribute and its name in the `name` attribute.
+    """
+    G = nx.DiGraph()
+    for node, analysis in analyses.items():
+        for function in analysis.functions:
+            G.add_node(f"{analysis.module_name}.{function.name}", module=node, name=function.name)
+
+    for analysis in analyses.values():
+        for function in analysis.functions:
+            caller = f"{analysis.module_name}.{function.name}"
+            G.add_edges_from((callee, caller) for callee in function.calls if callee in G and callee != caller)
+    return G
+
+def get_affected_functions(symbol_graph: nx.DiGraph, changed: set[str]) -> set[str]:
+    """Return the changed functions together with the functions that call them.
+
+    The callers are included because the summary of a changed function is part of the prompt for each of its callers.
+
+    Args:
+        symbol_graph: The symbol graph of the package, see `build_symbol_graph`.
+        changed: The fully qualified names of the changed functions.
+
+    Returns:
+        The fully qualified names of the functions to document again.
+    """
+    affected = set(changed)
+    for symbol in changed:
+        if symbol in symbol_graph:
+            affected.update(symbol_graph.successors(symbol))
+    return affected
+
+def get_module_order(G: nx.DiGraph) -> list[list[str]]:
+    """Order the modules so that every module comes after the modules it imports.
+
+    The graph is condensed into its strongly connected components, so the modules of an import cycle are grouped into a
+    single unit. Within a cycle, modules importing fewer of the other members come first, so that they are documented
+    with the summaries that are available and the rest of the cycle can use theirs.
+
+    Args:
+        G: The dependency graph of the package.
+
+    Returns:
+        The units in topological order. Each unit is a list of modules, with more than one module for an import cycle.
+    """
+    C = nx.condensation(G)
+    order = []
+    for component in nx.topological_sort(C):
+        members = C.nodes[component]["members"]
+        order.append(sorted(members, key=lambda node: (sum(1 for p in G.predecessors(node) if p in members), node)))
+    return order
+
+def get_module_generations(G: nx.DiGraph) -> list[list[str]]:
+    """Group the modules into generations that do not import each other, other than through an import cycle.
+
+    Args:
+        G: The dependency graph of the package.
+
+    Returns:
+        The generations in topological order.
+    """
+    C = nx.condensation(G)
+    return [
+        sorted(member for component in generation for member in C.nodes[component]["members"])
+        for generation in nx.topological_generations(C)
+    ]
+
+def find_package_root(path: str | Path) -> Path:
+    """Find the top level package containing a path, by walking up while the parent is also a package.
+
+    Args:
+        path: A module, or a directory inside the package.
+
+    Returns:
+        The directory of the top level package.
+
+    Raises:
+        ValueError: If the path is not inside a package.
+    """
+    path = Path(path).resolve()
+    if path.is_file():
+        path = path.parent
+    if not (path / "__init__.py").exists():
+        raise ValueError(f"{path} is not inside a python package")
+    while (path.parent / "__init__.py").exists():
+        path = path.parent
+    return path
+
+def build_module_index(package_root: str | Path) -> dict[str, str]:
+    """Map the path of every module in a package to its fully qualified name.
+
+    Args:
+        package_root: The directory of the top level package.
+
+    Returns:
+        The fully qualified module names keyed by path. A package's `__init__.py` maps to the name of the package.
+    """
+    package_root = Path(package_root).resolve()
+    index = {}
+    for path in sorted(package_root.rglob("*.py")):
+        parts = (package_root.name,) + path.relative_to(package_root).with_suffix("").parts
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        index[str(path)] = ".".join(parts)
+    return index
+
+def get_package_imports(tree: ast.Module, module_name: str, is_package: bool, modules: set[str]) -> set[str]:
+    """Find the modules of the package imported by a module, resolving relative imports without importing anything.
+
+    Args:
+        tree: The module AST object.
+        module_name: The fully qualified name of the module.
+        is_package: Whether the module is the `__init__.py` of a package.
+        modules: The fully qualified names of every module in the package.
+
+    Returns:
+        The fully qualified names of the imported modules.
+    """
+    package = module_name if is_package else module_name.rpartition(".")[0]
+    imported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.update(alias.name for alias in node.names if alias.name in modules)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = package.split(".")
+                base = ".".join(parts[:len(parts) - node.level + 1] + ([node.module] if node.module else []))
+            else:
+                base = node.module or ""
+            for alias in node.names:
+                if f"{base}.{alias.name}" in modules:
+                    imported.add(f"{base}.{alias.name}")
+                elif base in modules:
+                    imported.add(base)
+    imported.discard(module_name)
+    return imported
+
+def build_graph_from_package(package_root: str | Path) -> nx.DiGraph:
+    """Build the dependency graph of a package in-process, with the same shape as `build_graph_from_json`.
+
+    Args:
+        package_root: The directory of the top level package.
+
+    Returns:
+        The dependency graph, with an edge from each module to every module importing it.
+    """
+    index = build_module_index(package_root)
+    paths = {module_name: path for path, module_name in index.items()}
+    modules = set(paths)
+    nodes = []
+    edges = []
+    for path, module_name in index.items():
+        if is_documentable_file(path):
+            nodes.append(path)
+        with open(path, "r") as f:
+            tree = ast.parse(f.read())
+        for imp in get_package_imports(tree, module_name, path.endswith("__init__.py"), modules):
+            edges.append((paths[imp], path))
+    return build_graph_from_nodes_and_edges(nodes, edges)
+
 def get_imports(value: dict) -> list:
     return value.get('imports', [])
 
@@ -41,5 +353,6 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--file_path', type=str)
     parser.add_argument('--save_path', type=str)
+    parser.add_argument('--cache_dir', type=str, default=".docgen_cache", help="Also cache the graph in this folder.")
     args = parser.parse_args()
-    save_graph(build_graph_from_json(args.file_path), args.save_path)
+    save_graph(load_graph(args.file_path, args.cache_dir), args.save_path)
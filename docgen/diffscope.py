@@ -0,0 +1,175 @@
+"""Document only the functions touched by a git diff, and the functions calling them, e.g. from a pre-commit hook."""
+import argparse
+import ast
+import logging
+import networkx as nx
+import os
+import re
+import subprocess
+
+from docgen.analysis import analyze_modules
+from docgen.dedup import DocstringCache
+from docgen.dependencies import build_symbol_graph, get_affected_functions, get_module_order, load_graph
+from docgen.docgen import file_path_to_module_name, get_imported_modules
+from docgen.modules import generate_docstrings_for_selected_functions, get_all_internal_functions, get_existing_summaries
+from docgen.store import SummaryStore
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def parse_unified_diff(diff: str) -> dict[str, list[tuple[int, int]]]:
+    """Find the changed line ranges of each file in a unified diff.
+
+    Line numbers refer to the new version of each file. A hunk which only deletes lines is recorded as the line
+    following the deletion, so that the function it was deleted from is still found.
+
+    Args:
+        diff: The output of `git diff`, ideally with `-U0`.
+
+    Returns:
+        The inclusive line ranges keyed by the path of each file, relative to the repository root.
+    """
+    ranges: dict[str, list[tuple[int, int]]] = {}
+    current = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            path = line[4:].split("\t")[0]
+            current = None if path == "/dev/null" else path.removeprefix("b/")
+            continue
+        match = HUNK_HEADER.match(line)
+        if match and current is not None:
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            ranges.setdefault(current, []).append((start, start + max(count, 1) - 1))
+    return ranges
+
+
+def parse_line_ranges(specs: list[str]) -> dict[str, list[tuple[int, int]]]:
+    """Parse changed line ranges given as `path:start-end` or `path:line`.
+
+    Args:
+        specs: The line range specifications.
+
+    Returns:
+        The inclusive line ranges keyed by path.
+    """
+    ranges: dict[str, list[tuple[int, int]]] = {}
+    for spec in specs:
+        path, _, lines = spec.rpartition(":")
+        start, _, end = lines.partition("-")
+        ranges.setdefault(path, []).append((int(start), int(end or start)))
+    return ranges
+
+
+def get_git_diff(rev: str | None = None, cached: bool = False, cwd: str | None = None) -> str:
+    """Run `git diff -U0` against a revision, or against the index for staged changes."""
+    command = ["git", "diff", "-U0", "--no-color"]
+    if cached:
+        command.append("--cached")
+    if rev:
+        command.append(rev)
+    return subprocess.run(command, cwd=cwd, capture_output=True, text=True, check=True).stdout
+
+
+def get_changed_functions(tree: ast.Module, ranges: list[tuple[int, int]]) -> set[str]:
+    """Find the functions which overlap any of the changed line ranges, including their decorators.
+
+    Args:
+        tree: The module AST object.
+        ranges: The inclusive changed line ranges.
+
+    Returns:
+        The names of the changed functions.
+    """
+    changed = set()
+    for name, function in get_all_internal_functions(tree):
+        start = min([function.lineno] + [decorator.lineno for decorator in function.decorator_list])
+        end = function.end_lineno or function.lineno
+        if any(first <= end and last >= start for first, last in ranges):
+            changed.add(name)
+    return changed
+
+
+def docgen_diff(
+        G: nx.DiGraph,
+        package_name: str,
+        ranges: dict[str, list[tuple[int, int]]],
+        root: str = ".",
+        cache: DocstringCache | None = None,
+        update_module_docstrings: bool = False
+) -> list[str]:
+    """Document the functions overlapping the changed lines, and the functions calling them.
+
+    Only the changed modules and the modules importing them are analysed, as a caller of a changed function must
+    import its module. Summaries for everything else are taken from the existing docstrings.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        ranges: The changed line ranges keyed by path, relative to `root`.
+        root: The root of the repository the paths are relative to.
+        cache: The cache used to deduplicate requests for identical functions.
+        update_module_docstrings: Whether to regenerate the top level docstring of each documented module.
+
+    Returns:
+        The fully qualified names of the functions documented.
+    """
+    changed_ranges = {os.path.abspath(os.path.join(root, path)): lines for path, lines in ranges.items()}
+    changed_modules = [node for node in G.nodes if os.path.abspath(node) in changed_ranges]
+    if not changed_modules:
+        return []
+
+    modules = set(changed_modules).union(*(G.successors(node) for node in changed_modules))
+    jobs = [(node, file_path_to_module_name(node, package_name), get_imported_modules(G, node, package_name)) for node in modules]
+    analyses = analyze_modules(jobs, max_workers=1)
+
+    visited = SummaryStore()
+    changed = set()
+    for node in modules.union(*(G.predecessors(node) for node in modules)):
+        with open(node, "r") as f:
+            tree = ast.parse(f.read())
+        module_name = file_path_to_module_name(node, package_name)
+        visited.update(get_existing_summaries(tree, module_name))
+        if os.path.abspath(node) in changed_ranges:
+            lines = changed_ranges[os.path.abspath(node)]
+            changed.update(f"{module_name}.{name}" for name in get_changed_functions(tree, lines))
+
+    symbol_graph = build_symbol_graph(analyses)
+    by_module: dict[str, set[str]] = {}
+    for symbol in get_affected_functions(symbol_graph, changed):
+        by_module.setdefault(symbol_graph.nodes[symbol]["module"], set()).add(symbol_graph.nodes[symbol]["name"])
+
+    documented = []
+    for unit in get_module_order(G.subgraph(by_module)):
+        for node in unit:
+            with open(node, "r") as f:
+                source_code = f.read()
+            analysis = analyses[node]
+            logging.info(f"Documenting {sorted(by_module[node])} in {analysis.module_name}")
+            new_source_code, _ = generate_docstrings_for_selected_functions(
+                    source_code, analysis.module_name, analysis.imports, by_module[node], visited, cache, update_module_docstrings
+            )
+            with open(node, "w") as f:
+                f.write(new_source_code)
+            documented.extend(f"{analysis.module_name}.{name}" for name in sorted(by_module[node]))
+    return documented
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate docstrings for the functions touched by a git diff")
+    parser.add_argument("--dependencies_file", "-d", help="The file containing the dependencies of the package.")
+    parser.add_argument("--package_name", "-p", help="The name of the package.")
+    parser.add_argument("--rev", help="Diff the working tree against this revision.")
+    parser.add_argument("--cached", action="store_true", help="Only document staged changes, e.g. in a pre-commit hook.")
+    parser.add_argument("--lines", nargs="*", help="Changed lines given as path:start-end instead of a git diff.")
+    parser.add_argument("--update_module_docstrings", action="store_true", help="Also regenerate the top level docstrings.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, encoding="utf-8")
+    root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True).stdout.strip()
+    ranges = parse_line_ranges(args.lines) if args.lines else parse_unified_diff(get_git_diff(args.rev, args.cached, root))
+    docgen_diff(
+            load_graph(args.dependencies_file),
+            args.package_name,
+            ranges,
+            root if not args.lines else ".",
+            update_module_docstrings=args.update_module_docstrings
+    )
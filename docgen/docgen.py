@@ -1,28 +1,60 @@
 """Generate docstring for an entire python package"""
 import argparse
+import functools
 import logging
 import networkx as nx
-import os
-import re
+import threading
 
-from docgen.dependencies import build_graph_from_json
-from docgen.modules import generate_docstrings_for_module
+from pathlib import PurePath
 
+from docgen.analysis import analyze_modules
+from docgen.dedup import DocstringCache
+from docgen.dependencies import build_symbol_graph, get_module_order, load_graph
+from docgen.llm import pool_stats, prompt_cache_stats
+from docgen.modules import ModuleDocumenter, generate_docstrings_for_module
+from docgen.pydantic_models import ModuleAnalysis
+from docgen.scheduler import PipelineScheduler, get_priorities, get_required_symbols
+from docgen.sources import open_source
+from docgen.store import SummaryStore
+
+@functools.cache
 def file_path_to_module_name(file_path: str, package_name: str) -> str:
-    
-    file_path = re.sub(r".*(" + package_name + r".*)\.py", r"\1", file_path)
-    return file_path.replace(os.sep, ".")   
+    """Map the path of a module to its fully qualified name, from the last directory named after the package.
+
+    Results are cached, so every module's name is computed once per run however many times it is looked up.
+
+    Graphs built by `build_graph_from_package` name their modules with `build_module_index` instead, from the package
+    root. The two agree as long as no subpackage is named after the top level package.
+    """
+    parts = PurePath(file_path).with_suffix("").parts
+    directories = parts[:-1]
+    if package_name in directories:
+        parts = parts[len(directories) - directories[::-1].index(package_name) - 1:]
+    return ".".join(parts)
 
 
-def docgen_module(module_file_path: str, package_name: str, imported_modules: list, function_visited: dict) -> dict:
+def docgen_module(
+        module_file_path: str,
+        package_name: str,
+        imported_modules: list,
+        function_visited: dict,
+        analysis: ModuleAnalysis | None = None,
+        cache: DocstringCache | None = None,
+        cache_prompt_prefix: bool = False
+) -> dict:
     """Generate docstring for a single python module"""
     module_name = file_path_to_module_name(module_file_path, package_name)
     logging.info(f"Generating docstrings for module {module_name}")
 
-    with open(module_file_path, "r") as f:
-        source_code = f.read()
-
-    new_source_code, new_visited = generate_docstrings_for_module(source_code, imported_modules, function_visited, module_name)
+    imported_functions = analysis.imports if analysis else None
+    # the file is memory mapped, so only the rewritten module is held in memory as a string
+    with open_source(module_file_path) as index:
+        new_source_code, new_visited = generate_docstrings_for_module(
+                index, imported_modules, function_visited, module_name, imported_functions, cache, cache_prompt_prefix
+        )
+    # line endings are normalised to "\n", as when the file is read in text mode
+    if "\r" in new_source_code:
+        new_source_code = new_source_code.replace("\r\n", "\n")
 
     logging.info(f"Writing updated source code to {module_name}")
     with open(module_file_path, "w") as f:
@@ -31,30 +63,184 @@ def docgen_module(module_file_path: str, package_name: str, imported_modules: li
     return new_visited
 
 
-def docgen(G: nx.DiGraph, package_name: str) -> None:
+def get_imported_modules(G: nx.DiGraph, node: str, package_name: str) -> list[str]:
+    """Return the fully qualified names of the package modules imported by a module"""
+    return [file_path_to_module_name(parent, package_name) for parent in G.predecessors(node)]
+
+
+def analyze_package(G: nx.DiGraph, package_name: str, workers: int | None = None) -> dict[str, ModuleAnalysis]:
+    """Analyse every module in the package in parallel, ahead of any LLM requests"""
+    jobs = [
+        (node, file_path_to_module_name(node, package_name), get_imported_modules(G, node, package_name))
+        for node in G.nodes
+    ]
+    return analyze_modules(jobs, workers)
+
+
+def docgen_functions(
+        package_name: str,
+        analyses: dict[str, ModuleAnalysis],
+        cache: DocstringCache | None = None,
+        max_concurrency: int = 4
+) -> SummaryStore:
+    """Generate docstrings for an entire python package, scheduling each function as soon as its callees are documented"""
+    symbol_graph = build_symbol_graph(analyses)
+    visited = SummaryStore()
+    documenters = {}
+    lock = threading.Lock()
+
+    def get_documenter(node: str) -> ModuleDocumenter:
+        with lock:
+            if node not in documenters:
+                with open(node, "r") as f:
+                    documenters[node] = ModuleDocumenter(f.read(), analyses[node].module_name, analyses[node].imports)
+            return documenters[node]
+
+    def write_module(node: str) -> None:
+        new_source_code = get_documenter(node).assemble()
+        logging.info(f"Writing updated source code to {analyses[node].module_name}")
+        with open(node, "w") as f:
+            f.write(new_source_code)
+
+    def document(unit: str) -> None:
+        if unit not in symbol_graph:
+            # a module without any functions only needs its top level docstring
+            write_module(unit)
+            return
+        node, name = symbol_graph.nodes[unit]["module"], symbol_graph.nodes[unit]["name"]
+        if get_documenter(node).document_function(name, visited, cache):
+            write_module(node)
+
+    units = list(symbol_graph.nodes) + [node for node, analysis in analyses.items() if not analysis.functions]
+    required_symbols = {symbol: set(symbol_graph.predecessors(symbol)) for symbol in symbol_graph.nodes}
+    priorities = get_priorities(symbol_graph)
+    return PipelineScheduler(units, required_symbols, document, visited, max_concurrency, priorities).run()
+
+
+def docgen(
+        G: nx.DiGraph,
+        package_name: str,
+        workers: int | None = None,
+        cache: DocstringCache | None = None,
+        cache_prompt_prefix: bool = False,
+        pipelined: bool = False,
+        max_concurrency: int = 4,
+        function_granularity: bool = False,
+        streaming: bool = False
+) -> None:
     """Generate docstring for an entire python package"""
-    queue = [node for node in G.nodes if G.in_degree(node) == 0]
+    if streaming:
+        # imported here as the pipeline builds on the helpers of this module
+        from docgen.pipeline import docgen_streaming
+        docgen_streaming(G, package_name, cache, cache_prompt_prefix, max_concurrency)
+        return
+
+    analyses = analyze_package(G, package_name, workers) if workers or pipelined or function_granularity else {}
+    if function_granularity:
+        docgen_functions(package_name, analyses, cache, max_concurrency)
+        return
+
+    if pipelined:
+        visited = SummaryStore()
+        # each module sends a request per function and one for its module docstring
+        requests = {node: len(analysis.functions) + 1 for node, analysis in analyses.items()}
+        PipelineScheduler(
+                G.nodes,
+                get_required_symbols(analyses),
+                lambda node: docgen_module(
+                        node,
+                        package_name,
+                        get_imported_modules(G, node, package_name),
+                        visited,
+                        analyses.get(node),
+                        cache,
+                        cache_prompt_prefix
+                ),
+                visited,
+                max_concurrency,
+                get_priorities(G, requests)
+        ).run()
+        return
+
     function_visited = {}
-    module_visited = set()
-    while queue:
-        node = queue.pop(0)
-        parents = list(G.predecessors(node))
-        function_visited = docgen_module(node, package_name, parents, function_visited)
-        module_visited.add(node)
-        queue.extend([n for n in G.successors(node) if n not in module_visited])
+    for unit in get_module_order(G):
+        if len(unit) > 1:
+            logging.info(f"Documenting import cycle of {len(unit)} modules as a unit: {unit}")
+        for node in unit:
+            parents = get_imported_modules(G, node, package_name)
+            function_visited = docgen_module(
+                    node, package_name, parents, function_visited, analyses.get(node), cache, cache_prompt_prefix
+            )
 
 
-def main(dependencies_file: str, package_name: str) -> None:
+def main(
+        dependencies_file: str,
+        package_name: str,
+        workers: int | None = None,
+        cache_file: str | None = None,
+        cache_prompt_prefix: bool = False,
+        pipelined: bool = False,
+        max_concurrency: int = 4,
+        function_granularity: bool = False,
+        streaming: bool = False
+) -> None:
     """Generate docstring for an entire python package"""
     logging.basicConfig(level=logging.INFO, encoding="utf-8")
-    G = build_graph_from_json(dependencies_file)
-    docgen(G, package_name)
+    run_docgen(
+            load_graph(dependencies_file),
+            package_name,
+            workers,
+            cache_file,
+            cache_prompt_prefix,
+            pipelined,
+            max_concurrency,
+            function_granularity,
+            streaming
+    )
+
+
+def run_docgen(
+        G: nx.DiGraph,
+        package_name: str,
+        workers: int | None = None,
+        cache_file: str | None = None,
+        cache_prompt_prefix: bool = False,
+        pipelined: bool = False,
+        max_concurrency: int = 4,
+        function_granularity: bool = False,
+        streaming: bool = False
+) -> None:
+    """Generate docstring for an entire python package from its dependency graph, saving the cache afterwards"""
+    cache = DocstringCache(cache_file)
+    try:
+        docgen(G, package_name, workers, cache, cache_prompt_prefix, pipelined, max_concurrency, function_granularity, streaming)
+    finally:
+        cache.save()
+        logging.info(f"Docstring cache: {cache.hits} hits, {cache.coalesced} coalesced, {cache.misses} misses")
+        logging.info(f"Prompt cache: {prompt_cache_stats}")
+        logging.info(f"Connection pool: {pool_stats}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate docstring for an entire python package")
     parser.add_argument("--dependencies_file", "-d", help="The file containing the dependencies of the package.")
     parser.add_argument("--package_name", "-p", help="The name of the package.")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Analyse modules in parallel with this many processes.")
+    parser.add_argument("--cache_file", help="A JSON file to reuse docstrings for identical functions across runs.")
+    parser.add_argument("--cache_prompt_prefix", action="store_true", help="Share a cacheable prompt prefix between the functions of a module.")
+    parser.add_argument("--pipelined", action="store_true", help="Start each module as soon as the summaries it uses are available.")
+    parser.add_argument("--max_concurrency", type=int, default=4, help="The number of modules or functions documented at once.")
+    parser.add_argument("--function_granularity", action="store_true", help="Schedule each function as soon as the functions it calls are documented.")
+    parser.add_argument("--streaming", action="store_true", help="Stream modules through bounded read, analyse, document and write stages.")
     args = parser.parse_args()
-    main(args.dependencies_file, args.package_name)
-
+    main(
+            args.dependencies_file,
+            args.package_name,
+            args.workers,
+            args.cache_file,
+            args.cache_prompt_prefix,
+            args.pipelined,
+            args.max_concurrency,
+            args.function_granularity,
+            args.streaming
+    )
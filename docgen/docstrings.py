@@ -1,50 +1,53 @@
+import functools
 import re
+import textwrap
 
-from typing import Optional
+from dataclasses import dataclass
+from typing import Callable, Optional
 
 from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
 
-def add_string(docstring: str, title: str, content: Optional[str]) -> str:
+NUMPY_SECTION_TEMPLATE = "{}\n{}"
+REST_FIELD_TEMPLATE = ":{} {}: {}"
+REST_UNNAMED_FIELD_TEMPLATE = ":{}: {}"
+
+def render_string(title: str, content: Optional[str]) -> str:
+    return f"{title}:\n\t{content}\n" if content else ""
+
+def render_list(title: str, content: Optional[list[str]]) -> str:
     if not content:
-        return docstring
-    docstring += f"{title}:\n\t{content}\n"
-    return docstring
+        return ""
+    return "".join([f"{title}:\n", *[f"\t{item}\n" for item in content]])
+
+def add_string(docstring: str, title: str, content: Optional[str]) -> str:
+    return docstring + render_string(title, content)
 
 def add_list(docstring: str, title: str, content: Optional[list[str]]) -> str:
-    if not content:
-        return docstring
-    docstring += f"{title}:\n"
-    for item in content:
-        docstring += f"\t{item}\n"
-    return docstring
+    return docstring + render_list(title, content)
 
 def build_function_docstring_from_object(docstring_object: FunctionDocstring) -> str:
-    init_docstring = f'{docstring_object.summary}\n\n{docstring_object.description}\n'
-
-    
-    init_docstring = add_list(init_docstring, "Args", docstring_object.parameters)
-    init_docstring = add_string(init_docstring, "Returns", docstring_object.returns)
-    init_docstring = add_list(init_docstring, "Raises", docstring_object.raises)
-    init_docstring = add_string(
-            init_docstring,
-            "Example",
-            docstring_object.example.replace("\n", "\n\t") if docstring_object.example else None
-    )
-    init_docstring = add_string(init_docstring, "Yields", docstring_object.yields)
-    return init_docstring
+    example = docstring_object.example
+    return "".join([
+        f'{docstring_object.summary}\n\n{docstring_object.description}\n',
+        render_list("Args", docstring_object.parameters),
+        render_string("Returns", docstring_object.returns),
+        render_list("Raises", docstring_object.raises),
+        render_string("Example", example.replace("\n", "\n\t") if example else None),
+        render_string("Yields", docstring_object.yields),
+    ])
 
 def build_module_docstring_from_object(docstring_object: ModuleDocstring) -> str:
-    init_docstring = docstring_object.summary
+    parts = [docstring_object.summary]
     if docstring_object.additional_info is not None:
-        init_docstring += "\n\n" + docstring_object.additional_info
+        parts.append("\n\n" + docstring_object.additional_info)
 
     if docstring_object.usage is not None:
-        init_docstring += "\n\nUsage:\n\t" + docstring_object.usage
+        parts.append("\n\nUsage:\n\t" + docstring_object.usage)
 
     if docstring_object.additional_info or docstring_object.usage:
-        init_docstring += "\n"
+        parts.append("\n")
 
-    return init_docstring
+    return "".join(parts)
 
 def calculate_indentation(function_code: str) -> str:
     function_code = function_code.strip()
@@ -60,3 +63,155 @@ def add_indentation(docstring: str, indentation: str) -> str:
     if indentation != "\t":
         docstring = docstring.replace("\t", indentation)
     return docstring
+
+
+@dataclass
+class RenderOptions:
+    """How generated function docstrings are written into the source code.
+
+    Attributes:
+        style: The docstring style, one of "google", "numpy" or "rest".
+        width: The maximum line length including indentation, or None to never wrap.
+    """
+    style: str = "google"
+    width: Optional[int] = None
+
+render_options = RenderOptions()
+
+@functools.lru_cache(maxsize=64)
+def get_wrapper(width: int, initial_indent: str, subsequent_indent: str) -> textwrap.TextWrapper:
+    return textwrap.TextWrapper(
+            width=width,
+            initial_indent=initial_indent,
+            subsequent_indent=subsequent_indent,
+            break_long_words=False,
+            break_on_hyphens=False
+    )
+
+def wrap_text(text: str, width: Optional[int], indent: str = "", subsequent_indent: Optional[str] = None) -> list[str]:
+    """Split text into lines, wrapping each line of the text to the width if there is one."""
+    subsequent_indent = indent if subsequent_indent is None else subsequent_indent
+    lines = []
+    for line in text.split("\n"):
+        if not line.strip():
+            lines.append("")
+        elif width is None or len(indent) + len(line) <= width:
+            lines.append(indent + line)
+        else:
+            lines.extend(get_wrapper(width, indent, subsequent_indent).wrap(line))
+    return lines
+
+def split_named_item(item: str) -> tuple[str, str, str]:
+    """Split an item such as "x (int): the value" into its name, type and description."""
+    name, separator, description = item.partition(":")
+    if not separator:
+        return "", "", item.strip()
+    name, _, type_name = name.partition("(")
+    return name.strip(), type_name.rstrip(") "), description.strip()
+
+def render_google_sections(docstring_object: FunctionDocstring, unit: str, width: Optional[int]) -> list[str]:
+    lines = []
+    for title, content in (
+        ("Args", docstring_object.parameters),
+        ("Returns", docstring_object.returns),
+        ("Raises", docstring_object.raises),
+        ("Example", docstring_object.example),
+        ("Yields", docstring_object.yields),
+    ):
+        if not content:
+            continue
+        lines.append(f"{title}:")
+        if title == "Example":
+            lines.extend(unit + line for line in content.split("\n")) # type: ignore
+        elif isinstance(content, list):
+            for item in content:
+                lines.extend(wrap_text(item, width, unit, unit * 2))
+        else:
+            lines.extend(wrap_text(content, width, unit))
+    return lines
+
+def render_numpy_sections(docstring_object: FunctionDocstring, unit: str, width: Optional[int]) -> list[str]:
+    lines = []
+    for title, content in (
+        ("Parameters", docstring_object.parameters),
+        ("Returns", docstring_object.returns),
+        ("Yields", docstring_object.yields),
+        ("Raises", docstring_object.raises),
+        ("Examples", docstring_object.example),
+    ):
+        if not content:
+            continue
+        lines.extend(["", *NUMPY_SECTION_TEMPLATE.format(title, "-" * len(title)).split("\n")])
+        if title == "Examples":
+            lines.extend(content.split("\n")) # type: ignore
+            continue
+        for item in content if isinstance(content, list) else [content]:
+            name, type_name, description = split_named_item(item)
+            if name:
+                lines.append(f"{name} : {type_name}" if type_name else name)
+                lines.extend(wrap_text(description, width, unit))
+            else:
+                lines.extend(wrap_text(description, width))
+    return lines
+
+def render_rest_sections(docstring_object: FunctionDocstring, unit: str, width: Optional[int]) -> list[str]:
+    fields = []
+    for item in docstring_object.parameters or []:
+        name, type_name, description = split_named_item(item)
+        fields.append(REST_FIELD_TEMPLATE.format("param", f"{type_name} {name}".strip(), description) if name else REST_UNNAMED_FIELD_TEMPLATE.format("param", description))
+    if docstring_object.returns:
+        fields.append(REST_UNNAMED_FIELD_TEMPLATE.format("returns", docstring_object.returns))
+    if docstring_object.yields:
+        fields.append(REST_UNNAMED_FIELD_TEMPLATE.format("yields", docstring_object.yields))
+    for item in docstring_object.raises or []:
+        name, _, description = split_named_item(item)
+        fields.append(REST_FIELD_TEMPLATE.format("raises", name, description) if name else REST_UNNAMED_FIELD_TEMPLATE.format("raises", description))
+
+    lines = [""] if fields else []
+    for field in fields:
+        lines.extend(wrap_text(field, width, "", unit))
+    if docstring_object.example:
+        lines.extend(["", "Example::", ""])
+        lines.extend(unit + line for line in docstring_object.example.split("\n"))
+    return lines
+
+STYLE_RENDERERS: dict[str, Callable[[FunctionDocstring, str, Optional[int]], list[str]]] = {
+    "google": render_google_sections,
+    "numpy": render_numpy_sections,
+    "rest": render_rest_sections,
+}
+
+def render_function_docstring(
+        docstring_object: FunctionDocstring,
+        indentation: str,
+        unit: str = "\t",
+        style: str = "google",
+        width: Optional[int] = None
+) -> str:
+    """Render a function docstring as an indented string literal, ready to be placed in the source code.
+
+    Args:
+        docstring_object: The generated docstring.
+        indentation: The indentation of the body of the function.
+        unit: One level of indentation, used for the items of each section.
+        style: The docstring style, one of "google", "numpy" or "rest".
+        width: The maximum line length including indentation, or None to never wrap.
+
+    Returns:
+        The docstring literal, from its indentation to its closing quotes.
+
+    Raises:
+        ValueError: If the style is unknown.
+    """
+    if style not in STYLE_RENDERERS:
+        raise ValueError(f"Unknown docstring style {style}, expected one of {list(STYLE_RENDERERS)}")
+    text_width = width - len(indentation.expandtabs(4)) if width else None
+    lines = [
+        *wrap_text(docstring_object.summary, text_width and text_width - 3),
+        "",
+        *wrap_text(docstring_object.description, text_width),
+        *STYLE_RENDERERS[style](docstring_object, unit, text_width),
+    ]
+    first, *rest = lines
+    body = "".join(f"{indentation}{line}\n" if line else "\n" for line in rest)
+    return "".join([indentation, '"""', first, "\n", body, indentation, '"""'])
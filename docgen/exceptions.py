@@ -3,3 +3,9 @@ class InternalFunctionCalledError(Exception):
 
 class FunctionNotFound(Exception):
     pass
+
+class BatchFailedError(Exception):
+    pass
+
+class ShardTimeoutError(Exception):
+    pass
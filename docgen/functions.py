@@ -1,12 +1,24 @@
 """This module contains functions for handling entire functions"""
 import ast
+import io
 import logging
-import re
+import tokenize
 
+from typing import Iterator, Optional
+
+from docgen.dedup import DocstringCache, fingerprint_function
 from docgen.exceptions import InternalFunctionCalledError
-from docgen.docstrings import calculate_indentation, add_indentation
+from docgen.docstrings import (
+        add_indentation,
+        calculate_indentation,
+        render_function_docstring,
+        render_options
+)
 from docgen.llm import generate_function_docstring
 from docgen.pydantic_models import FunctionDocstring
+from docgen.sources import SourceIndex
+
+MAX_USED_FUNCTIONS = 20
 
 def get_function_name(function: ast.FunctionDef) -> str:
     """Returns the name of the function"""
@@ -65,15 +77,21 @@ def get_used_functions(
         function: ast.FunctionDef,
         internal_functions: list[str],
         imported_functions: dict,
-        visited: dict
+        visited: dict,
+        max_used_functions: int | None = MAX_USED_FUNCTIONS
 ) -> list:
     """Return a list of the functions used in the function with respect to the imported functions
 
+    Each function is listed once however many times it is called. The most called functions come first, then the
+    functions called earliest in the body, and only the first `max_used_functions` are kept so the prompt for a large
+    function stays small. Only package functions that have already been documented have a summary to include.
+
     Args:
         function: The function AST object.
         internal_functions: The list of other functions called in the module that are not yet visited.
         imported_functions: The dictionary of imported functions from other modules in the package.
         visited: The dictionary of visited functions.
+        max_used_functions: The most functions to return, or None to return every function used.
 
     Returns:
         A list of tuples containing the name of the function and its summary.
@@ -82,22 +100,33 @@ def get_used_functions(
         InternalFunctionCalledError: If the function calls another function in the module which has not yet been visited.
     """
 
-    used_functions = []
-    
+    calls: dict[str, list] = {}
+
     for node in ast.walk(function):
         if isinstance(node, ast.Call):
             call_summary = handle_call(node, internal_functions, imported_functions, visited)
             if call_summary:
-                used_functions.append(call_summary)
-
-                    
-    return used_functions
+                name, summary = call_summary
+                position = (node.lineno, node.col_offset)
+                if name in calls:
+                    calls[name][0] += 1
+                    calls[name][1] = min(calls[name][1], position)
+                else:
+                    calls[name] = [1, position, summary]
+
+    ranked = sorted(calls.items(), key=lambda item: (-item[1][0], item[1][1]))
+    if max_used_functions is not None and len(ranked) > max_used_functions:
+        logging.info(f"Keeping the {max_used_functions} most relevant of {len(ranked)} used functions")
+        ranked = ranked[:max_used_functions]
+    return [(name, summary) for name, (_, _, summary) in ranked]
 
 def generate_docstring_for_function(
         function: ast.FunctionDef,
         internal_functions: list[tuple[str, ast.FunctionDef]],
         imported_functions: dict,
-        visited: dict
+        visited: dict,
+        cache: Optional[DocstringCache] = None,
+        module_context: Optional[str] = None
 ) -> FunctionDocstring:
     """Generate a docstring for the function
 
@@ -108,28 +137,60 @@ def generate_docstring_for_function(
         internal_functions: The list of other functions called in the module that are not yet visited.
         imported_functions: The dictionary of imported functions from other modules in the package.
         visited: The dictionary of visited functions.
+        cache: The cache used to deduplicate requests for identical functions.
+        module_context: The context shared by all functions in the module. If given, it is sent as a cacheable prompt prefix.
 
     Returns:
         A FunctionDocstring object which contains the information required to build a docstring.
 
+    Raises:
+        InternalFunctionCalledError: If the function calls another function in the module which has not yet been visited.
+    """
+    function_code, used_functions = prepare_function_for_llm(
+        function,
+        [name for name, _ in internal_functions],
+        imported_functions,
+        visited
+    )
+
+    if cache is None:
+        return generate_function_docstring(function_code, used_functions, module_context=module_context)
+
+    return cache.get_or_generate(
+        fingerprint_function(function, used_functions),
+        function.name,
+        lambda: generate_function_docstring(function_code, used_functions, module_context=module_context)
+    )
+
+
+def prepare_function_for_llm(
+        function: ast.FunctionDef,
+        internal_functions: list[str],
+        imported_functions: dict,
+        visited: dict
+) -> tuple[str, list]:
+    """Collect the functions used within the function and unparse it without its existing docstring.
+
+    Args:
+        function: The function AST object.
+        internal_functions: The names of other functions in the module that are not yet visited.
+        imported_functions: The dictionary of imported functions from other modules in the package.
+        visited: The dictionary of visited functions.
+
+    Returns:
+        The code of the function to send to the LLM and the list of used functions with their summaries.
+
     Raises:
         InternalFunctionCalledError: If the function calls another function in the module which has not yet been visited.
     """
     logging.info(f"Obtaining used functions for {function.name}")
-    used_functions = get_used_functions(function, [name for name, _ in internal_functions], imported_functions, visited)
-    
+    used_functions = get_used_functions(function, internal_functions, imported_functions, visited)
+
     # default is to just remove any existing docstring. TODO: parameterize this.
     if get_current_docstring(function):
         function = remove_current_docstring(function)
 
-    function_code = ast.unparse(function)
-
-    docstring = generate_function_docstring(
-        function_code,
-        used_functions
-    )
-
-    return docstring
+    return ast.unparse(function), used_functions
 
 
 def get_current_docstring(
@@ -168,8 +229,58 @@ def remove_current_docstring_from_source_code(
     Returns:
         The source code of the function without the docstring.
     """
-    function_code = re.sub(r'\n\s+\"\"\"(.|\n)*\"\"\"', '', function_code)
-    return function_code
+    span = find_docstring_lines(function_code)
+    if span is None:
+        return function_code
+    lines = function_code.splitlines(keepends=True)
+    return "".join(lines[:span[0] - 1] + lines[span[1]:])
+
+def read_signature(tokens: Iterator[tokenize.TokenInfo]) -> tuple[int, int] | None:
+    """Read tokens up to the colon ending a function signature, and return where the colon ends, or None if it does not."""
+    depth = 0
+    for token in tokens:
+        if token.type == tokenize.OP and token.string in "([{":
+            depth += 1
+        elif token.type == tokenize.OP and token.string in ")]}":
+            depth -= 1
+        elif token.type == tokenize.OP and token.string == ":" and depth == 0:
+            return token.end
+    return None
+
+def find_docstring_lines(function_code: str) -> tuple[int, int] | None:
+    """Find the lines of the docstring of a function by tokenizing its source code.
+
+    Tokens are read lazily and only up to the first statement of the body, so the cost does not depend on the length
+    of the function, and string literals later in the body are never mistaken for the docstring.
+
+    Args:
+        function_code: The source code of the function, starting at its `def` line.
+
+    Returns:
+        The first and last line of the docstring, starting from 1. None if there is no docstring, or if it shares a
+        line with the function signature.
+    """
+    tokens = tokenize.generate_tokens(io.StringIO(function_code).readline)
+    try:
+        signature_end = read_signature(tokens)
+        if signature_end is None:
+            return None
+
+        token = next(tokens)
+        while token.type in (tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT, tokenize.INDENT):
+            token = next(tokens)
+        if token.type != tokenize.STRING or token.start[0] == signature_end[0]:
+            return None
+        start = token.start[0]
+        while token.type == tokenize.STRING:
+            token = next(tokens)
+        while token.type == tokenize.COMMENT:
+            token = next(tokens)
+        if token.type not in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            return None
+        return start, token.start[0]
+    except (tokenize.TokenError, IndentationError, StopIteration):
+        return None
 
 def add_docstring_to_function(
         function_code: str,
@@ -191,3 +302,140 @@ def add_docstring_to_function(
     function_code = "\n".join(function_code_split)
     return function_code
 
+
+def get_line_offset(code: str, lineno: int) -> int:
+    """Return the offset of the start of a line, starting from 1, or the length of the code past the last line."""
+    offset = 0
+    for _ in range(lineno - 1):
+        offset = code.find("\n", offset) + 1
+        if offset == 0:
+            return len(code)
+    return offset
+
+def is_docstring(statement: ast.stmt) -> bool:
+    return isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant) and isinstance(statement.value.value, str)
+
+def get_first_lineno(statement: ast.stmt) -> int:
+    """Return the first line of a statement, which is the line of its first decorator for a decorated statement."""
+    return min([statement.lineno, *(decorator.lineno for decorator in getattr(statement, "decorator_list", []))])
+
+def get_docstring_edit(
+        index: SourceIndex,
+        function: ast.FunctionDef,
+        docstring_object: FunctionDocstring,
+        style: Optional[str] = None,
+        width: Optional[int] = None
+) -> tuple[int, int, str]:
+    """Locate the docstring of a function in the source of its module, or where to add one, and render the new one.
+
+    Only the lines from the signature to the first statement of the body are decoded and tokenized, so the cost does
+    not depend on the length of the function or of the module. Ranges of different functions never overlap, nested
+    functions included, so the edits of every function in a module can be spliced in at once.
+
+    Args:
+        index: The source of the module the function was parsed from.
+        function: The function AST object. Its body may no longer contain the old docstring.
+        docstring_object: The generated docstring.
+        style: The docstring style, defaulting to `render_options.style`.
+        width: The maximum line length, defaulting to `render_options.width`.
+
+    Returns:
+        The start and end offsets of the source to replace, and the source to replace it with.
+    """
+    first = function.body[0]
+    if index.text(index.line_offset(first.lineno), index.offset(first.lineno, first.col_offset)).strip():
+        return get_one_line_docstring_edit(index, function, docstring_object, style, width)
+
+    first_lineno = get_first_lineno(first)
+    head_end = (first.end_lineno or first.lineno) if is_docstring(first) else first_lineno
+    head = index.text(index.offset(function.lineno, function.col_offset), index.line_offset(head_end + 1))
+    span = find_docstring_lines(head)
+    first_line, last_line = (function.lineno + span[0] - 1, function.lineno + span[1] - 1) if span else (first_lineno, None)
+    start = index.line_offset(first_line)
+    end = index.line_offset(last_line + 1) if last_line else start
+    line = index.get_line(first_line)
+    indentation = line[:len(line) - len(line.lstrip())]
+    unit = indentation[function.col_offset:] or indentation
+
+    docstring = render_function_docstring(
+            docstring_object,
+            indentation,
+            unit,
+            style or render_options.style,
+            width if width is not None else render_options.width
+    )
+    separator = "\n" if end < len(index) or not last_line else ""
+    return start, end, docstring + separator
+
+def get_one_line_docstring_edit(
+        index: SourceIndex,
+        function: ast.FunctionDef,
+        docstring_object: FunctionDocstring,
+        style: Optional[str] = None,
+        width: Optional[int] = None
+) -> tuple[int, int, str]:
+    """Move the body of a function which starts on the line of its signature to its own lines, after the new docstring.
+
+    A docstring on the line of the signature is replaced, along with the semicolon after it.
+
+    Args:
+        index: The source of the module the function was parsed from.
+        function: The function AST object. Its body may no longer contain the old docstring.
+        docstring_object: The generated docstring.
+        style: The docstring style, defaulting to `render_options.style`.
+        width: The maximum line length, defaulting to `render_options.width`.
+
+    Returns:
+        The start and end offsets of the source to replace, and the source to replace it with.
+    """
+    first = function.body[0]
+    signature_start = index.line_offset(function.lineno)
+    lines = iter(index.text(signature_start, index.line_offset(first.lineno + 1)).splitlines(keepends=True))
+    lineno, col = read_signature(tokenize.generate_tokens(lambda: next(lines, ""))) # type: ignore
+    line = index.get_line(function.lineno + lineno - 1)
+    start = index.line_offset(function.lineno + lineno - 1) + len(line[:col].encode("utf-8"))
+
+    statements = function.body[1:] if is_docstring(first) else function.body
+    line = index.get_line(function.lineno)
+    indentation = line[:len(line) - len(line.lstrip())]
+    unit = "\t" if "\t" in indentation else "    "
+    docstring = "\n" + render_function_docstring(
+            docstring_object,
+            indentation + unit,
+            unit,
+            style or render_options.style,
+            width if width is not None else render_options.width
+    )
+    if not statements:
+        return start, index.offset(function.end_lineno or function.lineno, function.end_col_offset or 0), docstring
+    following = statements[0]
+    following_lineno = get_first_lineno(following)
+    if following_lineno > first.lineno:
+        # only the old docstring was on the line of the signature, the rest of the body keeps its own lines
+        return start, index.line_offset(following_lineno), docstring + "\n"
+    return start, index.offset(following.lineno, following.col_offset), docstring + "\n" + indentation + unit
+
+def set_function_docstring(
+        function_code: str,
+        function: ast.FunctionDef,
+        docstring_object: FunctionDocstring,
+        style: Optional[str] = None,
+        width: Optional[int] = None
+) -> str:
+    """Replace the docstring of a function, or add one, rendered in the configured style.
+
+    Args:
+        function_code: The source code of the function, as returned by `ast.get_source_segment`.
+        function: The function AST object. Its body may no longer contain the old docstring.
+        docstring_object: The generated docstring.
+        style: The docstring style, defaulting to `render_options.style`.
+        width: The maximum line length, defaulting to `render_options.width`.
+
+    Returns:
+        The source code of the function with the new docstring.
+    """
+    # pad the function back to its position in the module, so the positions in the AST still apply
+    padding = "\n" * (function.lineno - 1) + " " * function.col_offset
+    index = SourceIndex(padding + function_code)
+    edit = get_docstring_edit(index, function, docstring_object, style, width)
+    return index.splice([edit])[len(padding):]
@@ -104,7 +104,7 @@ def get_module_imports(
         if not (isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom)):
             continue
         modules, functions, aliases = process_import_statement(node, current_package)
-        for module, function, alias in zip(modules, functions, aliases):
+        for imported, module, function, alias in zip(node.names, modules, functions, aliases):
             if module not in modules_imported:
                 continue
 
@@ -113,5 +113,6 @@ def get_module_imports(
                 value_parts.append(function)
             
             value = ".".join(value_parts)
-            output_aliases[alias or function] = value
+            # a module imported without an alias is bound to the name it was imported as
+            output_aliases[alias or imported.name] = value
     return output_aliases
@@ -1,19 +1,142 @@
+import ast
 import json
 import logging
 import os
+import threading
 
 from dotenv import load_dotenv
 from openai import OpenAI
 from openai.types.chat import ChatCompletion
 from typing import Optional
 
-from docgen.pydantic_models import FunctionDocstring, FunctionPrompt, ModuleDocstring, ModulePrompt
-from docgen.system_prompts import FUNCTION_DOCSTRING_SYSTEM_PROMPT, MODULE_DOCSTRING_SYSTEM_PROMPT
+from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
+from docgen.system_prompts import (
+        FUNCTION_DOCSTRING_SYSTEM_PROMPT,
+        MODULE_DOCSTRING_SYSTEM_PROMPT,
+        PACKAGE_DOCSTRING_SYSTEM_PROMPT,
+        PACKAGE_PART_SYSTEM_PROMPT,
+        REPAIR_SYSTEM_PROMPT
+)
+from docgen.templates import (
+        render_function_prompt,
+        render_module_context,
+        render_module_prompt,
+        render_package_prompt,
+        render_repair_prompt
+)
+from docgen.transport import ClientOptions, PoolStats, build_http_client
+from docgen.validation import CompiledSchema, check_function_docstring, validate_tool_output
 
 
 load_dotenv()
 api_key = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=api_key)
+pool_stats = PoolStats()
+
+def build_client(options: ClientOptions) -> OpenAI:
+    """Build an OpenAI client which sends every request through a pool configured by the options."""
+    return OpenAI(
+            api_key=api_key,
+            base_url=options.base_url,
+            timeout=options.build_timeout(),
+            max_retries=options.max_retries,
+            http_client=build_http_client(options, pool_stats)
+    )
+
+client = build_client(ClientOptions())
+
+def configure_client(options: ClientOptions) -> None:
+    """Replace the client used for every request with one built from the options, closing the previous one."""
+    global client
+    previous, client = client, build_client(options)
+    previous.close()
+
+MODEL = "gpt-4"
+FUNCTION_DOCSTRING_TOOL_DESCRIPTION = "A docstring for an arbitrary function. Include the name of the function."
+MODULE_DOCSTRING_TOOL_DESCRIPTION = "A docstring for an arbitrary module."
+JSON_DECODE_ERROR_MESSAGE = "This response resulted in a JSON decode error. Please try again."
+MAX_REPAIR_ATTEMPTS = 2
+MAX_REPAIR_FRAGMENT_LENGTH = 4000
+
+def build_tool(function_name: str, function_desc: str, function_params: dict) -> dict:
+    """Build the `tools` and `tool_choice` arguments which force a call to a single tool."""
+    return {
+        "tools": [{
+            "type": "function",
+            "function": {
+                "name": function_name,
+                "description": function_desc,
+                "parameters": function_params
+            }
+        }],
+        "tool_choice": {
+            "type": "function",
+            "function": {"name": function_name}
+        }
+    }
+
+# the schemas never change, so the tool definitions are built once and shared by every request
+FUNCTION_DOCSTRING_TOOL = build_tool("FunctionDocstring", FUNCTION_DOCSTRING_TOOL_DESCRIPTION, FunctionDocstring.model_json_schema())
+MODULE_DOCSTRING_TOOL = build_tool("ModuleDocstring", MODULE_DOCSTRING_TOOL_DESCRIPTION, ModuleDocstring.model_json_schema())
+FUNCTION_DOCSTRING_SCHEMA = CompiledSchema(FunctionDocstring)
+MODULE_DOCSTRING_SCHEMA = CompiledSchema(ModuleDocstring)
+
+def build_request_with_tool(
+        system_prompt: str,
+        user_prompt: str,
+        tool: dict,
+        prev_response: tuple[str, str] = ("", ""),
+        prefix_prompts: Optional[list[str]] = None
+) -> dict:
+    """Build the keyword arguments of a chat completion request from a prebuilt tool definition.
+
+    The tool schema and system prompt come first and any `prefix_prompts` follow them, so that requests which share
+    them also share a prompt prefix that the provider can cache. Only the final user prompt differs between them.
+
+    Args:
+        system_prompt: The system prompt.
+        user_prompt: The user prompt.
+        tool: The `tools` and `tool_choice` arguments, as built by `build_tool`.
+        prev_response: A previous failed response and the error it caused, if retrying.
+        prefix_prompts: User prompts shared by many requests, sent before the previous response and the user prompt.
+
+    Returns:
+        The request body, as sent to the chat completions endpoint.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    if prefix_prompts:
+        messages.extend([{"role": "user", "content": prompt} for prompt in prefix_prompts])
+    if prev_response[0]:
+        messages.append({"role": "assistant", "content": prev_response[0]})
+        messages.append({"role": "user", "content": prev_response[1]})
+    messages.append({"role": "user", "content": user_prompt})
+
+    return {"model": MODEL, "messages": messages, "tools": tool["tools"], "tool_choice": tool["tool_choice"]}
+
+def build_chat_request(
+        system_prompt: str,
+        user_prompt: str,
+        function_name: str,
+        function_desc: str,
+        function_params: dict,
+        prev_response: tuple[str, str] = ("", ""),
+        prefix_prompts: Optional[list[str]] = None
+) -> dict:
+    """Build the keyword arguments of a chat completion request which forces a call to a single tool.
+
+    Args:
+        system_prompt: The system prompt.
+        user_prompt: The user prompt.
+        function_name: The name of the tool the LLM must call.
+        function_desc: The description of the tool.
+        function_params: The JSON schema of the tool parameters.
+        prev_response: A previous failed response and the error it caused, if retrying.
+        prefix_prompts: User prompts shared by many requests, sent before the previous response and the user prompt.
+
+    Returns:
+        The request body, as sent to the chat completions endpoint.
+    """
+    tool = build_tool(function_name, function_desc, function_params)
+    return build_request_with_tool(system_prompt, user_prompt, tool, prev_response, prefix_prompts)
 
 def make_call_to_llm(
         system_prompt: str,
@@ -24,60 +147,202 @@ def make_call_to_llm(
         prev_response: tuple[str, str] = ("", "")
 ) -> ChatCompletion:
 
-    messages = [{"role": "system", "content": system_prompt}]
-    if len(prev_response[0]) == 0:
-        messages.extend([
-            {"role": "user", "content": prev_response[0]},
-            {"role": "assistant", "content": prev_response[1]}
-        ])
-    messages.append({"role": "user", "content": user_prompt})
+    request = build_chat_request(system_prompt, user_prompt, function_name, function_desc, function_params, prev_response)
+    return client.chat.completions.create(**request)
 
-    return client.chat.completions.create(
-            model="gpt-4",
-            messages=messages, # type: ignore
-            tools=[{
-                "type": "function",
-                "function": {
-                    "name": function_name,
-                    "description": function_desc,
-                    "parameters": function_params
-                }
-            }],
-            tool_choice={
-                "type": "function",
-                "function": {"name": function_name}
-            }
-        )
+def build_function_docstring_request(
+        code: str,
+        functions_used: list[tuple[str, str]],
+        prev_response: Optional[str] = None,
+        module_context: Optional[str] = None
+) -> dict:
+    """Build the request for a function docstring.
 
-def generate_function_docstring(code: str, functions_used: list[tuple[str, str]], prev_response: Optional[str] = None) -> FunctionDocstring:
-    
-    prompt = FunctionPrompt(code=code, used_functions=functions_used).build_prompt()
-    info_for_llm = ("", "")
-    if prev_response:
-        error_message = "This response resulted in a JSON decode error. Please try again."
-        info_for_llm = (prev_response, str(error_message))
+    If `module_context` is given, it is sent as a shared prefix and the per-function prompt only contains the code,
+    as the used functions are already part of the module context.
+    """
+    if module_context is None:
+        prompt = render_function_prompt(code, functions_used)
+        prefix_prompts = None
+    else:
+        prompt = render_function_prompt(code, None)
+        prefix_prompts = [module_context]
 
-    logging.info("LLM Request for function docstring")
-    args = make_call_to_llm(
-            FUNCTION_DOCSTRING_SYSTEM_PROMPT,
-            prompt,
-            "FunctionDocstring",
-            "A docstring for an arbitrary function. Include the name of the function.",
-            FunctionDocstring.model_json_schema(),
-            info_for_llm
-    ).choices[0].message.tool_calls[0].function.arguments # type: ignore
+    info_for_llm = (prev_response, JSON_DECODE_ERROR_MESSAGE) if prev_response else ("", "")
+    return build_request_with_tool(FUNCTION_DOCSTRING_SYSTEM_PROMPT, prompt, FUNCTION_DOCSTRING_TOOL, info_for_llm, prefix_prompts)
+
+def build_module_context(module_name: str, used_functions: list[tuple[str, str]]) -> str:
+    """Build the context shared by the function requests of a module, with the used functions in a stable order."""
+    return render_module_context(module_name, sorted(set(used_functions)))
 
+def build_module_docstring_request(
+        module_name: str,
+        functions: list[tuple[str, str]],
+        if_name_main: Optional[str] = None,
+        prev_response: Optional[str] = None
+) -> dict:
+    prompt = render_module_prompt(module_name, functions, if_name_main)
+    info_for_llm = (prev_response, JSON_DECODE_ERROR_MESSAGE) if prev_response else ("", "")
+    return build_request_with_tool(MODULE_DOCSTRING_SYSTEM_PROMPT, prompt, MODULE_DOCSTRING_TOOL, info_for_llm)
+
+def build_package_docstring_request(
+        package_name: str,
+        items: list[tuple[str, str]],
+        part: Optional[tuple[int, int]] = None,
+        prev_response: Optional[str] = None
+) -> dict:
+    """Build the request for a package docstring, or for the summary of one part of a package if `part` is given."""
+    prompt = render_package_prompt(package_name, items, part)
+    system_prompt = PACKAGE_DOCSTRING_SYSTEM_PROMPT if part is None else PACKAGE_PART_SYSTEM_PROMPT
+    info_for_llm = (prev_response, JSON_DECODE_ERROR_MESSAGE) if prev_response else ("", "")
+    return build_request_with_tool(system_prompt, prompt, MODULE_DOCSTRING_TOOL, info_for_llm)
+
+class PromptCacheStats:
+    """Running totals of the prompt tokens sent and the prompt tokens the provider served from its cache."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, completion: ChatCompletion) -> None:
+        usage = completion.usage
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None) or {}
+        cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.prompt_tokens
+            self.cached_tokens += cached_tokens or 0
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.requests} requests, {self.cached_tokens}/{self.prompt_tokens} prompt tokens cached ({self.cached_ratio:.1%})"
+
+prompt_cache_stats = PromptCacheStats()
+
+def send_request(request: dict) -> str:
+    completion = client.chat.completions.create(**request)
+    prompt_cache_stats.record(completion)
+    return get_tool_arguments(completion)
+
+def get_tool_arguments(completion: ChatCompletion) -> str:
+    return completion.choices[0].message.tool_calls[0].function.arguments # type: ignore
+
+def get_function_name(code: str) -> str | None:
+    """Return the name of the function defined by the code sent to the LLM."""
+    for line in code.splitlines():
+        line = line.strip()
+        if line.startswith(("def ", "async def ")):
+            return line.removeprefix("async ").removeprefix("def ").split("(")[0].strip()
+    return None
+
+def build_repair_request(fragment: str, errors: list[str], tool: dict) -> dict:
+    """Build a request to fix invalid tool output, containing only the output and its problems."""
+    prompt = render_repair_prompt(fragment[:MAX_REPAIR_FRAGMENT_LENGTH], errors)
+    return build_request_with_tool(REPAIR_SYSTEM_PROMPT, prompt, tool)
+
+def parse_tool_output(
+        args: str,
+        schema: CompiledSchema,
+        tool: dict,
+        defaults: Optional[dict] = None,
+        max_repairs: int = MAX_REPAIR_ATTEMPTS
+):
+    """Validate tool output against its compiled schema, fixing it locally or with targeted repair requests.
+
+    Problems that can be fixed locally never reach the LLM. Otherwise a repair request is sent containing only the
+    output and its problems, rather than the whole conversation, and its fields are applied on top of the valid ones.
+
+    Args:
+        args: The arguments of the tool call.
+        schema: The compiled schema of the tool output.
+        tool: The tool the output must be a call to.
+        defaults: Values used for fields missing from the output.
+        max_repairs: The number of repair requests to send before giving up.
+
+    Returns:
+        The docstring model, or None if the output could not be repaired.
+    """
+    data, errors = validate_tool_output(args, schema, defaults)
+    for _ in range(max_repairs):
+        if not errors:
+            break
+        logging.warning(f"Invalid tool output, requesting a repair: {errors}")
+        fragment = args if data is None else json.dumps({key: value for key, value in data.items() if value is not None})
+        repaired, repair_errors = validate_tool_output(send_request(build_repair_request(fragment, errors, tool)), schema, defaults, data)
+        if repaired is not None:
+            data, errors = repaired, repair_errors
+    if errors or data is None:
+        return None
+    return schema.build(data)
+
+def check_and_repair_function_docstring(
+        code: str,
+        docstring: FunctionDocstring,
+        max_repairs: int = MAX_REPAIR_ATTEMPTS
+) -> FunctionDocstring:
+    """Check a function docstring against the code of the function, sending a repair request only if they disagree.
+
+    Most docstrings pass the local checks (see `check_function_docstring`), so they cost no further requests. If the
+    problems remain after `max_repairs` repairs, the last docstring is kept and the problems are logged.
+
+    Args:
+        code: The code of the function sent to the LLM.
+        docstring: The docstring generated for the function.
+        max_repairs: The number of repair requests to send before keeping the docstring as it is.
+
+    Returns:
+        The docstring, repaired if it disagreed with the code.
+    """
     try:
-        docstring = FunctionDocstring(**json.loads(args))
-        log_message = f"Generated docstring for: {docstring.function_name}"
-        logging.info(log_message)
+        tree = ast.parse(code)
+    except SyntaxError:
         return docstring
-    except json.decoder.JSONDecodeError as e:
-        logging.error("Failed to generate docstring for: ", code)
-        logging.error("LLM output:", [args])
-        logging.error("There was a JSONDecodeError:", e)
+    function = next((node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))), None)
+    if function is None:
+        return docstring
+
+    problems = check_function_docstring(function, docstring)
+    for _ in range(max_repairs):
+        if not problems:
+            return docstring
+        logging.warning(f"Docstring for {function.name} disagrees with its code, requesting a repair: {problems}")
+        fragment = json.dumps(docstring.model_dump(exclude_none=True))
+        args = send_request(build_repair_request(fragment, problems, FUNCTION_DOCSTRING_TOOL))
+        repaired, errors = validate_tool_output(args, FUNCTION_DOCSTRING_SCHEMA, {"function_name": function.name})
+        if repaired is not None and not errors:
+            docstring = FUNCTION_DOCSTRING_SCHEMA.build(repaired) # type: ignore
+            problems = check_function_docstring(function, docstring)
+    if problems:
+        logging.warning(f"Keeping the docstring for {function.name} despite: {problems}")
+    return docstring
+
+def generate_function_docstring(
+        code: str,
+        functions_used: list[tuple[str, str]],
+        prev_response: Optional[str] = None,
+        module_context: Optional[str] = None
+) -> FunctionDocstring:
+    
+    request = build_function_docstring_request(code, functions_used, prev_response, module_context)
+
+    logging.info("LLM Request for function docstring")
+    args = send_request(request)
+
+    docstring = parse_tool_output(args, FUNCTION_DOCSTRING_SCHEMA, FUNCTION_DOCSTRING_TOOL, {"function_name": get_function_name(code)})
+    if docstring is None:
+        logging.error(f"Failed to generate docstring for: {code}")
         logging.warning("Trying again...")
-        return generate_function_docstring(code, functions_used, args)
+        return generate_function_docstring(code, functions_used, args, module_context)
+    docstring = check_and_repair_function_docstring(code, docstring) # type: ignore
+    logging.info(f"Generated docstring for: {docstring.function_name}")
+    return docstring
 
 def generate_module_docstring(
         module_name: str,
@@ -86,31 +351,46 @@ def generate_module_docstring(
         prev_response: Optional[str] = None
 ) -> ModuleDocstring:
 
-    prompt = ModulePrompt(module_name=module_name, functions=functions, if_name_main=if_name_main).build_prompt()
-    info_for_llm = ("", "")
-    if prev_response:
-        error_message = "This response resulted in a JSON decode error. Please try again."
-        info_for_llm = (prev_response, str(error_message))
+    request = build_module_docstring_request(module_name, functions, if_name_main, prev_response)
 
     log_message = f"LLM request for module ({module_name}) docstring"
     logging.info(log_message)
-    args = make_call_to_llm(
-            MODULE_DOCSTRING_SYSTEM_PROMPT,
-            prompt,
-            "ModuleDocstring",
-            "A docstring for an arbitrary module.",
-            ModuleDocstring.model_json_schema(),
-            info_for_llm
-    ).choices[0].message.tool_calls[0].function.arguments # type: ignore
+    args = send_request(request)
 
-    try:
-        docstring = ModuleDocstring(**json.loads(args))
-        log_message = f"Generated docstring for {module_name}"
-        logging.info(log_message)
-        return docstring
-    except json.decoder.JSONDecodeError as e:
-        logging.error("Failed to generate docstring for module: ", module_name)
-        logging.error("LLM output:", [args])
-        logging.error("There was a JSONDecodeError:", e)
+    docstring = parse_tool_output(args, MODULE_DOCSTRING_SCHEMA, MODULE_DOCSTRING_TOOL)
+    if docstring is None:
+        logging.error(f"Failed to generate docstring for module: {module_name}")
+        logging.warning("Trying again...")
+        return generate_module_docstring(module_name, functions, if_name_main, args)
+    logging.info(f"Generated docstring for {module_name}")
+    return docstring # type: ignore
+
+def generate_package_docstring(
+        package_name: str,
+        items: list[tuple[str, str]],
+        part: Optional[tuple[int, int]] = None,
+        prev_response: Optional[str] = None
+) -> ModuleDocstring:
+    """Generate the docstring of a package, or the summary of one part of it, from the summaries of its contents.
+
+    Args:
+        package_name: The fully qualified name of the package.
+        items: The modules and subpackages of the package, or of the part, with their summaries.
+        part: The index of the part and the number of parts, if only summarising part of the package.
+        prev_response: A previous response which could not be parsed, if retrying.
+
+    Returns:
+        The docstring of the package, or of the part.
+    """
+    request = build_package_docstring_request(package_name, items, part, prev_response)
+
+    logging.info(f"LLM request for package ({package_name}) docstring" + (f", part {part[0]} of {part[1]}" if part else ""))
+    args = send_request(request)
+
+    docstring = parse_tool_output(args, MODULE_DOCSTRING_SCHEMA, MODULE_DOCSTRING_TOOL)
+    if docstring is None:
+        logging.error(f"Failed to generate docstring for package: {package_name}")
         logging.warning("Trying again...")
-        return generate_module_docstring(module_name, functions, args)
+        return generate_package_docstring(package_name, items, part, args)
+    logging.info(f"Generated docstring for {package_name}")
+    return docstring # type: ignore
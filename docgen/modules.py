@@ -2,61 +2,97 @@
 import ast
 import logging
 import re
+import threading
 
-from docgen.docstrings import build_function_docstring_from_object, build_module_docstring_from_object
-from docgen.exceptions import InternalFunctionCalledError, FunctionNotFound
-from docgen.functions import generate_docstring_for_function, add_docstring_to_function, remove_current_docstring_from_source_code
+from typing import Optional
+
+from docgen.dedup import DocstringCache
+from docgen.docstrings import build_module_docstring_from_object
+from docgen.exceptions import InternalFunctionCalledError
+from docgen.functions import (
+        generate_docstring_for_function,
+        get_docstring_edit,
+        get_line_offset,
+        get_used_functions
+)
 from docgen.imports import get_module_imports
-from docgen.llm import generate_module_docstring
+from docgen.llm import build_module_context, generate_module_docstring
+from docgen.pydantic_models import FunctionDocstring
+from docgen.sources import SourceIndex
 
 def generate_docstrings_for_all_functions(
-        module_source_code: str,
+        module_source_code: str | SourceIndex,
         fq_module_name: str,
         imported_functions: dict[str, str],
         internal_functions: list[tuple[str, ast.FunctionDef]],
-        visited: dict[str, str]
+        visited: dict[str, str],
+        cache: Optional[DocstringCache] = None,
+        module_context: Optional[str] = None
 ) -> tuple[str, dict]:
     """Generate docstrings for all functions in the module.
 
     For each function in `internal_functions`, generate a docstring for it and add it to the source code.
 
     Args:
-        module_source_code (str): The source code of the module.
+        module_source_code (str | SourceIndex): The source code of the module.
         fq_module_name (str): The fully qualified name of the module.
         imported_functions (dict[str, str]): The dictionary of imported functions from other modules in the package.
         internal_functions (list[tuple[str, ast.FunctionDef]]): The list of all functions in the module.
         visited (dict[str, str]): The dictionary of visited functions.
+        cache (DocstringCache, optional): The cache used to deduplicate requests for identical functions.
+        module_context (str, optional): The context shared by all functions in the module, sent as a cacheable prompt prefix.
 
     Returns:
         tuple[str, dict]: The source code with docstrings added & a dictionary of visited functions
     """
-    new_source_code = module_source_code
+    docstrings = []
+    deferred = 0
     while internal_functions:
         name, function_obj = internal_functions.pop(0)
         logging.info(f"Generating docstring for function {name}")
+        # if every remaining function has been deferred in a row, they call each other in a cycle
+        in_cycle = deferred > len(internal_functions)
         try:
-            docstring_obj = generate_docstring_for_function(function_obj, internal_functions, imported_functions, visited)
+            docstring_obj = generate_docstring_for_function(
+                    function_obj, [] if in_cycle else internal_functions, imported_functions, visited, cache, module_context
+            )
         except InternalFunctionCalledError:
             logging.info(f"Moving function {name} to end of queue because it calls an internal function")
             internal_functions.append((name, function_obj))
+            deferred += 1
             continue
+        deferred = 0
 
         func_name = fq_module_name + '.' + name
         visited[func_name] = docstring_obj.summary
+        docstrings.append((function_obj, docstring_obj))
 
-        docstring = build_function_docstring_from_object(docstring_obj)
-        func_code = ast.get_source_segment(module_source_code, function_obj)
-        if func_code is not None:
-            logging.info(f"Removing existing docstring for {func_name}")
-            updated_func_code = remove_current_docstring_from_source_code(func_code)
-            updated_func_code = add_docstring_to_function(updated_func_code, docstring)
-            logging.info(f"Updating source code for function {name}")
-            new_source_code = new_source_code.replace(func_code, updated_func_code)
-        else:
-            raise FunctionNotFound("Unable to find source code for function")
-    new_source_code = new_source_code.rstrip() + "\n"
+    new_source_code = insert_function_docstrings(module_source_code, docstrings).rstrip() + "\n"
     return new_source_code, visited
 
+def insert_function_docstrings(
+        source: str | SourceIndex,
+        docstrings: list[tuple[ast.FunctionDef, FunctionDocstring]]
+) -> str:
+    """Replace the docstrings of functions in the source code of their module.
+
+    Every docstring is located through the line index of the module and spliced in at once, so the module is copied a
+    single time however many functions it has.
+
+    Args:
+        source (str | SourceIndex): The original source code of the module, which the functions were parsed from.
+        docstrings (list[tuple[ast.FunctionDef, FunctionDocstring]]): Each function AST object with its generated docstring.
+
+    Returns:
+        str: The source code with the docstrings of the functions replaced.
+    """
+    index = source if isinstance(source, SourceIndex) else SourceIndex(source)
+    edits = []
+    for function_obj, docstring_obj in docstrings:
+        logging.info(f"Replacing docstring for {function_obj.name}")
+        edits.append(get_docstring_edit(index, function_obj, docstring_obj))
+    return index.splice(edits)
+
 def get_all_internal_functions(module: ast.Module) -> list[tuple[str, ast.FunctionDef]]:
     """Get all functions in the module.
 
@@ -69,6 +105,22 @@ def get_all_internal_functions(module: ast.Module) -> list[tuple[str, ast.Functi
     return [(node.name, node) for node in ast.walk(module) if isinstance(node, ast.FunctionDef)]
     
 
+def get_existing_summaries(module: ast.Module, module_name: str) -> dict[str, str]:
+    """Use the first line of each existing function docstring as the summary of the function.
+
+    Args:
+        module: The module AST object.
+        module_name: The fully qualified name of the module.
+
+    Returns:
+        The summaries keyed by the fully qualified name of each function.
+    """
+    return {
+        f"{module_name}.{name}": docstring.strip().split("\n")[0]
+        for name, function in get_all_internal_functions(module)
+        if (docstring := ast.get_docstring(function))
+    }
+
 def add_top_level_docstring(
         source_code: str,
         module: ast.Module,
@@ -88,15 +140,34 @@ def add_top_level_docstring(
     """
     if_name_main = find_if_name_main(source_code)
     docstring_obj = generate_module_docstring(module_name, functions_in_module, if_name_main)
-    docstring = build_module_docstring_from_object(docstring_obj)
+    return replace_top_level_docstring(source_code, module, build_module_docstring_from_object(docstring_obj))
+
+def replace_top_level_docstring(source_code: str, module: ast.Module, docstring: str) -> str:
+    """Replace the top level docstring of the module, or add one if it does not exist.
+
+    Args:
+        source_code: The source code of the module.
+        module: The module AST object.
+        docstring: The new top level docstring.
 
-    current_docstring = ast.get_docstring(module)
-    if current_docstring:
-        source_code = source_code.replace(current_docstring, docstring)
-    else:
-        source_code = '"""' + docstring + '"""\n' + source_code
+    Returns:
+        The source code with the top level docstring replaced.
+    """
+    if ast.get_docstring(module) is None:
+        return '"""' + docstring + '"""\n' + source_code
 
-    return source_code
+    # replace exactly the string literal of the existing docstring, located by its offsets in the module
+    node = module.body[0]
+    start = get_source_offset(source_code, node.lineno, node.col_offset)
+    end = get_source_offset(source_code, node.end_lineno or node.lineno, node.end_col_offset or 0)
+    return source_code[:start] + '"""' + docstring + '"""' + source_code[end:]
+
+def get_source_offset(source_code: str, lineno: int, col_offset: int) -> int:
+    """Convert the line and UTF-8 byte column of an AST node into an offset in the source code."""
+    offset = get_line_offset(source_code, lineno)
+    line_end = source_code.find("\n", offset)
+    line = source_code[offset:line_end if line_end != -1 else len(source_code)]
+    return offset + len(line.encode("utf-8")[:col_offset].decode("utf-8"))
 
 def find_if_name_main(source_code: str) -> str|None:
     """Find the if __name__ == "__main__": block in the source code.
@@ -115,31 +186,144 @@ def find_if_name_main(source_code: str) -> str|None:
 
 
 def generate_docstrings_for_module(
-        source_code: str,
+        source_code: str | SourceIndex,
         imported_modules: list,
         visited: dict,
-        module_name: str
+        module_name: str,
+        imported_functions: dict[str, str] | None = None,
+        cache: Optional[DocstringCache] = None,
+        cache_prompt_prefix: bool = False
 ) -> tuple[str, dict]:
     """Generate docstrings for the module.
 
     Generate docstrings for all functions in the module, and then generate a top level docstring for the module.
 
     Args:
-        source_code: The source code of the module.
+        source_code: The source code of the module, or its line index.
         imported_modules: The list of imported modules.
         visited: The dictionary of visited functions.
         module_name: The fully qualified name of the module.
+        imported_functions: The imported functions of the module, if already resolved by `docgen.analysis`.
+        cache: The cache used to deduplicate requests for identical functions.
+        cache_prompt_prefix: Whether to send the functions used by the module as a prompt prefix shared by all function requests.
     
     Returns:
         tuple[str, dict]: The source code with docstrings added & a dictionary of visited functions
     """
-    tree = ast.parse(source_code)
+    index = source_code if isinstance(source_code, SourceIndex) else SourceIndex(source_code)
+    tree = ast.parse(index.view)
     package_name = ".".join(module_name.split(".")[:-1])
     internal_functions = get_all_internal_functions(tree)
-    imported_functions = get_module_imports(tree, set(imported_modules), package_name)
-    old_visited = set(visited.keys())
-    new_source_code, visited = generate_docstrings_for_all_functions(source_code, module_name, imported_functions, internal_functions, visited)
+    if imported_functions is None:
+        imported_functions = get_module_imports(tree, set(imported_modules), package_name)
+    module_context = None
+    if cache_prompt_prefix:
+        # the context is shared by every function of the module, so it lists every function used, not only the most called
+        module_context = build_module_context(
+                module_name, get_used_functions(tree, [], imported_functions, visited, max_used_functions=None) # type: ignore
+        )
+    # only the functions of this module are looked up, so the cost does not grow with the number of summaries
+    keys = dict.fromkeys(f"{module_name}.{name}" for name, _ in internal_functions)
+    old_keys = {key for key in keys if key in visited}
+    new_source_code, visited = generate_docstrings_for_all_functions(
+            index, module_name, imported_functions, internal_functions, visited, cache, module_context
+    )
     logging.info(f"Generated functional docstrings for module {module_name}")
-    new_functions = [(key, visited[key]) for key in (set(visited.keys()) - old_visited)]
-    new_source_code = add_top_level_docstring(new_source_code, ast.parse(new_source_code), new_functions, module_name)
+    new_functions = [(key, visited[key]) for key in keys if key in visited and key not in old_keys]
+    # the function docstrings all come after the top level docstring, so its position in the original tree still holds
+    new_source_code = add_top_level_docstring(new_source_code, tree, new_functions, module_name)
     return new_source_code, visited
+
+
+def generate_docstrings_for_selected_functions(
+        source_code: str,
+        module_name: str,
+        imported_functions: dict[str, str],
+        function_names: set[str],
+        visited: dict,
+        cache: Optional[DocstringCache] = None,
+        update_module_docstring: bool = True
+) -> tuple[str, dict]:
+    """Regenerate the docstrings of some of the functions in the module, leaving the others untouched.
+
+    Args:
+        source_code: The source code of the module.
+        module_name: The fully qualified name of the module.
+        imported_functions: The dictionary of imported functions from other modules in the package.
+        function_names: The names of the functions to document. Names which are not in the module are ignored.
+        visited: The dictionary of visited functions.
+        cache: The cache used to deduplicate requests for identical functions.
+        update_module_docstring: Whether to regenerate the top level docstring from the summaries of the module.
+
+    Returns:
+        tuple[str, dict]: The source code with docstrings updated & a dictionary of visited functions
+    """
+    tree = ast.parse(source_code)
+    all_functions = get_all_internal_functions(tree)
+    selected = [(name, function_obj) for name, function_obj in all_functions if name in function_names]
+    if not selected:
+        return source_code, visited
+
+    new_source_code, visited = generate_docstrings_for_all_functions(source_code, module_name, imported_functions, selected, visited, cache)
+    if update_module_docstring:
+        keys = dict.fromkeys(f"{module_name}.{name}" for name, _ in all_functions)
+        functions_in_module = [(key, visited[key]) for key in keys if key in visited]
+        new_source_code = add_top_level_docstring(new_source_code, ast.parse(new_source_code), functions_in_module, module_name)
+    return new_source_code, visited
+
+class ModuleDocumenter:
+    """Document the functions of a module one at a time, in any order, then assemble the documented module.
+
+    Used when scheduling at function granularity, where the functions of a module are documented by different workers
+    as soon as the functions they call are documented.
+    """
+
+    def __init__(self, source_code: str, module_name: str, imported_functions: dict[str, str]):
+        self.source_code = source_code
+        self.module_name = module_name
+        self.imported_functions = imported_functions
+        self.functions = get_all_internal_functions(ast.parse(source_code))
+        self.docstrings: dict[int, FunctionDocstring] = {}
+        self.remaining = {name for name, _ in self.functions}
+        self.lock = threading.Lock()
+
+    def document_function(self, name: str, visited: dict, cache: Optional[DocstringCache] = None) -> bool:
+        """Generate the docstring for every function in the module with the given name.
+
+        Args:
+            name: The name of the function.
+            visited: The dictionary of visited functions.
+            cache: The cache used to deduplicate requests for identical functions.
+
+        Returns:
+            bool: Whether this was the last function of the module to be documented.
+        """
+        docstring_obj = None
+        for index, (function_name, function_obj) in enumerate(self.functions):
+            if function_name != name:
+                continue
+            logging.info(f"Generating docstring for function {self.module_name}.{name}")
+            docstring_obj = generate_docstring_for_function(function_obj, [], self.imported_functions, visited, cache)
+            self.docstrings[index] = docstring_obj
+
+        with self.lock:
+            self.remaining.discard(name)
+            last = not self.remaining
+        if docstring_obj is not None:
+            visited[f"{self.module_name}.{name}"] = docstring_obj.summary
+        return last
+
+    def assemble(self) -> str:
+        """Add every function docstring and the top level docstring to the source code of the module.
+
+        Returns:
+            str: The documented source code.
+        """
+        docstrings = []
+        functions_in_module = {}
+        for index, (name, function_obj) in enumerate(self.functions):
+            docstring_obj = self.docstrings[index]
+            docstrings.append((function_obj, docstring_obj))
+            functions_in_module[f"{self.module_name}.{name}"] = docstring_obj.summary
+        new_source_code = insert_function_docstrings(self.source_code, docstrings).rstrip() + "\n"
+        return add_top_level_docstring(new_source_code, ast.parse(new_source_code), list(functions_in_module.items()), self.module_name)
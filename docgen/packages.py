@@ -0,0 +1,137 @@
+"""Generate the docstring of every `__init__.py` in a package tree from the summaries of its modules, bottom-up.
+
+Each package is summarised from the top level docstrings of its modules and the summaries of its subpackages, so it
+must run after the modules are documented. A package with more contents than fit in one request is summarised in
+map-reduce fashion: the contents are split into batches of siblings, each batch is summarised on its own, and the
+package docstring is generated from the summaries of the batches. Packages at the same depth run in parallel, deepest
+first, so every subpackage is summarised before its parent.
+"""
+import argparse
+import ast
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from docgen.dependencies import find_package_root
+from docgen.docstrings import build_module_docstring_from_object
+from docgen.llm import generate_package_docstring
+from docgen.modules import replace_top_level_docstring
+
+DEFAULT_BATCH_SIZE = 20
+
+
+def get_summary(source_code: str) -> str | None:
+    """Return the first paragraph of the top level docstring of a module, or None if it has no docstring."""
+    docstring = ast.get_docstring(ast.parse(source_code))
+    if not docstring:
+        return None
+    return " ".join(docstring.split("\n\n")[0].split())
+
+
+def find_packages(package_root: Path) -> list[Path]:
+    """Return the directories of the package tree which contain an `__init__.py`, the root included."""
+    return [package_root] + sorted(
+        path.parent for path in package_root.rglob("__init__.py") if path.parent != package_root
+    )
+
+
+def get_package_name(package: Path, package_root: Path) -> str:
+    return ".".join((package_root.name, *package.relative_to(package_root).parts))
+
+
+def get_module_items(package: Path, package_name: str) -> list[tuple[str, str]]:
+    """Return the modules directly inside a package with their summaries, skipping modules without a docstring."""
+    items = []
+    for path in sorted(package.glob("*.py")):
+        if path.name == "__init__.py":
+            continue
+        summary = get_summary(path.read_text())
+        if summary is None:
+            logging.info(f"Skipping module {package_name}.{path.stem}, which has no docstring")
+            continue
+        items.append((f"{package_name}.{path.stem}", summary))
+    return items
+
+
+def reduce_items(package_name: str, items: list[tuple[str, str]], batch_size: int) -> list[tuple[str, str]]:
+    """Summarise batches of sibling items until at most `batch_size` remain.
+
+    Args:
+        package_name: The fully qualified name of the package.
+        items: The modules and subpackages of the package with their summaries.
+        batch_size: The most items sent in a single request.
+
+    Returns:
+        The items, or the summaries of each batch of items, at most `batch_size` of them.
+    """
+    if batch_size < 2:
+        raise ValueError("The batch size must be at least 2")
+    while len(items) > batch_size:
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        items = [
+            (
+                f"{batch[0][0]} to {batch[-1][0]}",
+                generate_package_docstring(package_name, batch, (index, len(batches))).summary
+            )
+            for index, batch in enumerate(batches, start=1)
+        ]
+    return items
+
+
+def docgen_package(package: Path, package_name: str, items: list[tuple[str, str]], batch_size: int) -> str | None:
+    """Generate and write the docstring of a single package.
+
+    Returns:
+        The summary of the package, or None if none of its contents have a summary.
+    """
+    if not items:
+        logging.info(f"Skipping package {package_name}, as none of its contents have a summary")
+        return None
+    docstring_obj = generate_package_docstring(package_name, reduce_items(package_name, items, batch_size))
+    init_file = package / "__init__.py"
+    source_code = init_file.read_text()
+    init_file.write_text(replace_top_level_docstring(source_code, ast.parse(source_code), build_module_docstring_from_object(docstring_obj)))
+    return docstring_obj.summary
+
+
+def docgen_packages(package_root: Path, batch_size: int = DEFAULT_BATCH_SIZE, max_concurrency: int = 4) -> dict[str, str]:
+    """Generate the docstring of every package in a package tree, subpackages first.
+
+    Args:
+        package_root: The directory of the top level package.
+        batch_size: The most modules and subpackages sent in a single request.
+        max_concurrency: The number of packages documented at once.
+
+    Returns:
+        The summary of every documented package, keyed by fully qualified name.
+    """
+    packages = find_packages(package_root)
+    summaries: dict[str, str] = {}
+    children: dict[str, list[tuple[str, str]]] = {}
+    depths = sorted({len(package.relative_to(package_root).parts) for package in packages}, reverse=True)
+
+    def document(package: Path) -> tuple[str, str | None]:
+        package_name = get_package_name(package, package_root)
+        items = get_module_items(package, package_name)
+        items.extend(sorted(children.get(package_name, [])))
+        return package_name, docgen_package(package, package_name, items, batch_size)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for depth in depths:
+            level = [package for package in packages if len(package.relative_to(package_root).parts) == depth]
+            for package_name, summary in executor.map(document, level):
+                if summary is not None:
+                    summaries[package_name] = summary
+                    children.setdefault(package_name.rpartition(".")[0], []).append((package_name, summary))
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the docstring of every package from its module docstrings")
+    parser.add_argument("path", nargs="?", default=".", help="The package, or any module or directory inside it.")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="The most modules and subpackages sent in a single request.")
+    parser.add_argument("--max_concurrency", type=int, default=4, help="The number of packages documented at once.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, encoding="utf-8")
+    docgen_packages(find_package_root(args.path), args.batch_size, args.max_concurrency)
@@ -0,0 +1,219 @@
+"""Generate docstrings for a package as a streaming chain of stages connected by bounded queues.
+
+Modules flow through read → analyse → document → write one import cycle unit at a time, so only the modules in flight
+are held in memory and every stage overlaps with the others. A full queue blocks the stage feeding it, so a slow LLM
+stage holds back reading rather than letting sources pile up. The summaries of a module are dropped as soon as every
+module importing it has been documented.
+"""
+import ast
+import logging
+import networkx as nx
+import queue
+import threading
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Mapping
+
+from docgen.dedup import DocstringCache
+from docgen.dependencies import get_module_order
+from docgen.docgen import file_path_to_module_name, get_imported_modules
+from docgen.imports import get_module_imports
+from docgen.modules import generate_docstrings_for_module
+from docgen.store import SummaryStore, get_module_summaries
+
+_DONE = object()
+
+
+@dataclass
+class _Failure:
+    exception: BaseException
+
+
+@dataclass
+class StreamedModule:
+    """A module in flight through the pipeline. The source code is dropped once the module is written."""
+
+    node: str
+    module_name: str
+    imported_modules: list[str]
+    source_code: str
+    imported_functions: dict | None = None
+
+
+def run_stage(function: Callable, items: Iterable, workers: int = 1, maxsize: int = 8) -> Iterator:
+    """Apply a function to a stream of items in worker threads, yielding the results through a bounded queue.
+
+    The items are pulled lazily, so chaining stages builds a pipeline in which every stage runs concurrently. With more
+    than one worker, results are yielded in the order they finish.
+
+    Args:
+        function: The function applied to each item.
+        items: The input stream, typically the output of the previous stage.
+        workers: The number of worker threads.
+        maxsize: The capacity of the input and output queues of the stage.
+
+    Yields:
+        The result for each item.
+
+    Raises:
+        Exception: Any exception raised by the function or by the input stream, re-raised in the consumer.
+    """
+    inputs: queue.Queue = queue.Queue(maxsize)
+    outputs: queue.Queue = queue.Queue(maxsize)
+
+    def feed() -> None:
+        try:
+            for item in items:
+                inputs.put(item)
+        except BaseException as e:
+            outputs.put(_Failure(e))
+        for _ in range(workers):
+            inputs.put(_DONE)
+
+    def work() -> None:
+        while (item := inputs.get()) is not _DONE:
+            try:
+                outputs.put(function(item))
+            except BaseException as e:
+                outputs.put(_Failure(e))
+        outputs.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads.extend(threading.Thread(target=work, daemon=True) for _ in range(workers))
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    while finished < workers:
+        result = outputs.get()
+        if result is _DONE:
+            finished += 1
+        elif isinstance(result, _Failure):
+            raise result.exception
+        else:
+            yield result
+
+
+class ModuleSummaries:
+    """The summaries of documented modules, kept only until every module importing them has been documented."""
+
+    def __init__(self, G: nx.DiGraph, package_name: str):
+        self.G = G
+        self.package_name = package_name
+        self.importers_left = {node: G.out_degree(node) for node in G.nodes}
+        self.summaries: dict[str, dict[str, str]] = {}
+        self.documented: set[str] = set()
+        self.condition = threading.Condition()
+
+    def wait_for(self, nodes: Iterable[str]) -> SummaryStore:
+        """Block until the modules are documented and return their summaries."""
+        nodes = list(nodes)
+        with self.condition:
+            self.condition.wait_for(lambda: all(node in self.documented for node in nodes))
+            visited = SummaryStore()
+            for node in nodes:
+                visited.update(self.summaries.get(node, {}))
+            return visited
+
+    def publish(self, node: str, visited: Mapping[str, str]) -> None:
+        """Keep the summaries of a documented module and release those of the modules it imports, if no longer needed."""
+        summaries = get_module_summaries(visited, file_path_to_module_name(node, self.package_name))
+        with self.condition:
+            if self.importers_left[node]:
+                self.summaries[node] = summaries
+            self.documented.add(node)
+            for parent in self.G.predecessors(node):
+                self.importers_left[parent] -= 1
+                if self.importers_left[parent] == 0:
+                    self.summaries.pop(parent, None)
+            self.condition.notify_all()
+
+
+def read_unit(G: nx.DiGraph, package_name: str, unit: list[str]) -> list[StreamedModule]:
+    modules = []
+    for node in unit:
+        with open(node, "r") as f:
+            source_code = f.read()
+        module_name = file_path_to_module_name(node, package_name)
+        modules.append(StreamedModule(node, module_name, get_imported_modules(G, node, package_name), source_code))
+    return modules
+
+
+def analyze_unit(modules: list[StreamedModule]) -> list[StreamedModule]:
+    for module in modules:
+        module.imported_functions = get_module_imports(
+                ast.parse(module.source_code), set(module.imported_modules), module.module_name.rpartition(".")[0]
+        )
+    return modules
+
+
+def document_unit(
+        modules: list[StreamedModule],
+        G: nx.DiGraph,
+        summaries: ModuleSummaries,
+        cache: DocstringCache | None = None,
+        cache_prompt_prefix: bool = False
+) -> list[StreamedModule]:
+    """Document the modules of a unit one after another, once the modules they import from other units are documented."""
+    unit = {module.node for module in modules}
+    external = {parent for module in modules for parent in G.predecessors(module.node) if parent not in unit}
+    visited = summaries.wait_for(external)
+    for module in modules:
+        logging.info(f"Generating docstrings for module {module.module_name}")
+        module.source_code, visited = generate_docstrings_for_module(
+                module.source_code,
+                module.imported_modules,
+                visited,
+                module.module_name,
+                module.imported_functions,
+                cache,
+                cache_prompt_prefix
+        )
+    for module in modules:
+        summaries.publish(module.node, visited)
+    return modules
+
+
+def write_unit(modules: list[StreamedModule]) -> list[str]:
+    for module in modules:
+        logging.info(f"Writing updated source code to {module.module_name}")
+        with open(module.node, "w") as f:
+            f.write(module.source_code)
+    return [module.module_name for module in modules]
+
+
+def docgen_streaming(
+        G: nx.DiGraph,
+        package_name: str,
+        cache: DocstringCache | None = None,
+        cache_prompt_prefix: bool = False,
+        max_concurrency: int = 4,
+        queue_size: int = 8
+) -> list[str]:
+    """Generate docstrings for an entire python package as a streaming pipeline.
+
+    Units are fed in dependency order, so the unit a document worker waits on has always been taken by another worker
+    already, and the workers cannot wait on each other in a cycle.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        cache: The cache used to deduplicate requests for identical functions.
+        cache_prompt_prefix: Whether to share a cacheable prompt prefix between the functions of a module.
+        max_concurrency: The number of units documented at once.
+        queue_size: The capacity of the queues between stages.
+
+    Returns:
+        The names of the modules written, in the order they were written.
+    """
+    summaries = ModuleSummaries(G, package_name)
+    units = iter(get_module_order(G))
+    read = run_stage(lambda unit: read_unit(G, package_name, unit), units, 1, queue_size)
+    analyzed = run_stage(analyze_unit, read, 1, queue_size)
+    documented = run_stage(
+            lambda modules: document_unit(modules, G, summaries, cache, cache_prompt_prefix), analyzed, max_concurrency, queue_size
+    )
+    written = []
+    for module_names in run_stage(write_unit, documented, 1, queue_size):
+        written.extend(module_names)
+    return written
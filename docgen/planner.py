@@ -0,0 +1,206 @@
+"""Estimate the token usage, cost and wall time of a run before sending any requests.
+
+Every function and module request is built exactly as in a real run, with a placeholder for each summary that is not
+known yet, and its tokens are counted with `tiktoken` when it is installed and a character heuristic otherwise. The
+wall time is predicted by simulating the dependency and call graphs on a fixed number of workers.
+"""
+import ast
+import heapq
+import json
+import networkx as nx
+
+from dataclasses import dataclass, field
+
+from docgen.dependencies import build_symbol_graph
+from docgen.docgen import analyze_package
+from docgen.functions import MAX_USED_FUNCTIONS, prepare_function_for_llm
+from docgen.llm import MODEL, build_function_docstring_request, build_module_docstring_request
+from docgen.modules import find_if_name_main, get_all_internal_functions
+from docgen.scheduler import get_priorities
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PLACEHOLDER_SUMMARY = "A one sentence summary of what the function does, of a typical length for the model."
+FUNCTION_OUTPUT_TOKENS = 200
+MODULE_OUTPUT_TOKENS = 150
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text, at roughly four characters per token."""
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a text with the model's tokenizer if `tiktoken` is installed, otherwise estimate them."""
+    if tiktoken is None:
+        return estimate_tokens(text)
+    return len(tiktoken.encoding_for_model(MODEL).encode(text))
+
+
+def count_request_tokens(request: dict) -> int:
+    """Count the prompt tokens of a chat completion request, including the tool schema."""
+    text = "".join(message["content"] for message in request["messages"]) + json.dumps(request["tools"])
+    return count_tokens(text)
+
+
+@dataclass
+class RunPlan:
+    """The predicted requests, tokens, cost and wall time of a run."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    critical_path: list[str] = field(default_factory=list)
+    critical_path_seconds: float = 0.0
+    predicted_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return "\n".join([
+            f"Requests: {self.requests}",
+            f"Tokens: {self.input_tokens} input, {self.output_tokens} output",
+            f"Cost: ${self.cost:.2f}",
+            f"Critical path: {len(self.critical_path)} requests, {self.critical_path_seconds:.0f}s",
+            f"Predicted wall time: {self.predicted_seconds:.0f}s",
+        ])
+
+
+def build_task_graph(G: nx.DiGraph, package_name: str, workers: int | None = None) -> nx.DiGraph:
+    """Build every request of a run without sending it, as a graph of the requests each request must wait for.
+
+    Each function depends on the functions it calls, and each module docstring depends on the functions of its module.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        workers: The number of processes used to analyse the modules.
+
+    Returns:
+        The task graph, with the `input_tokens` and `output_tokens` of each request as node attributes.
+    """
+    analyses = analyze_package(G, package_name, workers)
+    tasks = build_symbol_graph(analyses)
+    for node, analysis in analyses.items():
+        with open(node, "r") as f:
+            source_code = f.read()
+        tree = ast.parse(source_code)
+        calls = {function.name: function.calls for function in analysis.functions}
+        functions = []
+        for name, function in get_all_internal_functions(tree):
+            symbol = f"{analysis.module_name}.{name}"
+            code, _ = prepare_function_for_llm(function, [], {}, {})
+            callees = list(dict.fromkeys(calls.get(name, [])))[:MAX_USED_FUNCTIONS]
+            used = [(callee.rpartition(".")[2], PLACEHOLDER_SUMMARY) for callee in callees]
+            request = build_function_docstring_request(code, used)
+            tasks.add_node(symbol, input_tokens=count_request_tokens(request), output_tokens=FUNCTION_OUTPUT_TOKENS)
+            functions.append((name, PLACEHOLDER_SUMMARY))
+
+        module_task = f"module:{analysis.module_name}"
+        request = build_module_docstring_request(analysis.module_name, functions, find_if_name_main(source_code))
+        tasks.add_node(module_task, input_tokens=count_request_tokens(request), output_tokens=MODULE_OUTPUT_TOKENS)
+        tasks.add_edges_from((f"{analysis.module_name}.{name}", module_task) for name, _ in functions)
+    return tasks
+
+
+def get_critical_path(C: nx.DiGraph, duration: dict) -> tuple[list, float]:
+    """Find the longest path through a directed acyclic graph, weighted by the duration of each node."""
+    finish: dict = {}
+    previous: dict = {}
+    for node in nx.topological_sort(C):
+        previous[node] = max(C.predecessors(node), key=finish.__getitem__, default=None)
+        finish[node] = duration[node] + (finish[previous[node]] if previous[node] is not None else 0.0)
+    if not finish:
+        return [], 0.0
+    node = max(finish, key=finish.__getitem__)
+    length = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return path[::-1], length
+
+
+def simulate_schedule(C: nx.DiGraph, duration: dict, max_concurrency: int) -> float:
+    """Simulate running a directed acyclic graph of tasks on a fixed number of workers.
+
+    Ready tasks start in the same order as in `PipelineScheduler`, longest chain of work depending on them first.
+
+    Returns:
+        The time the last task finishes.
+    """
+    priorities = get_priorities(C, duration)
+    key = {node: (-path, -fan_out, node) for node, (path, fan_out) in priorities.items()}
+    missing = {node: C.in_degree(node) for node in C.nodes}
+    ready = [key[node] for node in C.nodes if missing[node] == 0]
+    heapq.heapify(ready)
+    running: list = []
+    now = 0.0
+    while ready or running:
+        while ready and len(running) < max_concurrency:
+            *_, node = heapq.heappop(ready)
+            heapq.heappush(running, (now + duration[node], node))
+        now, node = heapq.heappop(running)
+        for successor in C.successors(node):
+            missing[successor] -= 1
+            if missing[successor] == 0:
+                heapq.heappush(ready, key[successor])
+    return now
+
+
+def plan_run(
+        G: nx.DiGraph,
+        package_name: str,
+        max_concurrency: int = 4,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        latency: float = 1.0,
+        output_tokens_per_second: float = 30.0,
+        input_price: float = 0.03,
+        output_price: float = 0.06,
+        workers: int | None = None
+) -> RunPlan:
+    """Predict the requests, tokens, cost and wall time of documenting a package.
+
+    The functions of an import or call cycle are documented one after another, so each cycle is condensed into a
+    single task taking as long as all of its requests. The wall time is the simulated schedule on `max_concurrency`
+    workers, unless the rate limits would take longer to send every request.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        max_concurrency: The number of requests in flight at once.
+        requests_per_minute: The request rate limit, if any.
+        tokens_per_minute: The token rate limit, if any.
+        latency: The time to the first token of each response, in seconds.
+        output_tokens_per_second: The rate at which each response is generated.
+        input_price: The price of 1000 input tokens.
+        output_price: The price of 1000 output tokens.
+        workers: The number of processes used to analyse the modules.
+
+    Returns:
+        The plan of the run.
+    """
+    tasks = build_task_graph(G, package_name, workers)
+    plan = RunPlan(requests=tasks.number_of_nodes())
+    plan.input_tokens = sum(tokens for _, tokens in tasks.nodes(data="input_tokens"))
+    plan.output_tokens = sum(tokens for _, tokens in tasks.nodes(data="output_tokens"))
+    plan.cost = plan.input_tokens / 1000 * input_price + plan.output_tokens / 1000 * output_price
+
+    C = nx.condensation(tasks)
+    duration = {
+        component: sum(latency + tasks.nodes[task]["output_tokens"] / output_tokens_per_second for task in members)
+        for component, members in C.nodes(data="members")
+    }
+    path, plan.critical_path_seconds = get_critical_path(C, duration)
+    plan.critical_path = [task for component in path for task in sorted(C.nodes[component]["members"])]
+
+    plan.predicted_seconds = simulate_schedule(C, duration, max_concurrency)
+    if requests_per_minute:
+        plan.predicted_seconds = max(plan.predicted_seconds, plan.requests / requests_per_minute * 60)
+    if tokens_per_minute:
+        total_tokens = plan.input_tokens + plan.output_tokens
+        plan.predicted_seconds = max(plan.predicted_seconds, total_tokens / tokens_per_minute * 60)
+    return plan
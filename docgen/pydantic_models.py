@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from docgen.templates import render_function_prompt, render_module_prompt
+
 class FunctionDocstring(BaseModel):
     function_name: str
     summary: str
@@ -21,15 +23,7 @@ class FunctionPrompt(BaseModel):
     used_functions: Optional[list[tuple[str, str]]]
 
     def build_prompt(self) -> str:
-        prompt = f'"""{self.code}\n\n'
-        if not self.used_functions:
-            return prompt + '"""'
-
-        prompt += "The following functions are used in the above code:\n\n"
-        for function, docstring in self.used_functions:
-            prompt += f'{function}:\n\t{docstring}\n\n'
-        prompt += '"""'
-        return prompt
+        return render_function_prompt(self.code, self.used_functions)
 
 class ModulePrompt(BaseModel):
     module_name: str
@@ -37,12 +31,17 @@ class ModulePrompt(BaseModel):
     functions: list[tuple[str, str]]
 
     def build_prompt(self) -> str:
-        prompt = f"The following functions are used in this module ({self.module_name}):\n\n"
-        for function, docstring in self.functions:
-            prompt += f'Function: {function}, Summary: {docstring}\n\n'
-
-        if self.if_name_main:
-            prompt += f"The following code is in the if __name__ == '__main__' block:\n\n{self.if_name_main}\n\n"
-        else:
-            prompt += "This module does not have a if __name__ == '__main__' block.\n\n"
-        return prompt
+        return render_module_prompt(self.module_name, self.functions, self.if_name_main)
+
+class FunctionAnalysis(BaseModel):
+    name: str
+    lineno: int
+    end_lineno: int
+    col_offset: int
+    calls: list[str] = Field(default_factory=list, description="Fully qualified names of the package functions called")
+
+class ModuleAnalysis(BaseModel):
+    module_name: str
+    file_path: str
+    imports: dict[str, str]
+    functions: list[FunctionAnalysis]
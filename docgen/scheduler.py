@@ -0,0 +1,185 @@
+"""This module contains the scheduler which documents modules concurrently as soon as the summaries they use exist.
+
+When more units are ready than there are workers, the unit with the longest chain of work depending on it starts first,
+then the unit with the most units depending on it. A helper called throughout the package is documented before a leaf
+script, so the workers are not left idle at the end of a run waiting on a long chain which started late.
+"""
+import heapq
+import logging
+import networkx as nx
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from docgen.pydantic_models import ModuleAnalysis
+from docgen.store import SummaryStore
+
+
+def get_required_symbols(analyses: dict[str, ModuleAnalysis]) -> dict[str, set[str]]:
+    """Find the functions from other modules whose summaries each module needs before it can be documented.
+
+    Calls to anything that is not a function defined in the package (e.g. a class) are ignored, as they never get a summary.
+
+    Args:
+        analyses: The analysis of each module, keyed by path.
+
+    Returns:
+        The fully qualified names of the required functions, keyed by the path of the module.
+    """
+    owners = {f"{analysis.module_name}.{function.name}": node for node, analysis in analyses.items() for function in analysis.functions}
+    return {
+        node: {
+            call
+            for function in analysis.functions
+            for call in function.calls
+            if call in owners and owners[call] != node
+        }
+        for node, analysis in analyses.items()
+    }
+
+
+def get_priorities(D: nx.DiGraph, duration: dict | None = None) -> dict[str, tuple[float, int]]:
+    """Rank each unit by the work which cannot start until it is done.
+
+    The nodes of a cycle are documented together, so they share the rank of their cycle.
+
+    Args:
+        D: The dependency graph of the units, with an edge from each unit to every unit depending on it.
+        duration: The relative duration of each unit, 1 for any unit missing.
+
+    Returns:
+        The length of the longest chain of units starting at each unit, weighted by duration, and the number of units
+        depending on it directly or transitively, keyed by unit.
+    """
+    duration = duration or {}
+    C = nx.condensation(D)
+    index = {node: i for i, node in enumerate(D.nodes)}
+    predecessors_left = {component: C.in_degree(component) for component in C.nodes}
+    # bitsets of the nodes downstream of each component, dropped once every predecessor has used them
+    downstream: dict[int, int] = {}
+    paths: dict[int, float] = {}
+    priorities = {}
+    for component in reversed(list(nx.topological_sort(C))):
+        members = C.nodes[component]["members"]
+        own = sum(1 << index[node] for node in members)
+        mask = 0
+        path = 0.0
+        for successor in C.successors(component):
+            mask |= downstream[successor]
+            path = max(path, paths[successor])
+            predecessors_left[successor] -= 1
+            if predecessors_left[successor] == 0:
+                del downstream[successor]
+        path += sum(duration.get(node, 1) for node in members)
+        paths[component] = path
+        fan_out = mask.bit_count() + len(members) - 1
+        if predecessors_left[component]:
+            downstream[component] = mask | own
+        for node in members:
+            priorities[node] = (path, fan_out)
+    return priorities
+
+
+class PipelineScheduler:
+    """Document units of work concurrently, starting each unit as soon as the specific summaries it uses are available.
+
+    A unit is either a module or a single function. A module does not wait for the modules it imports to finish, only
+    for the functions it calls from them. As `document` generates the module docstring right after its last function
+    docstring, the module request is dispatched as soon as the last function summary arrives.
+
+    Ready units wait in a heap and start in order of priority, highest first, as workers become free (see
+    `get_priorities`). Units without a priority come last, in name order.
+
+    If no unit is running and none is ready, the dependencies form a cycle. The waiting unit with the fewest missing
+    summaries is then documented with the summaries available so far.
+    """
+
+    def __init__(
+            self,
+            units: Iterable[str],
+            required_symbols: dict[str, set[str]],
+            document: Callable[[str], None],
+            visited: SummaryStore,
+            max_workers: int = 4,
+            priorities: dict[str, tuple] | None = None
+    ):
+        self.document = document
+        self.visited = visited
+        self.max_workers = max_workers
+        self.missing: dict[str, int] = {}
+        self.waiters: dict[str, list[str]] = {}
+        for node in units:
+            missing = {symbol for symbol in required_symbols.get(node, set()) if symbol not in visited}
+            self.missing[node] = len(missing)
+            for symbol in missing:
+                self.waiters.setdefault(symbol, []).append(node)
+        self.priorities = priorities or {}
+        self.ready: list[tuple] = []
+        self.running = 0
+        self.errors: list[BaseException] = []
+        self.condition = threading.Condition()
+        self.executor: ThreadPoolExecutor | None = None
+
+    def on_summary(self, key: str, value: str) -> None:
+        with self.condition:
+            for node in self.waiters.pop(key, []):
+                if node in self.missing:
+                    self.missing[node] -= 1
+                    if self.missing[node] == 0:
+                        self.make_ready(node)
+            self.dispatch()
+
+    def make_ready(self, node: str) -> None:
+        del self.missing[node]
+        priority = self.priorities.get(node, (0, 0))
+        heapq.heappush(self.ready, (tuple(-value for value in priority), node))
+
+    def dispatch(self) -> None:
+        while self.ready and self.running < self.max_workers:
+            _, node = heapq.heappop(self.ready)
+            self.running += 1
+            logging.info(f"Dispatching {node}")
+            self.executor.submit(self.run_unit, node) # type: ignore
+
+    def dispatch_with_partial_summaries(self) -> None:
+        node = min(sorted(self.missing), key=lambda n: self.missing[n])
+        logging.warning(f"Import cycle detected, documenting {node} with {self.missing[node]} summaries missing")
+        self.make_ready(node)
+        self.dispatch()
+
+    def run_unit(self, node: str) -> None:
+        try:
+            self.document(node)
+        except BaseException as e:
+            with self.condition:
+                self.errors.append(e)
+        finally:
+            with self.condition:
+                self.running -= 1
+                self.condition.notify_all()
+
+    def run(self) -> SummaryStore:
+        """Document every unit.
+
+        Returns:
+            The summaries of every documented function.
+
+        Raises:
+            Exception: The first exception raised while documenting a unit.
+        """
+        self.visited.subscribe(self.on_summary)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.executor = executor
+            with self.condition:
+                for node in [n for n, missing in self.missing.items() if missing == 0]:
+                    self.make_ready(node)
+                while (self.missing or self.ready or self.running) and not self.errors:
+                    self.dispatch()
+                    if not self.running:
+                        self.dispatch_with_partial_summaries()
+                    self.condition.wait()
+
+        if self.errors:
+            raise self.errors[0]
+        return self.visited
@@ -0,0 +1,180 @@
+"""Generate docstrings for a package across several workers, e.g. on separate machines, sharing summaries through a store.
+
+The package is partitioned into shards of similar estimated token cost with `plan`. Each worker documents one shard with
+`run`, waiting for the summaries of modules from other shards through the shared result store. Finally `merge` writes
+every documented module back to the package in a fixed order.
+"""
+import argparse
+import json
+import logging
+import networkx as nx
+import time
+
+from docgen.dedup import DocstringCache
+from docgen.dependencies import get_module_order, load_graph
+from docgen.docgen import file_path_to_module_name, get_imported_modules
+from docgen.exceptions import ShardTimeoutError
+from docgen.modules import generate_docstrings_for_module
+from docgen.planner import count_tokens
+from docgen.store import DirectoryResultStore, SQLiteResultStore, SummaryStore, get_module_summaries, open_result_store
+
+ResultStore = DirectoryResultStore | SQLiteResultStore
+
+
+def estimate_module_cost(file_path: str) -> int:
+    """Estimate the token cost of documenting a module from the size of its source code."""
+    with open(file_path, "r") as f:
+        return count_tokens(f.read())
+
+
+def partition_modules(G: nx.DiGraph, n_shards: int, costs: dict[str, int] | None = None) -> list[list[str]]:
+    """Partition the modules into shards of balanced estimated cost.
+
+    The modules of an import cycle are always kept in the same shard. Units are assigned most expensive first to the
+    shard with the lowest cost so far, breaking ties by name, so every worker computes the same partition. Each shard is
+    ordered so that modules come after the modules they import, which guarantees the workers cannot wait on each other
+    in a cycle.
+
+    Args:
+        G: The dependency graph of the package.
+        n_shards: The number of shards.
+        costs: The estimated cost of each module, defaulting to `estimate_module_cost`.
+
+    Returns:
+        The modules of each shard in dependency order.
+    """
+    units = get_module_order(G)
+    if costs is None:
+        costs = {node: estimate_module_cost(node) for node in G.nodes}
+    loads = [0] * n_shards
+    shards: list[list[str]] = [[] for _ in range(n_shards)]
+    for unit in sorted(units, key=lambda unit: (-sum(costs[node] for node in unit), unit[0])):
+        index = min(range(n_shards), key=lambda i: (loads[i], i))
+        shards[index].extend(unit)
+        loads[index] += sum(costs[node] for node in unit)
+
+    order = {node: i for i, node in enumerate(node for unit in units for node in unit)}
+    return [sorted(shard, key=order.__getitem__) for shard in shards]
+
+
+def wait_for_module(store: ResultStore, module_name: str, poll_interval: float, deadline: float | None) -> dict:
+    """Poll the store until another worker has published the result of a module.
+
+    Raises:
+        ShardTimeoutError: If the deadline passes first.
+    """
+    while (result := store.get(module_name)) is None:
+        if deadline is not None and time.monotonic() > deadline:
+            raise ShardTimeoutError(f"Timed out waiting for module {module_name} from another shard")
+        logging.info(f"Waiting for module {module_name} from another shard")
+        time.sleep(poll_interval)
+    return result
+
+
+def run_shard(
+        G: nx.DiGraph,
+        package_name: str,
+        shard: list[str],
+        store: ResultStore,
+        cache: DocstringCache | None = None,
+        poll_interval: float = 5.0,
+        timeout: float | None = None
+) -> list[str]:
+    """Document the modules of one shard, publishing the source code and summaries of each module to the store.
+
+    Modules already in the store are skipped, so a worker which failed can be restarted. The package itself is not
+    modified until `merge_results`.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        shard: The modules of the shard in dependency order, see `partition_modules`.
+        store: The result store shared by every worker.
+        cache: The cache used to deduplicate requests for identical functions.
+        poll_interval: The number of seconds between polls for modules from other shards.
+        timeout: The number of seconds to wait for modules from other shards, or None to wait indefinitely.
+
+    Returns:
+        The names of the modules documented by this worker.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    in_shard = set(shard)
+    loaded = set()
+    visited = SummaryStore()
+    documented = []
+    for node in shard:
+        module_name = file_path_to_module_name(node, package_name)
+        for parent in G.predecessors(node):
+            if parent in in_shard or parent in loaded:
+                continue
+            result = wait_for_module(store, file_path_to_module_name(parent, package_name), poll_interval, deadline)
+            visited.update(result["summaries"])
+            loaded.add(parent)
+
+        if (result := store.get(module_name)) is not None:
+            logging.info(f"Module {module_name} is already in the store")
+            visited.update(result["summaries"])
+            continue
+
+        logging.info(f"Generating docstrings for module {module_name}")
+        with open(node, "r") as f:
+            source_code = f.read()
+        new_source_code, visited = generate_docstrings_for_module(
+                source_code, get_imported_modules(G, node, package_name), visited, module_name, cache=cache
+        )
+        store.publish(module_name, new_source_code, get_module_summaries(visited, module_name))
+        documented.append(module_name)
+    return documented
+
+
+def merge_results(G: nx.DiGraph, package_name: str, store: ResultStore) -> dict[str, str]:
+    """Write the documented source code of every module in the store back to the package.
+
+    Modules are written in sorted order, and modules missing from the store are left untouched.
+
+    Args:
+        G: The dependency graph of the package.
+        package_name: The name of the package.
+        store: The result store shared by every worker.
+
+    Returns:
+        The summaries of every documented function, sorted by fully qualified name.
+    """
+    summaries = {}
+    for node in sorted(G.nodes):
+        module_name = file_path_to_module_name(node, package_name)
+        result = store.get(module_name)
+        if result is None:
+            logging.warning(f"Module {module_name} is missing from the store, leaving it unchanged")
+            continue
+        with open(node, "w") as f:
+            f.write(result["source_code"])
+        summaries.update(result["summaries"])
+    return dict(sorted(summaries.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate docstrings for an entire python package across several workers")
+    parser.add_argument("command", choices=["plan", "run", "merge"], help="Print the shards, run one shard, or merge the results.")
+    parser.add_argument("--dependencies_file", "-d", help="The file containing the dependencies of the package.")
+    parser.add_argument("--package_name", "-p", help="The name of the package.")
+    parser.add_argument("--store", default="shards", help="The shared result store, a directory or a .db/.sqlite file.")
+    parser.add_argument("--shards", type=int, default=1, help="The total number of shards.")
+    parser.add_argument("--shard", type=int, default=0, help="The index of the shard to run.")
+    parser.add_argument("--poll_interval", type=float, default=5.0, help="The number of seconds between polls of the store.")
+    parser.add_argument("--timeout", type=float, default=None, help="The number of seconds to wait for other shards.")
+    parser.add_argument("--cache_file", help="A JSON file to reuse docstrings for identical functions across runs.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, encoding="utf-8")
+    G = load_graph(args.dependencies_file)
+    if args.command == "plan":
+        print(json.dumps(partition_modules(G, args.shards), indent=4))
+    elif args.command == "run":
+        cache = DocstringCache(args.cache_file)
+        try:
+            shard = partition_modules(G, args.shards)[args.shard]
+            run_shard(G, args.package_name, shard, open_result_store(args.store), cache, args.poll_interval, args.timeout)
+        finally:
+            cache.save()
+    else:
+        merge_results(G, args.package_name, open_result_store(args.store))
@@ -0,0 +1,99 @@
+"""This module contains an index of the lines of a source file, to extract and splice the source of AST nodes in place.
+
+The AST gives the position of each node as a line and a UTF-8 byte column, so the source is kept as UTF-8 bytes,
+memory mapped straight from the file where possible, and the start of every line is recorded once per file. Locating
+a node is then a lookup in the index instead of splitting the whole source into lines, segments are views over the
+buffer, and only the parts which are read or rewritten are ever decoded.
+"""
+import mmap
+
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+class SourceIndex:
+    """The UTF-8 source of a module with the byte offset of the start of each line.
+
+    Attributes:
+        buffer: The source, as bytes or a read only memory map of the file.
+        view: A memoryview over the buffer, sliced without copying.
+        lines: The byte offset of the start of each line. A source ending with a newline has an empty last line.
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap | str):
+        if isinstance(buffer, str):
+            buffer = buffer.encode("utf-8")
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.lines = array("Q", [0])
+        offset = buffer.find(b"\n")
+        while offset != -1:
+            self.lines.append(offset + 1)
+            offset = buffer.find(b"\n", offset + 1)
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def line_offset(self, lineno: int) -> int:
+        """Return the offset of the start of a line, starting from 1, or the length of the source past the last line."""
+        return self.lines[lineno - 1] if lineno <= len(self.lines) else len(self.view)
+
+    def offset(self, lineno: int, col_offset: int) -> int:
+        """Convert the line and UTF-8 byte column of an AST node into an offset in the source."""
+        return min(self.line_offset(lineno) + col_offset, len(self.view))
+
+    def text(self, start: int, end: int) -> str:
+        """Decode the source between two offsets."""
+        return str(self.view[start:end], "utf-8")
+
+    def get_line(self, lineno: int) -> str:
+        """Decode a single line, without its line ending."""
+        return self.text(self.line_offset(lineno), self.line_offset(lineno + 1)).rstrip("\r\n")
+
+    def splice(self, edits: list[tuple[int, int, str]]) -> str:
+        """Replace non overlapping ranges of the source, decoding the rest of it only once.
+
+        Args:
+            edits: The start and end offsets of each range, with the text to replace it with, in any order.
+
+        Returns:
+            The edited source.
+
+        Raises:
+            ValueError: If two ranges overlap.
+        """
+        pieces = []
+        position = 0
+        for start, end, replacement in sorted(edits):
+            if start < position:
+                raise ValueError(f"The edit at offset {start} overlaps the previous edit, which ends at {position}")
+            pieces.extend((self.text(position, start), replacement))
+            position = end
+        pieces.append(self.text(position, len(self.view)))
+        # decoded piece by piece, as decoding non ASCII text at once briefly takes twice the size of the result
+        return "".join(pieces)
+
+    def close(self) -> None:
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+@contextmanager
+def open_source(file_path: str | Path) -> Iterator[SourceIndex]:
+    """Memory map a source file read only and index its lines. The map is closed on exit.
+
+    Empty files, which cannot be mapped, are read instead.
+    """
+    with open(file_path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            buffer = f.read()
+    index = SourceIndex(buffer)
+    try:
+        yield index
+    finally:
+        index.close()
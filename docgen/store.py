@@ -0,0 +1,164 @@
+"""This module contains the stores of function summaries shared by every stage of docstring generation.
+
+`SummaryStore` is shared in memory by the stages of a single run. `DirectoryResultStore` and `SQLiteResultStore` are
+shared by the workers of a sharded run (see `docgen.shards`), holding the documented source and summaries of each module.
+"""
+import contextlib
+import json
+import os
+import sqlite3
+
+from pathlib import Path
+from typing import Callable, Iterator, Mapping
+
+
+class SummaryStore(dict):
+    """The summaries of documented functions keyed by fully qualified name.
+
+    A drop-in replacement for the `visited` dictionary which notifies its subscribers of every summary added, so that
+    work waiting on a summary can be dispatched as soon as it is available. The summaries are also indexed by module,
+    so the summaries of one module are found without walking those of the whole run.
+
+    Only item assignment notifies the subscribers. `update` and `|=` add summaries already known elsewhere, such as
+    those loaded from another shard, so they are indexed without notifying anyone, as with a plain dictionary.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subscribers: list[Callable[[str, str], None]] = []
+        self.modules: dict[str, dict[str, str]] = {}
+        for key, value in self.items():
+            self.index(key, value)
+
+    def subscribe(self, callback: Callable[[str, str], None]) -> None:
+        self.subscribers.append(callback)
+
+    def index(self, key: str, value: str) -> None:
+        self.modules.setdefault(key.rpartition(".")[0], {})[key] = value
+
+    def unindex(self, key: str) -> None:
+        module_name = key.rpartition(".")[0]
+        summaries = self.modules.get(module_name, {})
+        summaries.pop(key, None)
+        if not summaries:
+            self.modules.pop(module_name, None)
+
+    def get_module_summaries(self, module_name: str) -> dict[str, str]:
+        """Return the summaries of the functions defined in a module, keyed by fully qualified name."""
+        return dict(self.modules.get(module_name, {}))
+
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, value)
+        self.index(key, value)
+        for callback in self.subscribers:
+            callback(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self.unindex(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs) -> None:
+        summaries = dict(*args, **kwargs)
+        super().update(summaries)
+        for key, value in summaries.items():
+            self.index(key, value)
+
+    def setdefault(self, key: str, default: str) -> str: # type: ignore
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *default):
+        if key in self:
+            self.unindex(key)
+        return super().pop(key, *default)
+
+    def popitem(self) -> tuple[str, str]:
+        key, value = super().popitem()
+        self.unindex(key)
+        return key, value
+
+    def clear(self) -> None:
+        super().clear()
+        self.modules.clear()
+
+
+def get_module_summaries(visited: Mapping[str, str], module_name: str) -> dict[str, str]:
+    """Return the summaries of the functions defined in a module, from any mapping of summaries.
+
+    A `SummaryStore` looks them up in its index. Any other mapping is scanned in full.
+    """
+    if isinstance(visited, SummaryStore):
+        return visited.get_module_summaries(module_name)
+    return {key: value for key, value in visited.items() if key.rpartition(".")[0] == module_name}
+
+
+class DirectoryResultStore:
+    """The results of a sharded run as one JSON file per module in a shared directory.
+
+    Each file is written to a temporary name and renamed into place, so readers never see a partial result.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def publish(self, module_name: str, source_code: str, summaries: dict[str, str]) -> None:
+        tmp_path = self.path / f".{module_name}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps({"source_code": source_code, "summaries": summaries}))
+        os.replace(tmp_path, self.path / f"{module_name}.json")
+
+    def get(self, module_name: str) -> dict | None:
+        path = self.path / f"{module_name}.json"
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def modules(self) -> list[str]:
+        return sorted(path.stem for path in self.path.glob("*.json"))
+
+
+class SQLiteResultStore:
+    """The results of a sharded run as rows of a shared SQLite database."""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        with self.connect() as connection:
+            connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results (module_name TEXT PRIMARY KEY, source_code TEXT, summaries TEXT)"
+            )
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def publish(self, module_name: str, source_code: str, summaries: dict[str, str]) -> None:
+        with self.connect() as connection:
+            connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (module_name, source_code, json.dumps(summaries))
+            )
+
+    def get(self, module_name: str) -> dict | None:
+        with self.connect() as connection:
+            row = connection.execute(
+                    "SELECT source_code, summaries FROM results WHERE module_name = ?", (module_name,)
+            ).fetchone()
+        return {"source_code": row[0], "summaries": json.loads(row[1])} if row else None
+
+    def modules(self) -> list[str]:
+        with self.connect() as connection:
+            return [row[0] for row in connection.execute("SELECT module_name FROM results ORDER BY module_name")]
+
+
+def open_result_store(path: str | Path) -> DirectoryResultStore | SQLiteResultStore:
+    """Open a SQLite result store for a `.db` or `.sqlite` file, otherwise a directory result store."""
+    if Path(path).suffix in (".db", ".sqlite"):
+        return SQLiteResultStore(path)
+    return DirectoryResultStore(path)
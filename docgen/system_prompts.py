@@ -1,3 +1,9 @@
 FUNCTION_DOCSTRING_SYSTEM_PROMPT = "You are a google style docstring generator. You will be given a function and a list of functions with summaries that the main function uses. Generate a docstring for only the main function"
 
 MODULE_DOCSTRING_SYSTEM_PROMPT = "You are a google style docstring generator. You will be given a list of functions and their summaries in a single module. Generate a top-level docstring for the module"
+
+PACKAGE_DOCSTRING_SYSTEM_PROMPT = "You are a google style docstring generator. You will be given a list of the modules and subpackages in a package and their summaries. Generate a concise top-level docstring for the package"
+
+PACKAGE_PART_SYSTEM_PROMPT = "You summarise part of a python package. You will be given some of the modules and subpackages in a package and their summaries. Summarise what this part of the package does in one or two sentences"
+
+REPAIR_SYSTEM_PROMPT = "You fix invalid tool output. You will be given a fragment of output and the problems with it. Call the tool with the fixed output, keeping every valid field unchanged"
@@ -0,0 +1,49 @@
+"""This module contains the templates used to render prompts, built with joins rather than repeated concatenation."""
+
+USED_FUNCTIONS_HEADER = "The following functions are used in the above code:\n\n"
+USED_FUNCTION_TEMPLATE = "{}:\n\t{}\n\n"
+MODULE_FUNCTION_TEMPLATE = "Function: {}, Summary: {}\n\n"
+MODULE_PROMPT_HEADER = "The following functions are used in this module ({}):\n\n"
+MODULE_CONTEXT_HEADER = "The following code is from the module {}.\n\n"
+MODULE_CONTEXT_USED_FUNCTIONS_HEADER = "The following functions from other modules in the package are used in this module:\n\n"
+MODULE_CONTEXT_NO_USED_FUNCTIONS = "The module does not use any functions from other modules in the package.\n"
+IF_NAME_MAIN_TEMPLATE = "The following code is in the if __name__ == '__main__' block:\n\n{}\n\n"
+NO_IF_NAME_MAIN = "This module does not have a if __name__ == '__main__' block.\n\n"
+PACKAGE_PROMPT_HEADER = "The following modules and subpackages are in the package ({}):\n\n"
+PACKAGE_PART_PROMPT_HEADER = "The following modules and subpackages are part {} of {} of the package ({}):\n\n"
+PACKAGE_ITEM_TEMPLATE = "{}: {}\n\n"
+REPAIR_TEMPLATE = "The following output is invalid:\n\n{}\n\nThe problems are:\n\n{}"
+
+
+def render_used_functions(used_functions: list[tuple[str, str]], template: str = USED_FUNCTION_TEMPLATE) -> str:
+    return "".join([template.format(function, docstring) for function, docstring in used_functions])
+
+
+def render_function_prompt(code: str, used_functions: list[tuple[str, str]] | None) -> str:
+    if not used_functions:
+        return f'"""{code}\n\n"""'
+    return "".join([f'"""{code}\n\n', USED_FUNCTIONS_HEADER, render_used_functions(used_functions), '"""'])
+
+
+def render_module_context(module_name: str, used_functions: list[tuple[str, str]]) -> str:
+    header = MODULE_CONTEXT_HEADER.format(module_name)
+    if not used_functions:
+        return header + MODULE_CONTEXT_NO_USED_FUNCTIONS
+    return "".join([header, MODULE_CONTEXT_USED_FUNCTIONS_HEADER, render_used_functions(used_functions)])
+
+
+def render_module_prompt(module_name: str, functions: list[tuple[str, str]], if_name_main: str | None) -> str:
+    return "".join([
+        MODULE_PROMPT_HEADER.format(module_name),
+        render_used_functions(functions, MODULE_FUNCTION_TEMPLATE),
+        IF_NAME_MAIN_TEMPLATE.format(if_name_main) if if_name_main else NO_IF_NAME_MAIN
+    ])
+
+
+def render_package_prompt(package_name: str, items: list[tuple[str, str]], part: tuple[int, int] | None = None) -> str:
+    header = PACKAGE_PROMPT_HEADER.format(package_name) if part is None else PACKAGE_PART_PROMPT_HEADER.format(*part, package_name)
+    return header + render_used_functions(items, PACKAGE_ITEM_TEMPLATE)
+
+
+def render_repair_prompt(fragment: str, errors: list[str]) -> str:
+    return REPAIR_TEMPLATE.format(fragment, "".join(f"- {error}\n" for error in errors))
@@ -0,0 +1,184 @@
+"""This module contains the HTTP client used to talk to the LLM provider, with a tunable connection pool and metrics.
+
+Every request goes through one pool of keep-alive connections. A connection is opened only when no idle one is left
+and fewer than `max_connections` are open, and up to `max_keepalive_connections` idle connections are kept for
+`keepalive_expiry` seconds. With `http2`, requests are multiplexed as streams over shared connections instead, so a
+slow response does not block the requests queued behind it. HTTP/2 needs the optional `h2` package (`httpx[http2]`).
+"""
+import httpx
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+@dataclass
+class ClientOptions:
+    """How the connections to the LLM provider are pooled and timed out.
+
+    Attributes:
+        max_connections: The most connections open at once. Requests beyond it wait for a free connection.
+        max_keepalive_connections: The most idle connections kept open for reuse.
+        keepalive_expiry: The number of seconds an idle connection is kept open.
+        timeout: The number of seconds each request may wait for data from the provider.
+        connect_timeout: The number of seconds to establish a connection.
+        pool_timeout: The number of seconds a request may wait for a free connection, defaulting to `timeout`.
+        http2: Whether to multiplex requests over HTTP/2 connections.
+        max_retries: The number of times a failed request is retried by the client.
+        base_url: The URL of the provider API, defaulting to the OpenAI API.
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 600.0
+    connect_timeout: float = 5.0
+    pool_timeout: Optional[float] = None
+    http2: bool = False
+    max_retries: int = 2
+    base_url: Optional[str] = None
+
+    def build_timeout(self) -> httpx.Timeout:
+        pool_timeout = self.pool_timeout if self.pool_timeout is not None else self.timeout
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout, pool=pool_timeout)
+
+    def build_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+        )
+
+
+class PoolStats:
+    """Running totals of the requests sent and the connections opened for them, and the peak number in flight.
+
+    A request is in flight from when it is sent over a connection until its response is closed. The time before that,
+    spent waiting for a free connection or opening one, is added to `wait_seconds`.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.http2_requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.wait_seconds = 0.0
+        self.max_connections: int | None = None
+        self._lock = threading.Lock()
+
+    def start(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.wait_seconds += wait_seconds
+
+    def finish(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_http2(self) -> None:
+        with self._lock:
+            self.http2_requests += 1
+
+    @property
+    def reused(self) -> int:
+        """The number of requests sent over a connection which was already open."""
+        return max(self.requests - self.connections_opened, 0)
+
+    @property
+    def utilization(self) -> float:
+        """The peak number of requests in flight as a fraction of the pool size."""
+        return self.peak_in_flight / self.max_connections if self.max_connections else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests over {self.connections_opened} connections ({self.reused} reused, "
+            f"{self.http2_requests} over HTTP/2), peak {self.peak_in_flight} in flight ({self.utilization:.0%} of the "
+            f"pool), {self.wait_seconds:.1f}s waiting for a connection"
+        )
+
+
+class TrackedStream(httpx.SyncByteStream):
+    """A response body which calls back when it is closed, just before its connection is released to the pool."""
+
+    def __init__(self, stream: httpx.SyncByteStream, on_close: Callable[[], None]):
+        self.stream = stream
+        self.on_close: Callable[[], None] | None = on_close
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self.stream
+
+    def close(self) -> None:
+        # called first, as another request may take the connection as soon as it is released
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+        self.stream.close()
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """An HTTP transport recording each request, and whether it opened a connection, in a `PoolStats`.
+
+    The pool is observed through the trace events of `httpcore`, which fire on the thread sending the request.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        previous_trace = request.extensions.get("trace")
+        queued = time.monotonic()
+        sent = False
+
+        def trace(event: str, info: dict) -> None:
+            nonlocal sent
+            if event.startswith("connection.connect_") and event.endswith(".complete"):
+                self.stats.record_connection()
+            elif event.endswith("send_request_headers.started") and not sent:
+                sent = True
+                self.stats.start(time.monotonic() - queued)
+            if previous_trace is not None:
+                previous_trace(event, info)
+
+        request.extensions["trace"] = trace
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            if sent:
+                self.stats.finish()
+            raise
+        if response.extensions.get("http_version") == b"HTTP/2":
+            self.stats.record_http2()
+        return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=TrackedStream(response.stream, self.stats.finish), # type: ignore
+                extensions=response.extensions
+        )
+
+
+def build_http_client(options: ClientOptions, stats: PoolStats) -> httpx.Client:
+    """Build an HTTP client with the connection pool and timeouts of the options, recording its use in `stats`.
+
+    HTTP/2 falls back to HTTP/1.1 with a warning if the `h2` package is not installed.
+    """
+    http2 = options.http2
+    if http2 and h2 is None:
+        logging.warning("HTTP/2 needs the h2 package (pip install 'httpx[http2]'), falling back to HTTP/1.1")
+        http2 = False
+    stats.max_connections = options.max_connections
+    transport = InstrumentedTransport(stats, limits=options.build_limits(), http2=http2)
+    return httpx.Client(transport=transport, timeout=options.build_timeout())
@@ -0,0 +1,235 @@
+"""This module contains the validation of tool output against a schema compiled once per docstring model.
+
+Recoverable problems are fixed locally: code fences or prose around the JSON object, the object wrapped in a list or
+under a single key, a string where a list is expected (or the reverse), unknown keys, and missing optional fields. Only
+the problems left over need a repair request.
+
+Valid output can still be wrong about the code. `check_function_docstring` compares a function docstring with the AST
+of its function, so only the docstrings which disagree with the code are sent again.
+"""
+import ast
+import json
+import re
+
+from dataclasses import dataclass
+from pydantic import BaseModel
+from typing import Any, Iterator
+
+from docgen.pydantic_models import FunctionDocstring
+
+CODE_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+ITEM_NAME = re.compile(r"\s*`?\*{0,2}([A-Za-z_][\w.]*)")
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    kind: str
+    required: bool
+    default: Any = None
+
+
+class CompiledSchema:
+    """The fields of a pydantic model, extracted from its JSON schema once and checked without building the model.
+
+    Args:
+        model: The pydantic model of the tool output.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        schema = model.model_json_schema()
+        required = set(schema.get("required", []))
+        self.model = model
+        self.fields = {
+            name: FieldSpec(name, get_kind(prop), name in required, prop.get("default"))
+            for name, prop in schema["properties"].items()
+        }
+
+    def validate(self, data: dict) -> tuple[dict, list[str]]:
+        """Check the fields of the tool output, fixing what can be fixed locally.
+
+        Args:
+            data: The decoded tool output.
+
+        Returns:
+            The fixed tool output, with every known field present, and the problems which could not be fixed.
+        """
+        fixed = {}
+        errors = []
+        for name, spec in self.fields.items():
+            value = data.get(name)
+            if value is None:
+                if spec.required:
+                    errors.append(f"'{name}' is required")
+                fixed[name] = spec.default
+                continue
+            value = coerce(value, spec.kind)
+            if value is None:
+                errors.append(f"'{name}' must be {'a list of strings' if spec.kind == 'array' else 'a string'}")
+            fixed[name] = value
+        return fixed, errors
+
+    def build(self, data: dict) -> BaseModel:
+        """Build the model from validated data, without validating it again."""
+        return self.model.model_construct(**data)
+
+
+def get_kind(prop: dict) -> str:
+    types = [option.get("type") for option in prop.get("anyOf", [prop])]
+    return "array" if "array" in types else "string"
+
+
+def coerce(value: Any, kind: str) -> Any:
+    """Coerce a value to a string or a list of strings, returning None if it cannot be."""
+    if kind == "array":
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list) and all(isinstance(item, (str, int, float)) for item in value):
+            return [str(item) for item in value]
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return "\n".join(value)
+    return value if isinstance(value, str) else None
+
+
+def extract_json(text: str) -> Any:
+    """Decode JSON tool output, ignoring code fences and any text around the outermost object.
+
+    Raises:
+        json.JSONDecodeError: If no JSON object can be decoded.
+    """
+    match = CODE_FENCE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+def unwrap(data: Any, schema: CompiledSchema) -> Any:
+    """Remove wrapping around the tool output, such as a single element list or a single wrapping key."""
+    while True:
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        elif isinstance(data, dict) and len(data) == 1 and next(iter(data)) not in schema.fields:
+            value = next(iter(data.values()))
+            if not isinstance(value, dict):
+                return data
+            data = value
+        else:
+            return data
+
+
+def validate_tool_output(
+        args: str,
+        schema: CompiledSchema,
+        defaults: dict | None = None,
+        base: dict | None = None
+) -> tuple[dict | None, list[str]]:
+    """Decode and validate tool output, fixing what can be fixed locally.
+
+    Args:
+        args: The arguments of the tool call.
+        schema: The compiled schema of the tool output.
+        defaults: Values used for fields missing from the output, such as the name of the function being documented.
+        base: A previous, partially valid output which the fields of this output are applied on top of.
+
+    Returns:
+        The fixed tool output, or None if it is not JSON, and the problems which could not be fixed.
+    """
+    try:
+        data = unwrap(extract_json(args), schema)
+    except json.JSONDecodeError as e:
+        return None, [f"The output is not valid JSON: {e}"]
+    if not isinstance(data, dict):
+        return None, ["The output must be a JSON object"]
+
+    merged = dict(defaults or {})
+    merged.update({key: value for key, value in (base or {}).items() if value is not None})
+    merged.update({key: value for key, value in data.items() if value is not None})
+    return schema.validate(merged)
+
+
+def walk_own_body(function: ast.FunctionDef | ast.AsyncFunctionDef) -> Iterator[ast.AST]:
+    """Walk the body of a function, without descending into the functions, lambdas and classes it defines."""
+    nodes: list[ast.AST] = list(function.body)
+    while nodes:
+        node = nodes.pop()
+        yield node
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            nodes.extend(ast.iter_child_nodes(node))
+
+
+def get_parameter_names(function: ast.FunctionDef | ast.AsyncFunctionDef) -> list[str]:
+    """Return the names of the parameters of a function, without `self` or `cls` for methods."""
+    arguments = function.args
+    names = [arg.arg for arg in (*arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs)]
+    names.extend(arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None)
+    return [name for name in names if name not in ("self", "cls")]
+
+
+def get_raised_exceptions(function: ast.FunctionDef | ast.AsyncFunctionDef) -> set[str]:
+    """Return the names of the exceptions raised by name in the body of a function, ignoring bare re-raises."""
+    raised = set()
+    for node in walk_own_body(function):
+        if isinstance(node, ast.Raise) and node.exc is not None:
+            exception = node.exc.func if isinstance(node.exc, ast.Call) else node.exc
+            if isinstance(exception, (ast.Name, ast.Attribute)):
+                raised.add(ast.unparse(exception).rpartition(".")[2])
+    return raised
+
+
+def is_generator(function: ast.FunctionDef | ast.AsyncFunctionDef) -> bool:
+    return any(isinstance(node, (ast.Yield, ast.YieldFrom)) for node in walk_own_body(function))
+
+
+def get_item_name(item: str) -> str:
+    """Return the name at the start of an item such as "x (int): the value" or "ValueError: if x is negative"."""
+    match = ITEM_NAME.match(item)
+    return match.group(1).rpartition(".")[2] if match else ""
+
+
+def check_function_docstring(function: ast.FunctionDef | ast.AsyncFunctionDef, docstring: FunctionDocstring) -> list[str]:
+    """Compare a function docstring with the code of the function, without any LLM requests.
+
+    The parameters must be those of the signature, every exception raised by name must be documented, and yields must
+    be documented for generators only. An exception may be documented without being raised in the function itself if
+    the function calls others, as it may come from one of them.
+
+    Args:
+        function: The AST of the function.
+        docstring: The docstring generated for the function.
+
+    Returns:
+        The problems with the docstring, empty if it agrees with the code.
+    """
+    problems = []
+    parameters = get_parameter_names(function)
+    documented = [get_item_name(item) for item in docstring.parameters or []]
+    unknown = [name for name in documented if name and name not in parameters]
+    missing = [name for name in parameters if name not in documented]
+    if unknown:
+        problems.append(f"'parameters' documents {unknown}, which are not parameters of {function.name}")
+    if missing:
+        problems.append(f"'parameters' must document {missing}")
+
+    raised = get_raised_exceptions(function)
+    documented_raises = {get_item_name(item) for item in docstring.raises or []}
+    if raised - documented_raises:
+        problems.append(f"'raises' must document {sorted(raised - documented_raises)}")
+    calls = any(isinstance(node, ast.Call) for node in walk_own_body(function))
+    if not calls and documented_raises - raised:
+        problems.append(f"'raises' documents {sorted(documented_raises - raised)}, which {function.name} never raises")
+
+    generator = is_generator(function)
+    if docstring.yields and not generator:
+        problems.append(f"'yields' must be empty, as {function.name} is not a generator")
+    if generator and not docstring.yields:
+        problems.append(f"'yields' must describe what {function.name} yields")
+    return problems
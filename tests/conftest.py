@@ -0,0 +1,41 @@
+import pytest
+
+from pathlib import Path
+
+from docgen.pydantic_models import FunctionAnalysis, FunctionDocstring, ModuleAnalysis
+
+
+@pytest.fixture
+def fake_function_docstring():
+    """A stand-in for `generate_function_docstring`, summarising each function by its name."""
+    def generate(code, used_functions, prev_response=None, module_context=None):
+        name = code.split("(")[0].removeprefix("def ")
+        return FunctionDocstring(function_name=name, summary=f"Summary of {name}", description=str(used_functions))
+    return generate
+
+
+@pytest.fixture
+def make_analysis():
+    """Build the analysis of a module from the fully qualified calls of each of its functions."""
+    def make(module_name: str, functions: dict[str, list[str]]) -> ModuleAnalysis:
+        return ModuleAnalysis(
+            module_name=module_name,
+            file_path=module_name,
+            imports={},
+            functions=[FunctionAnalysis(name=name, lineno=1, end_lineno=1, col_offset=0, calls=calls) for name, calls in functions.items()]
+        )
+    return make
+
+
+@pytest.fixture
+def write_package(tmp_path):
+    """Write the modules of a package into a temporary folder, returning the path of each module."""
+    def write(package_name: str, modules: dict[str, str]) -> dict[str, Path]:
+        paths = {}
+        for module, source_code in modules.items():
+            path = tmp_path / package_name / module
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(source_code)
+            paths[module] = path
+        return paths
+    return write
@@ -0,0 +1,66 @@
+import ast
+
+from docgen.analysis import analyze_modules, analyze_source, calculate_chunksize, resolve_call
+
+
+def get_first_call(code: str) -> ast.Call:
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Call):
+            return node
+    raise ValueError("no call in code")
+
+def test_resolve_call_imported_function():
+    call = get_first_call("bar()")
+    assert resolve_call(call, "package.foo", set(), {"bar": "package.baz.bar"}) == "package.baz.bar"
+
+def test_resolve_call_internal_function():
+    call = get_first_call("bar()")
+    assert resolve_call(call, "package.foo", {"bar"}, {}) == "package.foo.bar"
+
+def test_resolve_call_module_attribute():
+    call = get_first_call("baz.qux()")
+    assert resolve_call(call, "package.foo", set(), {"baz": "package.baz"}) == "package.baz.qux"
+
+def test_resolve_call_not_in_package():
+    call = get_first_call("print('hello')")
+    assert resolve_call(call, "package.foo", set(), {}) is None
+
+def test_analyze_source():
+    source_code = "from package.bar import baz\n\ndef foo():\n\tbaz()\n\tqux()\n\tbaz()\n\ndef qux():\n\tpass\n"
+    analysis = analyze_source(source_code, "package/foo.py", "package.foo", ["package.bar"])
+
+    assert analysis.imports == {"baz": "package.bar.baz"}
+    assert [f.name for f in analysis.functions] == ["foo", "qux"]
+    assert analysis.functions[0].calls == ["package.bar.baz", "package.foo.qux"]
+    assert (analysis.functions[0].lineno, analysis.functions[0].end_lineno) == (3, 6)
+    assert analysis.functions[1].calls == []
+
+def test_analyze_source_module_imports():
+    source_code = "import package.bar\n\ndef foo():\n\tpackage.bar.baz()\n"
+    analysis = analyze_source(source_code, "package/foo.py", "package.foo", ["package.bar"])
+
+    assert analysis.imports == {"package.bar": "package.bar"}
+
+def test_calculate_chunksize():
+    assert calculate_chunksize(10, 4) == 1
+    assert calculate_chunksize(20000, 8) == 625
+
+def test_analyze_modules_in_process_pool(tmp_path):
+    jobs = []
+    for i in range(4):
+        path = tmp_path / f"mod{i}.py"
+        path.write_text(f"def func{i}():\n\tpass\n")
+        jobs.append((str(path), f"package.mod{i}", []))
+
+    analyses = analyze_modules(jobs, max_workers=2, chunksize=2)
+
+    assert list(analyses.keys()) == [job[0] for job in jobs]
+    assert [analyses[job[0]].functions[0].name for job in jobs] == ["func0", "func1", "func2", "func3"]
+
+def test_analyze_modules_single_worker(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text("def func():\n\tpass\n")
+
+    analyses = analyze_modules([(str(path), "package.mod", [])], max_workers=1)
+
+    assert analyses[str(path)].module_name == "package.mod"
@@ -0,0 +1,140 @@
+import json
+import networkx as nx
+import pytest
+import re
+
+from docgen.batch import (
+    LocalBatchBackend,
+    docgen_batch,
+    read_batch_file,
+    read_batch_results,
+    run_batch_until_parsed,
+    write_batch_file,
+)
+from docgen.exceptions import BatchFailedError
+from docgen.pydantic_models import FunctionDocstring
+
+
+def make_completion(arguments: dict | str) -> dict:
+    if isinstance(arguments, dict):
+        arguments = json.dumps(arguments)
+    return {"choices": [{"message": {"tool_calls": [{"function": {"arguments": arguments}}]}}]}
+
+def fake_handler(body: dict) -> dict:
+    prompt = body["messages"][-1]["content"]
+    if body["tool_choice"]["function"]["name"] == "ModuleDocstring":
+        module_name = re.search(r"this module \((.*)\)", prompt).group(1) # type: ignore
+        return make_completion({"summary": f"Module {module_name}"})
+    function_name = re.search(r"def (\w+)", prompt).group(1) # type: ignore
+    return make_completion({"function_name": function_name, "summary": f"Summary of {function_name}", "description": "desc"})
+
+def test_write_and_read_batch_file(tmp_path):
+    requests = {"function:a.foo": {"model": "gpt-4"}, "module:a": {"model": "gpt-4"}}
+    write_batch_file(requests, tmp_path / "input.jsonl")
+
+    lines = (tmp_path / "input.jsonl").read_text().splitlines()
+    assert json.loads(lines[0])["url"] == "/v1/chat/completions"
+    assert read_batch_file(tmp_path / "input.jsonl") == requests
+
+def test_read_batch_results_skips_failed_requests(tmp_path):
+    output_file = tmp_path / "output.jsonl"
+    output_file.write_text(
+        json.dumps({"custom_id": "a", "response": {"status_code": 200, "body": make_completion("{}")}}) + "\n"
+        + json.dumps({"custom_id": "b", "response": {"status_code": 500, "body": {}}, "error": "server error"}) + "\n"
+    )
+    assert read_batch_results(output_file) == {"a": "{}"}
+
+def test_run_batch_until_parsed_resubmits_invalid_json(tmp_path):
+    responses = iter(["not json", json.dumps({"function_name": "foo", "summary": "s", "description": "d"})])
+    backend = LocalBatchBackend(lambda body: make_completion(next(responses)), tmp_path)
+
+    parsed = run_batch_until_parsed(backend, {"foo": {}}, FunctionDocstring, tmp_path, "test", 0, 2)
+
+    assert parsed["foo"].summary == "s"
+    assert len(backend.batches) == 2
+
+def test_run_batch_until_parsed_gives_up(tmp_path):
+    backend = LocalBatchBackend(lambda body: make_completion("not json"), tmp_path)
+
+    with pytest.raises(BatchFailedError):
+        run_batch_until_parsed(backend, {"foo": {}}, FunctionDocstring, tmp_path, "test", 0, 2)
+
+def test_run_batch_until_parsed_fills_defaults(tmp_path):
+    arguments = json.dumps({"summary": "s", "description": "d"})
+    backend = LocalBatchBackend(lambda body: make_completion(arguments), tmp_path)
+
+    parsed = run_batch_until_parsed(
+            backend, {"foo": {}}, FunctionDocstring, tmp_path, "test", 0, 1, defaults={"foo": {"function_name": "foo"}}
+    )
+
+    assert parsed["foo"].function_name == "foo"
+    assert len(backend.batches) == 1
+
+def test_run_batch_until_parsed_requeues_only_failing_checks(tmp_path):
+    valid = json.dumps({"function_name": "foo", "summary": "s", "description": "d", "parameters": ["x: the value"]})
+    wrong = json.dumps({"function_name": "bar", "summary": "s", "description": "d", "parameters": ["z: wrong"]})
+    fixed = json.dumps({"function_name": "bar", "summary": "s", "description": "d", "parameters": ["y: the value"]})
+
+    def handler(body):
+        prompt = body["messages"][-1]["content"]
+        if "invalid" in prompt:
+            return make_completion(fixed)
+        return make_completion(valid if "foo" in prompt else wrong)
+
+    backend = LocalBatchBackend(handler, tmp_path)
+    tool = {"tools": [], "tool_choice": {}}
+    requests = {"foo": {"messages": [{"content": "foo"}], **tool}, "bar": {"messages": [{"content": "bar"}], **tool}}
+    checks = {
+        "foo": lambda docstring: [] if docstring.parameters == ["x: the value"] else ["wrong"],
+        "bar": lambda docstring: [] if docstring.parameters == ["y: the value"] else ["'parameters' must document ['y']"],
+    }
+
+    parsed = run_batch_until_parsed(backend, requests, FunctionDocstring, tmp_path, "test", 0, 2, checks)
+
+    assert parsed["bar"].parameters == ["y: the value"]
+    assert parsed["foo"].parameters == ["x: the value"]
+    assert [len(read_batch_results(path)) for path in backend.batches.values()] == [2, 1]
+
+def test_docgen_batch_documents_package_in_waves(tmp_path):
+    package = tmp_path / "batchpkg"
+    package.mkdir()
+    helper = package / "helper.py"
+    helper.write_text("def inner():\n\treturn 1\n\ndef outer():\n\treturn inner()\n")
+    main = package / "main.py"
+    main.write_text("from batchpkg.helper import outer\n\ndef main():\n\touter()\n")
+    G = nx.DiGraph([(str(helper), str(main))])
+
+    backend = LocalBatchBackend(fake_handler, tmp_path / "batches")
+    visited = docgen_batch(G, "batchpkg", backend, tmp_path / "batches", poll_interval=0)
+
+    assert visited == {
+        "batchpkg.helper.inner": "Summary of inner",
+        "batchpkg.helper.outer": "Summary of outer",
+        "batchpkg.main.main": "Summary of main",
+    }
+    # helper needs two function waves (inner before outer), main one, plus one module batch per dependency wave
+    assert len(backend.batches) == 5
+    assert main.read_text().startswith('"""Module batchpkg.main"""\n')
+    assert '"""Summary of outer' in helper.read_text()
+    main_batch = read_batch_file(tmp_path / "batches" / "wave_1_functions_0_0_input.jsonl")
+    assert "Summary of outer" in main_batch["function:batchpkg.main.main:0"]["messages"][-1]["content"]
+
+def test_docgen_batch_same_named_methods(tmp_path):
+    package = tmp_path / "batchpkg"
+    package.mkdir()
+    module = package / "shapes.py"
+    module.write_text("class A:\n\tdef __init__(self):\n\t\tself.a = 1\n\nclass B:\n\tdef __init__(self):\n\t\tself.b = 2\n")
+    G = nx.DiGraph()
+    G.add_node(str(module))
+
+    def handler(body):
+        if body["tool_choice"]["function"]["name"] == "ModuleDocstring":
+            return make_completion({"summary": "Shapes"})
+        attribute = re.search(r"self\.(\w+) =", body["messages"][-1]["content"]).group(1) # type: ignore
+        return make_completion({"function_name": "__init__", "summary": f"Sets {attribute}", "description": "desc"})
+
+    docgen_batch(G, "batchpkg", LocalBatchBackend(handler, tmp_path / "batches"), tmp_path / "batches", poll_interval=0)
+
+    source = module.read_text()
+    assert '"""Sets a' in source.split("class B")[0]
+    assert '"""Sets b' in source.split("class B")[1]
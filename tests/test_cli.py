@@ -0,0 +1,31 @@
+from unittest.mock import patch
+
+from docgen.cli import main
+
+
+@patch("docgen.cli.run_docgen")
+def test_main_discovers_package_from_nested_path(mock_run, tmp_path):
+    package = tmp_path / "clipkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "helper.py").write_text("def helper():\n\treturn 1\n")
+    (package / "main.py").write_text("from clipkg.helper import helper\n\ndef main():\n\treturn helper()\n")
+
+    main([str(package / "main.py"), "--max_concurrency", "2"])
+
+    G, package_name = mock_run.call_args.args[:2]
+    assert package_name == "clipkg"
+    assert list(G.edges) == [(str((package / "helper.py").resolve()), str((package / "main.py").resolve()))]
+    assert mock_run.call_args.args[6] == 2
+
+@patch("docgen.cli.run_docgen")
+@patch("docgen.cli.configure_client")
+def test_main_configures_the_connection_pool(mock_configure, mock_run, tmp_path):
+    package = tmp_path / "poolpkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+
+    main([str(package), "--max_connections", "8", "--request_timeout", "30", "--http2"])
+
+    options = mock_configure.call_args.args[0]
+    assert (options.max_connections, options.timeout, options.http2) == (8, 30.0, True)
@@ -0,0 +1,102 @@
+import ast
+import networkx as nx
+import os
+import threading
+
+from unittest.mock import patch
+
+from docgen.daemon import DaemonServer, DocgenDaemon, hash_functions, send_command
+from docgen.pydantic_models import ModuleDocstring
+
+
+def touch_later(path):
+    # make sure the change is seen even on file systems with coarse timestamps
+    mtime = os.stat(path).st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+def make_package(write_package):
+    paths = write_package("daemonpkg", {
+        "helper.py": 'def inner():\n\t"""Old summary of inner"""\n\treturn 1\n\ndef other():\n\t"""Old summary of other"""\n\treturn 2\n',
+        "main.py": 'from daemonpkg.helper import inner\n\ndef main():\n\t"""Old summary of main"""\n\treturn inner()\n',
+    })
+    helper, main = paths["helper.py"], paths["main.py"]
+    return helper, main, nx.DiGraph([(str(helper), str(main))])
+
+def test_hash_functions_ignores_docstrings():
+    first = hash_functions(ast.parse('def foo():\n\t"""Docstring"""\n\treturn 1\n'))
+    second = hash_functions(ast.parse('def foo():\n\treturn 1\n'))
+    third = hash_functions(ast.parse('def foo():\n\treturn 2\n'))
+
+    assert first == second != third
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_daemon_documents_changed_function_and_callers(mock_function, mock_module, fake_function_docstring, write_package):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.return_value = ModuleDocstring(summary="A module")
+    helper, main, G = make_package(write_package)
+
+    daemon = DocgenDaemon(G, "daemonpkg")
+    daemon.load()
+    assert daemon.visited["daemonpkg.helper.inner"] == "Old summary of inner"
+    assert daemon.scan() == []
+
+    helper.write_text(helper.read_text().replace("return 1", "return 3"))
+    touch_later(helper)
+    documented = daemon.scan()
+
+    assert documented == ["daemonpkg.helper.inner", "daemonpkg.main.main"]
+    assert daemon.visited["daemonpkg.helper.other"] == "Old summary of other"
+    main_call = [call for call in mock_function.call_args_list if call.args[0].startswith("def main")][0]
+    assert main_call.args[1] == [("inner", "Summary of inner")]
+    assert '"""Old summary of other' in helper.read_text()
+    # writing the docstrings is not a change to the code
+    assert daemon.scan() == []
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_daemon_redocuments_module_edited_mid_run(mock_function, mock_module, fake_function_docstring, write_package):
+    mock_module.return_value = ModuleDocstring(summary="A module")
+    helper, main, G = make_package(write_package)
+    daemon = DocgenDaemon(G, "daemonpkg")
+    daemon.load()
+
+    def edit_during_first_call(code, *args, **kwargs):
+        if mock_function.call_count == 1:
+            helper.write_text(helper.read_text().replace("return 2", "return 4"))
+        return fake_function_docstring(code, *args, **kwargs)
+
+    mock_function.side_effect = edit_during_first_call
+    helper.write_text(helper.read_text().replace("return 1", "return 3"))
+    touch_later(helper)
+
+    assert daemon.scan() == []
+    # the summary which was never written is rolled back
+    assert daemon.visited["daemonpkg.helper.inner"] == "Old summary of inner"
+    # both the first and the second edit are documented on the next scan
+    assert daemon.scan() == ["daemonpkg.helper.inner", "daemonpkg.helper.other", "daemonpkg.main.main"]
+    assert '"""Summary of inner' in helper.read_text()
+    assert daemon.scan() == []
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_daemon_socket_api(mock_function, mock_module, fake_function_docstring, write_package):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.return_value = ModuleDocstring(summary="A module")
+    helper, main, G = make_package(write_package)
+    daemon = DocgenDaemon(G, "daemonpkg")
+    daemon.load()
+
+    with DaemonServer(daemon, ("127.0.0.1", 0)) as server:
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        assert send_command({"command": "status"}, port=port) == {"modules": 2, "summaries": 3, "documented": 0}
+        main.write_text(main.read_text().replace("return inner()", "return inner() + 1"))
+        assert send_command({"command": "document", "path": str(main)}, port=port) == {"documented": ["daemonpkg.main.main"]}
+        assert send_command({"command": "summary", "function": "daemonpkg.main.main"}, port=port) == {"summary": "Summary of main"}
+        assert send_command({"command": "shutdown"}, port=port) == {"shutdown": True}
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
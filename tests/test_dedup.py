@@ -0,0 +1,87 @@
+import ast
+import threading
+import time
+
+from docgen.dedup import DocstringCache, fingerprint_function, normalize_function
+from docgen.pydantic_models import FunctionDocstring
+
+
+def parse_function(code: str) -> ast.FunctionDef:
+    return ast.parse(code).body[0] # type: ignore
+
+def make_docstring(function_name: str = "foo") -> FunctionDocstring:
+    return FunctionDocstring(function_name=function_name, summary="Adds one", description="Adds one to x")
+
+def test_normalize_function_renames_locals_and_function_name():
+    first = parse_function("def foo(x):\n\ty = x + 1\n\treturn y\n")
+    second = parse_function("def bar(x):\n\tresult = x + 1\n\treturn result\n")
+
+    assert normalize_function(first) == normalize_function(second)
+
+def test_normalize_function_ignores_docstring():
+    first = parse_function('def foo(x):\n\t"""Old docstring"""\n\treturn x\n')
+    second = parse_function("def foo(x):\n\treturn x\n")
+
+    assert normalize_function(first) == normalize_function(second)
+
+def test_normalize_function_keeps_parameter_names():
+    first = parse_function("def foo(x):\n\treturn x\n")
+    second = parse_function("def foo(y):\n\treturn y\n")
+
+    assert normalize_function(first) != normalize_function(second)
+
+def test_normalize_function_keeps_globals():
+    first = parse_function("def foo(x):\n\treturn bar(x)\n")
+    second = parse_function("def foo(x):\n\treturn baz(x)\n")
+
+    assert normalize_function(first) != normalize_function(second)
+
+def test_normalize_function_does_not_modify_function():
+    function = parse_function("def foo(x):\n\ty = x\n\treturn y\n")
+    normalize_function(function)
+
+    assert ast.unparse(function) == "def foo(x):\n    y = x\n    return y"
+
+def test_fingerprint_function_depends_on_context():
+    function = parse_function("def foo(x):\n\treturn bar(x)\n")
+
+    assert fingerprint_function(function, [("bar", "summary")]) != fingerprint_function(function, [("bar", "other summary")])
+    assert fingerprint_function(function, [("bar", "summary")] * 2) == fingerprint_function(function, [("bar", "summary")])
+
+def test_docstring_cache_fans_out_with_function_name():
+    cache = DocstringCache()
+    calls = []
+
+    first = cache.get_or_generate("key", "foo", lambda: calls.append(1) or make_docstring("foo"))
+    second = cache.get_or_generate("key", "bar", lambda: calls.append(1) or make_docstring("bar"))
+
+    assert len(calls) == 1
+    assert first.function_name == "foo" and second.function_name == "bar"
+    assert second.summary == first.summary
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_docstring_cache_coalesces_concurrent_requests():
+    cache = DocstringCache()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.1)
+        return make_docstring()
+
+    threads = [threading.Thread(target=cache.get_or_generate, args=("key", f"f{i}", generate)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert cache.coalesced == 4
+
+def test_docstring_cache_persists_across_runs(tmp_path):
+    file_path = str(tmp_path / "cache.json")
+    cache = DocstringCache(file_path)
+    cache.get_or_generate("key", "foo", make_docstring)
+    cache.save()
+
+    assert DocstringCache(file_path).get("key", "bar") == make_docstring("bar")
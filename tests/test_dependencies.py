@@ -1,10 +1,24 @@
+import io
+import json
 import networkx as nx
+import pytest
 
 from unittest.mock import patch
 
 from docgen.dependencies import (
     build_graph_from_json,
+    build_graph_from_json_stream,
+    iter_json_object,
+    load_graph,
+    load_graph_cache,
+    save_graph_cache,
+    build_graph_from_package,
+    build_module_index,
+    find_package_root,
     build_graph_from_nodes_and_edges,
+    build_symbol_graph,
+    get_module_generations,
+    get_module_order,
     get_imports,
     is_documentable_file,
 )
@@ -44,3 +58,127 @@ def test_build_graph_from_json_with_imports(mock_open):
         G = build_graph_from_json('x')
         assert list(G.nodes) == ['some_file.py', 'some_import']
         assert list(G.edges) == [('some_import', 'some_file.py')]
+
+def test_build_symbol_graph_links_exact_functions(make_analysis):
+    analyses = {
+        "a.py": make_analysis("package.a", {"f": ["package.a.f"], "g": []}),
+        "b.py": make_analysis("package.b", {"h": ["package.a.f", "package.a.Unknown"], "i": ["package.b.h"]}),
+    }
+    G = build_symbol_graph(analyses)
+
+    assert set(G.nodes) == {"package.a.f", "package.a.g", "package.b.h", "package.b.i"}
+    assert set(G.edges) == {("package.a.f", "package.b.h"), ("package.b.h", "package.b.i")}
+    assert G.nodes["package.b.h"] == {"module": "b.py", "name": "h"}
+
+def test_get_module_order_no_cycles():
+    G = build_graph_from_nodes_and_edges(["a", "b", "c"], [("a", "b"), ("b", "c")])
+    assert get_module_order(G) == [["a"], ["b"], ["c"]]
+
+def test_get_module_order_groups_cycles():
+    # b, c and d form a cycle; b only imports c from it, c and d both import two members
+    G = build_graph_from_nodes_and_edges(
+        ["a", "b", "c", "d", "e"],
+        [("a", "b"), ("b", "c"), ("c", "b"), ("d", "c"), ("c", "d"), ("b", "d"), ("d", "e")]
+    )
+    order = get_module_order(G)
+
+    assert order[0] == ["a"]
+    assert sorted(order[1]) == ["b", "c", "d"]
+    assert order[1] == ["b", "c", "d"]
+    assert order[2] == ["e"]
+
+def test_get_module_generations_with_cycle():
+    G = build_graph_from_nodes_and_edges(["a", "b", "c"], [("a", "b"), ("b", "a"), ("b", "c")])
+    assert get_module_generations(G) == [["a", "b"], ["c"]]
+
+def make_package(write_package):
+    paths = write_package("pkg", {
+        "__init__.py": "",
+        "sub/__init__.py": "from .leaf import leaf\n",
+        "helper.py": "import os\n\ndef helper():\n\treturn 1\n",
+        "main.py": "from .helper import helper\nfrom pkg.sub import leaf\n\ndef main():\n\treturn helper()\n",
+        "sub/leaf.py": "from .. import helper\nimport pkg.main\n\ndef leaf():\n\treturn 1\n",
+    })
+    return paths["__init__.py"].parent
+
+def test_find_package_root(tmp_path, write_package):
+    package = make_package(write_package)
+
+    assert find_package_root(package / "sub" / "leaf.py") == package.resolve()
+    assert find_package_root(package / "sub") == package.resolve()
+    with pytest.raises(ValueError):
+        find_package_root(tmp_path)
+
+def test_build_module_index(write_package):
+    package = make_package(write_package).resolve()
+
+    assert build_module_index(package) == {
+        str(package / "__init__.py"): "pkg",
+        str(package / "helper.py"): "pkg.helper",
+        str(package / "main.py"): "pkg.main",
+        str(package / "sub" / "__init__.py"): "pkg.sub",
+        str(package / "sub" / "leaf.py"): "pkg.sub.leaf",
+    }
+
+def test_build_graph_from_package(write_package):
+    package = make_package(write_package).resolve()
+    helper, main, leaf, sub = (str(package / p) for p in ("helper.py", "main.py", "sub/leaf.py", "sub/__init__.py"))
+
+    G = build_graph_from_package(package)
+
+    assert {helper, main, leaf} <= set(G.nodes)
+    assert set(G.edges) == {(helper, main), (leaf, main), (helper, leaf), (main, leaf), (leaf, sub)}
+
+DEPS = {
+    "pkg": {"name": "pkg", "path": "/src/pkg/__init__.py"},
+    "pkg.a": {"name": "pkg.a", "path": "/src/pkg/a.py", "bacon": 1},
+    "pkg.b": {"name": "pkg.b", "path": "/src/pkg/b.py", "imports": ["pkg.a", "pkg"]},
+    "pkg.c": {"name": "pkg.c", "path": "/src/pkg/c.py", "imports": ["pkg.b"], "imported_by": []},
+}
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_json_object(chunk_size):
+    text = json.dumps({"a": {"x": [1, 2]}, "b": 12345, "c": "}{,:", "d": []}, indent=2)
+
+    assert list(iter_json_object(io.StringIO(text), chunk_size)) == [("a", {"x": [1, 2]}), ("b", 12345), ("c", "}{,:"), ("d", [])]
+    assert list(iter_json_object(io.StringIO(" { } "), chunk_size)) == []
+
+def test_iter_json_object_rejects_other_json():
+    with pytest.raises(ValueError):
+        list(iter_json_object(io.StringIO("[1, 2]")))
+
+def test_build_graph_from_json_stream_matches_build_graph_from_json(tmp_path):
+    deps_file = tmp_path / "deps.json"
+    deps_file.write_text(json.dumps(DEPS, indent=4))
+
+    streamed = build_graph_from_json_stream(deps_file)
+    loaded = build_graph_from_json(deps_file)
+
+    assert list(streamed.nodes) == list(loaded.nodes)
+    assert list(streamed.edges) == list(loaded.edges)
+
+def test_graph_cache_round_trip(tmp_path):
+    G = build_graph_from_nodes_and_edges(["a", "b", "c"], [("a", "b"), ("b", "c"), ("c", "b")])
+    save_graph_cache(G, tmp_path / "graph")
+
+    cached = load_graph_cache(tmp_path / "graph")
+
+    assert list(cached.nodes) == list(G.nodes)
+    assert list(cached.edges) == list(G.edges)
+
+def test_load_graph_uses_cache_until_dependencies_change(tmp_path):
+    deps_file = tmp_path / "deps.json"
+    deps_file.write_text(json.dumps(DEPS))
+    cache_dir = tmp_path / "cache"
+
+    first = load_graph(deps_file, cache_dir)
+    with patch("docgen.dependencies.build_graph_from_json_stream") as mock_build:
+        second = load_graph(deps_file, cache_dir)
+        mock_build.assert_not_called()
+
+    assert list(first.edges) == list(second.edges)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    deps_file.write_text(json.dumps({"pkg.a": DEPS["pkg.a"]}))
+    assert list(load_graph(deps_file, cache_dir).nodes) == ["/src/pkg/a.py"]
+    assert len(list(cache_dir.iterdir())) == 2
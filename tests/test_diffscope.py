@@ -0,0 +1,62 @@
+import ast
+import networkx as nx
+
+from unittest.mock import patch
+
+from docgen.diffscope import docgen_diff, get_changed_functions, parse_line_ranges, parse_unified_diff
+from docgen.pydantic_models import ModuleDocstring
+
+DIFF = """diff --git a/pkg/helper.py b/pkg/helper.py
+index 1111111..2222222 100644
+--- a/pkg/helper.py
++++ b/pkg/helper.py
+@@ -3 +3 @@ def inner():
+-\treturn 1
++\treturn 3
+@@ -10,2 +9,0 @@ def other():
+diff --git a/old.py b/old.py
+deleted file mode 100644
+--- a/old.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-x = 1
+-y = 2
+"""
+
+def test_parse_unified_diff():
+    assert parse_unified_diff(DIFF) == {"pkg/helper.py": [(3, 3), (9, 9)]}
+
+def test_parse_line_ranges():
+    assert parse_line_ranges(["a.py:10-20", "a.py:5", "b.py:1-2"]) == {"a.py": [(10, 20), (5, 5)], "b.py": [(1, 2)]}
+
+def test_get_changed_functions():
+    tree = ast.parse("@decorator\ndef foo():\n\treturn 1\n\ndef bar():\n\treturn 2\n\ndef baz():\n\treturn 3\n")
+
+    assert get_changed_functions(tree, [(1, 1)]) == {"foo"}
+    assert get_changed_functions(tree, [(4, 6)]) == {"bar"}
+    assert get_changed_functions(tree, [(7, 7)]) == set()
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_docgen_diff_documents_changed_functions_and_callers(mock_function, mock_module, tmp_path, fake_function_docstring, write_package):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.return_value = ModuleDocstring(summary="A module")
+    paths = write_package("diffpkg", {
+        "helper.py": 'def inner():\n\t"""Old summary of inner"""\n\treturn 3\n\ndef other():\n\t"""Old summary of other"""\n\treturn 2\n',
+        "main.py": 'from diffpkg.helper import inner\n\ndef main():\n\t"""Old summary of main"""\n\treturn inner()\n\ndef unrelated():\n\t"""Old summary of unrelated"""\n\treturn 0\n',
+    })
+    helper, main = paths["helper.py"], paths["main.py"]
+    G = nx.DiGraph([(str(helper), str(main))])
+
+    documented = docgen_diff(G, "diffpkg", {"diffpkg/helper.py": [(3, 3)]}, str(tmp_path))
+
+    assert documented == ["diffpkg.helper.inner", "diffpkg.main.main"]
+    main_call = [call for call in mock_function.call_args_list if call.args[0].startswith("def main")][0]
+    assert main_call.args[1] == [("inner", "Summary of inner")]
+    assert '"""Old summary of other' in helper.read_text()
+    assert '"""Old summary of unrelated' in main.read_text()
+    assert '"""Summary of main' in main.read_text()
+    mock_module.assert_not_called()
+
+def test_docgen_diff_ignores_files_outside_the_graph(tmp_path):
+    assert docgen_diff(nx.DiGraph(), "diffpkg", {"README.md": [(1, 1)]}, str(tmp_path)) == []
@@ -1,4 +1,10 @@
-from docgen.docgen import file_path_to_module_name
+from unittest.mock import patch
+
+from docgen.analysis import analyze_modules
+import networkx as nx
+
+from docgen.docgen import docgen, docgen_functions, docgen_module, file_path_to_module_name
+from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
 
 
 
@@ -11,3 +17,58 @@ def test_file_path_to_module_name_sub_package():
 
 def test_file_path_to_module_name_useless_path():
     assert file_path_to_module_name("/home/tcotts/foo/bar.py", "foo") == "foo.bar"
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_docgen_functions_uses_exact_callee_summaries(mock_function, mock_module, tmp_path, fake_function_docstring):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.side_effect = lambda module_name, *args: ModuleDocstring(summary=f"Module {module_name}")
+
+    package = tmp_path / "granularpkg"
+    package.mkdir()
+    (package / "helper.py").write_text("def inner():\n\treturn 1\n\ndef outer():\n\treturn inner()\n")
+    (package / "main.py").write_text("from granularpkg.helper import inner\n\ndef main():\n\treturn inner()\n")
+    (package / "constants.py").write_text("X = 1\n")
+    jobs = [
+        (str(package / "helper.py"), "granularpkg.helper", []),
+        (str(package / "main.py"), "granularpkg.main", ["granularpkg.helper"]),
+        (str(package / "constants.py"), "granularpkg.constants", []),
+    ]
+
+    visited = docgen_functions("granularpkg", analyze_modules(jobs, max_workers=1), max_concurrency=3)
+
+    assert set(visited) == {"granularpkg.helper.inner", "granularpkg.helper.outer", "granularpkg.main.main"}
+    main_call = [call for call in mock_function.call_args_list if call.args[0].startswith("def main")][0]
+    assert main_call.args[1] == [("inner", "Summary of inner")]
+    assert (package / "main.py").read_text().startswith('"""Module granularpkg.main"""')
+    assert (package / "constants.py").read_text() == '"""Module granularpkg.constants"""\nX = 1\n'
+
+@patch("docgen.docgen.docgen_module")
+def test_docgen_documents_each_module_once_with_cycles(mock_docgen_module):
+    mock_docgen_module.side_effect = lambda node, package_name, parents, visited, *args: visited
+    # b and c import each other, and both import a; d imports both
+    G = nx.DiGraph([("a", "b"), ("a", "c"), ("b", "c"), ("c", "b"), ("b", "d"), ("c", "d")])
+
+    docgen(G, "package")
+
+    documented = [call.args[0] for call in mock_docgen_module.call_args_list]
+    assert documented[0] == "a" and documented[-1] == "d"
+    assert sorted(documented) == ["a", "b", "c", "d"]
+
+def test_file_path_to_module_name_uses_last_package_directory():
+    assert file_path_to_module_name("/home/foo/foo/bar/foo_utils.py", "foo") == "foo.bar.foo_utils"
+
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.modules.generate_docstring_for_function")
+def test_docgen_module_rewrites_mapped_file(mock_function, mock_module, tmp_path):
+    mock_function.return_value = FunctionDocstring(function_name="foo", summary="Does foo.", description="Desc.")
+    mock_module.return_value = ModuleDocstring(summary="The module.")
+    path = tmp_path / "pkg" / "mod.py"
+    path.parent.mkdir()
+    path.write_bytes(b"def foo():\r\n    return 1\r\n")
+
+    visited = docgen_module(str(path), "pkg", [], {})
+
+    assert visited == {"pkg.mod.foo": "Does foo."}
+    assert path.read_bytes() == b'"""The module."""\ndef foo():\n    """Does foo.\n\n    Desc.\n    """\n    return 1\n'
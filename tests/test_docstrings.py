@@ -5,8 +5,11 @@ from docgen.docstrings import (
         build_function_docstring_from_object,
         calculate_indentation,
         add_indentation,
-        build_module_docstring_from_object
+        build_module_docstring_from_object,
+        render_function_docstring,
+        wrap_text
 )
+import pytest
 
 
 def test_build_function_docstring_from_object_from_object_no_optional_attributes():
@@ -178,3 +181,63 @@ def test_build_module_docstring_from_object_summary_and_usage():
     expected_docstring = "This is a module\n\nUsage:\n\tThis is how to use the module\n"
     assert docstring == expected_docstring
 
+
+FULL_DOCSTRING = FunctionDocstring(
+    function_name="function",
+    summary="This a is a docstring",
+    description="This is a description",
+    parameters=["x (int): param1", "y: param2"],
+    returns="int",
+    raises=["ValueError: if x is negative"],
+    example="x = 1\ny = 2",
+)
+
+def test_render_function_docstring_google_matches_build_and_indent():
+    docstring_object = FULL_DOCSTRING.model_copy(update={"yields": "int"})
+    expected = add_indentation('"""' + build_function_docstring_from_object(docstring_object) + '"""', "\t")
+
+    assert render_function_docstring(docstring_object, "\t") == expected
+
+def test_render_function_docstring_nested_unit():
+    docstring_object = FunctionDocstring(function_name="f", summary="Summary", description="Desc", returns="int")
+
+    docstring = render_function_docstring(docstring_object, "        ", "    ")
+
+    assert docstring == '        """Summary\n\n        Desc\n        Returns:\n            int\n        """'
+
+def test_render_function_docstring_numpy():
+    docstring = render_function_docstring(FULL_DOCSTRING, "    ", "    ", style="numpy")
+
+    assert docstring == (
+        '    """This a is a docstring\n\n    This is a description\n\n'
+        '    Parameters\n    ----------\n    x : int\n        param1\n    y\n        param2\n\n'
+        '    Returns\n    -------\n    int\n\n'
+        '    Raises\n    ------\n    ValueError\n        if x is negative\n\n'
+        '    Examples\n    --------\n    x = 1\n    y = 2\n    """'
+    )
+
+def test_render_function_docstring_rest():
+    docstring = render_function_docstring(FULL_DOCSTRING, "    ", "    ", style="rest")
+
+    assert docstring == (
+        '    """This a is a docstring\n\n    This is a description\n\n'
+        '    :param int x: param1\n    :param y: param2\n    :returns: int\n    :raises ValueError: if x is negative\n\n'
+        '    Example::\n\n        x = 1\n        y = 2\n    """'
+    )
+
+def test_render_function_docstring_wraps_to_width():
+    docstring_object = FunctionDocstring(
+        function_name="f", summary="Summary", description="word " * 30, parameters=["x: " + "long " * 20]
+    )
+
+    docstring = render_function_docstring(docstring_object, "    ", "    ", width=40)
+
+    assert all(len(line) <= 40 for line in docstring.split("\n"))
+    assert "        long" in docstring
+
+def test_render_function_docstring_unknown_style():
+    with pytest.raises(ValueError):
+        render_function_docstring(FULL_DOCSTRING, "", style="epytext")
+
+def test_wrap_text_keeps_blank_lines():
+    assert wrap_text("a b c\n\nd", 3, "", "  ") == ["a b", "  c", "", "d"]
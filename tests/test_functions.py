@@ -1,6 +1,7 @@
 import ast
 import pytest
 
+from docgen.pydantic_models import FunctionDocstring
 from docgen.exceptions import InternalFunctionCalledError
 from docgen.functions import (
     get_function_name,
@@ -9,6 +10,8 @@ from docgen.functions import (
     remove_current_docstring,
     add_docstring_to_function,
     remove_current_docstring_from_source_code,
+    find_docstring_lines,
+    set_function_docstring,
     handle_call,
 )
 
@@ -137,6 +140,28 @@ def test_get_used_functions_multiple_functions_mixed_imports():
 
     assert used_functions == [('baz', 'This is the summary of baz'), ('bar.qux', 'This is the summary of qux')]
 
+def test_get_used_functions_deduplicates_and_ranks_by_call_count():
+
+    tree = ast.parse("def foo():\n\tbaz()\n\tbar.qux()\n\tfor _ in range(3):\n\t\tbar.qux(baz())\n")
+    imported_functions = {'baz': 'package.foo.baz', 'bar': 'package.bar'}
+    visited = {'package.foo.baz': 'This is the summary of baz', 'package.bar.qux': 'This is the summary of qux'}
+
+    used_functions = get_used_functions(tree.body[0], [], imported_functions, visited) # type: ignore
+
+    # both are called twice, so the one called first comes first
+    assert used_functions == [('baz', 'This is the summary of baz'), ('bar.qux', 'This is the summary of qux')]
+
+def test_get_used_functions_caps_the_number_of_functions():
+
+    tree = ast.parse("def foo():\n\ta()\n\tb()\n\tc()\n\tc()\n")
+    imported_functions = {name: f'package.m.{name}' for name in "abc"}
+    visited = {f'package.m.{name}': f'Summary of {name}' for name in "abc"}
+
+    assert get_used_functions(tree.body[0], [], imported_functions, visited, max_used_functions=2) == [ # type: ignore
+        ('c', 'Summary of c'), ('a', 'Summary of a')
+    ]
+    assert len(get_used_functions(tree.body[0], [], imported_functions, visited, max_used_functions=None)) == 3 # type: ignore
+
 def test_handle_call_raises_exception_with_internal_function():
 
     tree = ast.parse("def foo():\n\tbar()\n")
@@ -198,6 +223,23 @@ def test_remove_docstring_source_code_no_docstring():
 
     assert remove_current_docstring_from_source_code(code) == 'def foo():\n\tbar()\n'
 
+def test_remove_docstring_source_code_keeps_later_strings():
+    code = 'def foo():\n\t"""This is the docstring"""\n\tx = """a string"""\n\treturn """another"""\n'
+
+    assert remove_current_docstring_from_source_code(code) == 'def foo():\n\tx = """a string"""\n\treturn """another"""\n'
+
+def test_remove_docstring_source_code_only_first_statement():
+    code = 'def foo():\n\tbar()\n\t"""Not the docstring"""\n'
+
+    assert remove_current_docstring_from_source_code(code) == code
+
+def test_find_docstring_lines():
+    assert find_docstring_lines('def foo(a: dict[str, int] = {"x": 1}) -> str:\n    """Line one\n\n    Line two\n    """\n    return a\n') == (2, 5)
+    assert find_docstring_lines('def foo(\n    a,\n):\n    # a comment\n    \'\'\'Doc\'\'\' "continued"  # trailing\n    pass\n') == (5, 5)
+    assert find_docstring_lines('def foo():\n    """Not a docstring""".strip()\n') is None
+    assert find_docstring_lines('def foo(): """Same line"""\n') is None
+    assert find_docstring_lines('def foo(self):\n        """Method"""\n        pass') == (2, 2)
+
 def test_add_docstring_to_function():
     code = 'def foo():\n\tbar()\n'
     tree = ast.parse(code)
@@ -212,3 +254,50 @@ def test_add_docstring_to_function():
     
     assert func_code == 'def foo():\n\t"""This is the docstring"""\n\tbar()' # type: ignore
 
+
+def test_set_function_docstring_method_multiline_signature():
+    source = 'class A:\n    def foo(\n        self,\n    ):\n        """Old\n\n        docstring"""\n        return 1\n'
+    function = ast.parse(source).body[0].body[0] # type: ignore
+    code = ast.get_source_segment(source, function)
+    docstring_object = FunctionDocstring(function_name="foo", summary="New", description="Desc", returns="int")
+
+    updated = set_function_docstring(code, function, docstring_object) # type: ignore
+
+    assert updated == 'def foo(\n        self,\n    ):\n        """New\n\n        Desc\n        Returns:\n            int\n        """\n        return 1'
+
+def test_set_function_docstring_adds_missing_docstring():
+    code = 'def foo():\n\tbar()\n\treturn 1'
+    function = ast.parse(code).body[0]
+
+    updated = set_function_docstring(code, function, FunctionDocstring(function_name="foo", summary="New", description="Desc")) # type: ignore
+
+    assert updated == 'def foo():\n\t"""New\n\n\tDesc\n\t"""\n\tbar()\n\treturn 1'
+
+def test_set_function_docstring_only_docstring():
+    code = 'def foo():\n    """Old"""'
+    function = ast.parse(code).body[0]
+
+    updated = set_function_docstring(code, function, FunctionDocstring(function_name="foo", summary="New", description="Desc"), "rest") # type: ignore
+
+    assert updated == 'def foo():\n    """New\n\n    Desc\n    """'
+
+def test_set_function_docstring_decorated_first_statement():
+    source = 'def outer():\n    @dec\n    def inner():\n        pass\n    return inner\n'
+    function = ast.parse(source).body[0]
+
+    updated = set_function_docstring(source, function, FunctionDocstring(function_name="outer", summary="New", description="Desc")) # type: ignore
+
+    assert updated.startswith('def outer():\n    """New\n\n    Desc\n    """\n    @dec\n    def inner():')
+    ast.parse(updated)
+
+def test_set_function_docstring_one_line_body():
+    source = 'class A:\n    def f(self): return 1\n    def g(\n        self,\n    ) -> dict[str, int]: x = {}; return x\n    def h(self): """Old"""\n'
+    methods = ast.parse(source).body[0].body # type: ignore
+    docstring_object = FunctionDocstring(function_name="f", summary="New", description="Desc")
+
+    updated = [set_function_docstring(ast.get_source_segment(source, method), method, docstring_object) for method in methods] # type: ignore
+
+    assert updated[0] == 'def f(self):\n        """New\n\n        Desc\n        """\n        return 1'
+    assert updated[1].endswith(') -> dict[str, int]:\n        """New\n\n        Desc\n        """\n        x = {}; return x')
+    assert updated[2] == 'def h(self):\n        """New\n\n        Desc\n        """'
+    ast.parse("class A:\n    " + "\n    ".join(updated) + "\n")
@@ -240,6 +240,15 @@ def test_get_module_imports_relative():
 
     assert aliases == {"bar": "package.foo"}
 
+def test_get_module_imports_module_not_aliased():
+
+    tree = ast.parse("import package.foo\nfrom package import bar")
+    with patch("importlib.import_module") as mock_import_module:
+        mock_import_module.return_value = None
+        aliases = get_module_imports(tree, set(["package.foo", "package.bar"]), "package")
+
+    assert aliases == {"package.foo": "package.foo", "bar": "package.bar"}
+
 def test_get_module_imports_not_in_modules_imported():
 
     tree = ast.parse("from package.foo import bar as baz")
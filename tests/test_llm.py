@@ -0,0 +1,122 @@
+from openai.types.chat import ChatCompletion
+from unittest.mock import patch
+
+from docgen.llm import (
+    FUNCTION_DOCSTRING_SCHEMA,
+    FUNCTION_DOCSTRING_TOOL,
+    MODULE_DOCSTRING_SCHEMA,
+    MODULE_DOCSTRING_TOOL,
+    PromptCacheStats,
+    build_chat_request,
+    build_function_docstring_request,
+    build_module_context,
+    check_and_repair_function_docstring,
+    get_function_name,
+    parse_tool_output,
+)
+from docgen.pydantic_models import FunctionDocstring
+
+
+def make_completion(prompt_tokens: int, cached_tokens: int | None) -> ChatCompletion:
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10}
+    if cached_tokens is not None:
+        usage["prompt_tokens_details"] = {"cached_tokens": cached_tokens} # type: ignore
+    return ChatCompletion(**{
+        "id": "1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": None, "tool_calls": [
+                {"id": "1", "type": "function", "function": {"name": "FunctionDocstring", "arguments": "{}"}}
+            ]}
+        }],
+        "usage": usage
+    })
+
+def test_build_chat_request_prefix_before_user_prompt():
+    request = build_chat_request("system", "user", "Tool", "desc", {}, prefix_prompts=["prefix"])
+
+    assert [message["content"] for message in request["messages"]] == ["system", "prefix", "user"]
+
+def test_build_chat_request_previous_response():
+    request = build_chat_request("system", "user", "Tool", "desc", {}, ("bad output", "error"))
+
+    assert [message["role"] for message in request["messages"]] == ["system", "assistant", "user", "user"]
+    assert request["messages"][1]["content"] == "bad output"
+
+def test_build_function_docstring_request_with_module_context_shares_prefix():
+    context = build_module_context("package.foo", [("bar", "Summary of bar")])
+    first = build_function_docstring_request("def a():\n    bar()", [("bar", "Summary of bar")], module_context=context)
+    second = build_function_docstring_request("def b():\n    pass", [], module_context=context)
+
+    assert first["messages"][:2] == second["messages"][:2]
+    assert first["tools"] == second["tools"]
+    assert "Summary of bar" not in first["messages"][-1]["content"]
+    assert "Summary of bar" in first["messages"][1]["content"]
+
+def test_build_module_context_is_order_independent():
+    first = build_module_context("package.foo", [("bar", "b"), ("baz", "z"), ("bar", "b")])
+    second = build_module_context("package.foo", [("baz", "z"), ("bar", "b")])
+
+    assert first == second
+
+def test_prompt_cache_stats():
+    stats = PromptCacheStats()
+    stats.record(make_completion(1000, 800))
+    stats.record(make_completion(1000, None))
+
+    assert stats.requests == 2
+    assert stats.cached_tokens == 800
+    assert stats.cached_ratio == 0.4
+
+@patch("docgen.llm.send_request")
+def test_parse_tool_output_fixes_locally_without_requests(mock_send):
+    docstring = parse_tool_output('```json\n{"summary": "s", "description": "d"}\n```', FUNCTION_DOCSTRING_SCHEMA, FUNCTION_DOCSTRING_TOOL, {"function_name": "foo"})
+
+    assert docstring == FunctionDocstring(function_name="foo", summary="s", description="d")
+    mock_send.assert_not_called()
+
+@patch("docgen.llm.send_request")
+def test_parse_tool_output_sends_targeted_repair(mock_send):
+    mock_send.return_value = '{"description": "Fixed description"}'
+
+    docstring = parse_tool_output('{"function_name": "foo", "summary": "s", "returns": "int"}', FUNCTION_DOCSTRING_SCHEMA, FUNCTION_DOCSTRING_TOOL)
+
+    assert docstring == FunctionDocstring(function_name="foo", summary="s", description="Fixed description", returns="int")
+    request = mock_send.call_args.args[0]
+    assert [message["role"] for message in request["messages"]] == ["system", "user"]
+    assert "'description' is required" in request["messages"][1]["content"]
+    assert '"returns": "int"' in request["messages"][1]["content"]
+
+@patch("docgen.llm.send_request")
+def test_parse_tool_output_gives_up_after_max_repairs(mock_send):
+    mock_send.return_value = "still not json"
+
+    assert parse_tool_output("not json", MODULE_DOCSTRING_SCHEMA, MODULE_DOCSTRING_TOOL, max_repairs=2) is None
+    assert mock_send.call_count == 2
+
+def test_get_function_name():
+    assert get_function_name("@decorator\nasync def foo(a, b):\n    pass") == "foo"
+    assert get_function_name("x = 1") is None
+
+
+@patch("docgen.llm.send_request")
+def test_check_and_repair_function_docstring_skips_matching_docstrings(mock_send):
+    docstring = FunctionDocstring(function_name="foo", summary="s", description="d", parameters=["x: the value"])
+
+    assert check_and_repair_function_docstring("def foo(x):\n    return x", docstring) is docstring
+    mock_send.assert_not_called()
+
+@patch("docgen.llm.send_request")
+def test_check_and_repair_function_docstring_repairs_disagreeing_docstrings(mock_send):
+    mock_send.return_value = '{"summary": "s", "description": "d", "parameters": ["x: the value"]}'
+    docstring = FunctionDocstring(function_name="foo", summary="s", description="d", parameters=["y: wrong"], yields="x")
+
+    repaired = check_and_repair_function_docstring("def foo(x):\n    return x", docstring)
+
+    assert repaired == FunctionDocstring(function_name="foo", summary="s", description="d", parameters=["x: the value"])
+    assert "which are not parameters of foo" in mock_send.call_args.args[0]["messages"][1]["content"]
+    assert mock_send.call_count == 1
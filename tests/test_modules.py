@@ -1,4 +1,5 @@
 import ast
+import time
 
 from unittest.mock import patch
 
@@ -7,7 +8,11 @@ from docgen.modules import (
         get_all_internal_functions,
         generate_docstrings_for_all_functions,
         add_top_level_docstring,
-        find_if_name_main
+        find_if_name_main,
+        generate_docstrings_for_module,
+        get_existing_summaries,
+        replace_top_level_docstring,
+        ModuleDocumenter
 )
 from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
 
@@ -72,9 +77,7 @@ def test_generate_docstrings_for_all_functions_with_internal_calls(mock_generate
     assert visited['package.foo.bar'] == "This is the docstring for bar"
 
 @patch("docgen.modules.generate_docstring_for_function")
-@patch("docgen.modules.build_function_docstring_from_object")
-@patch("docgen.modules.add_docstring_to_function")
-def test_generate_docstrings_for_all_functions_no_existing_docstrings(mock_add, mock_build, mock_generate):
+def test_generate_docstrings_for_all_functions_no_existing_docstrings(mock_generate):
 
     mock_generate.side_effect = [
         FunctionDocstring(
@@ -89,13 +92,6 @@ def test_generate_docstrings_for_all_functions_no_existing_docstrings(mock_add,
         ),
     ]
 
-    mock_build.side_effect = ['"""This is the docstring for foo\n\nThis is the description for foo\n"""', '"""This is the docstring for bar\n\nThis is the description for bar\n"""']
-
-    mock_add.side_effect = [
-        'def foo():\n\t"""This is the docstring for foo\n\n\tThis is the description for foo\n\t"""\n\tprint(\"Hello World\")',
-        'def bar():\n\t"""This is the docstring for bar\n\n\tThis is the description for bar\n\t"""\n\tprint(\"Hello World\")',
-    ]
-
     source_code = "def foo():\n\tprint(\"Hello World\")\n\ndef bar():\n\tprint(\"Hello World\")\n"
 
     module = ast.parse(source_code)
@@ -116,9 +112,7 @@ def test_generate_docstrings_for_all_functions_no_existing_docstrings(mock_add,
     assert updated_source_code == expected_source_code
 
 @patch("docgen.modules.generate_docstring_for_function")
-@patch("docgen.modules.build_function_docstring_from_object")
-@patch("docgen.modules.add_docstring_to_function")
-def test_generate_docstrings_for_all_functions_with_existing_docstrings(mock_add, mock_build, mock_generate):
+def test_generate_docstrings_for_all_functions_with_existing_docstrings(mock_generate):
 
     mock_generate.side_effect = [
         FunctionDocstring(
@@ -133,13 +127,6 @@ def test_generate_docstrings_for_all_functions_with_existing_docstrings(mock_add
         ),
     ]
 
-    mock_build.side_effect = ['"""This is the docstring for foo\n\nThis is the description for foo\n"""', '"""This is the docstring for bar\n\nThis is the description for bar\n"""']
-
-    mock_add.side_effect = [
-        'def foo():\n\t"""This is the docstring for foo\n\n\tThis is the description for foo\n\t"""\n\tprint(\"Hello World\")',
-        'def bar():\n\t"""This is the docstring for bar\n\n\tThis is the description for bar\n\t"""\n\tprint(\"Hello World\")',
-    ]
-
     source_code = 'def foo():\n\t\"\"\"Old docstring\"\"\"\n\tprint(\"Hello World\")\n\ndef bar():\n\t\"\"\"Old docstring\"\"\"\n\tprint(\"Hello World\")\n'
 
     module = ast.parse(source_code)
@@ -198,6 +185,13 @@ def test_add_top_level_docstring_docstring_exists(mock_object, mock_generate):
 
     assert updated_source_code == expected_source_code
 
+def test_replace_top_level_docstring_replaces_exact_literal():
+    source_code = '# -*- coding: utf-8 -*-\n"""Ünïcode summary\n\n    Indented details\n    """\nx = "Ünïcode summary"\n'
+
+    updated_source_code = replace_top_level_docstring(source_code, ast.parse(source_code), "New summary")
+
+    assert updated_source_code == '# -*- coding: utf-8 -*-\n"""New summary"""\nx = "Ünïcode summary"\n'
+
 def test_find_if_name_main_no_if_name_main():
 
     source_code = "print(\"Hello World\")\n"
@@ -211,3 +205,106 @@ def test_find_if_name_main():
     name_main = find_if_name_main(source_code)
 
     assert name_main == "print(\"Hello World\")"
+
+@patch("docgen.modules.add_top_level_docstring")
+@patch("docgen.modules.generate_docstring_for_function")
+def test_generate_docstrings_for_module_cache_prompt_prefix(mock_generate, mock_top_level):
+
+    mock_generate.side_effect = [
+        FunctionDocstring(function_name="foo", summary="Summary of foo", description="desc"),
+        FunctionDocstring(function_name="bar", summary="Summary of bar", description="desc"),
+    ]
+    mock_top_level.side_effect = lambda source_code, *args: source_code
+    source_code = "from package.baz import qux\n\ndef foo():\n\tqux()\n\ndef bar():\n\tprint(1)\n"
+    visited = {"package.baz.qux": "Summary of qux"}
+
+    generate_docstrings_for_module(source_code, [], visited, "package.foo", {"qux": "package.baz.qux"}, cache_prompt_prefix=True)
+
+    contexts = [call.args[5] for call in mock_generate.call_args_list]
+    assert contexts[0] == contexts[1]
+    assert "Summary of qux" in contexts[0]
+
+@patch("docgen.modules.add_top_level_docstring")
+@patch("docgen.modules.generate_docstring_for_function")
+def test_generate_docstrings_for_module_context_is_not_capped(mock_generate, mock_top_level):
+    mock_generate.return_value = FunctionDocstring(function_name="foo", summary="Summary of foo", description="desc")
+    mock_top_level.side_effect = lambda source_code, *args: source_code
+    names = [f"f{i}" for i in range(30)]
+    source_code = f"from package.baz import {', '.join(names)}\n\ndef foo():\n" + "".join(f"\t{name}()\n" for name in names)
+    imported_functions = {name: f"package.baz.{name}" for name in names}
+    visited = {f"package.baz.{name}": f"Summary of {name}" for name in names}
+
+    generate_docstrings_for_module(source_code, [], visited, "package.foo", imported_functions, cache_prompt_prefix=True)
+
+    context = mock_generate.call_args.args[5]
+    assert all(f"Summary of {name}" in context for name in names)
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.modules.generate_docstring_for_function")
+def test_module_documenter_documents_functions_in_any_order(mock_generate, mock_module):
+
+    mock_generate.side_effect = lambda function, *args: FunctionDocstring(
+        function_name=function.name, summary=f"Summary of {function.name}", description="desc"
+    )
+    mock_module.return_value = ModuleDocstring(summary="A module called foo")
+    documenter = ModuleDocumenter("def foo():\n\tbar()\n\ndef bar():\n\tpass\n", "package.foo", {})
+    visited = {}
+
+    assert documenter.document_function("bar", visited) is False
+    assert documenter.document_function("foo", visited) is True
+    assert visited == {"package.foo.bar": "Summary of bar", "package.foo.foo": "Summary of foo"}
+
+    source_code = documenter.assemble()
+    assert source_code.startswith('"""A module called foo"""\ndef foo():\n\t"""Summary of foo')
+    assert mock_module.call_args[0][1] == [("package.foo.foo", "Summary of foo"), ("package.foo.bar", "Summary of bar")]
+
+@patch("docgen.modules.generate_docstring_for_function")
+def test_generate_docstrings_for_all_functions_mutual_recursion(mock_generate):
+
+    def generate(function, internal_functions, *args):
+        if internal_functions:
+            raise InternalFunctionCalledError
+        return FunctionDocstring(function_name=function.name, summary=f"Summary of {function.name}", description="desc")
+
+    mock_generate.side_effect = generate
+    source_code = "def foo(n):\n\treturn bar(n - 1)\n\ndef bar(n):\n\treturn foo(n - 1)\n"
+    internal_functions = get_all_internal_functions(ast.parse(source_code))
+
+    _, visited = generate_docstrings_for_all_functions(source_code, "package.foo", {}, internal_functions, {})
+
+    assert visited == {"package.foo.foo": "Summary of foo", "package.foo.bar": "Summary of bar"}
+
+def test_get_existing_summaries():
+    tree = ast.parse('def foo():\n\t"""Summary of foo\n\n\tDescription"""\n\ndef bar():\n\tpass\n')
+    assert get_existing_summaries(tree, "package.mod") == {"package.mod.foo": "Summary of foo"}
+
+class UnwalkableSummaries(dict):
+    """Summaries which fail the test if every key is visited, as when a module walks the summaries of the whole run."""
+
+    def keys(self):
+        raise AssertionError("the summaries of the whole run were walked")
+
+    def __iter__(self):
+        raise AssertionError("the summaries of the whole run were walked")
+
+    def items(self):
+        raise AssertionError("the summaries of the whole run were walked")
+
+def document_module_with_summaries(total_functions: int) -> float:
+    visited = UnwalkableSummaries((f"package.other{i // 100}.f{i}", "summary") for i in range(total_functions))
+    source_code = "".join(f"def f{i}():\n\treturn {i}\n\n" for i in range(20))
+    start = time.perf_counter()
+    generate_docstrings_for_module(source_code, [], visited, "package.mod", {})
+    return time.perf_counter() - start
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.modules.generate_docstring_for_function")
+def test_generate_docstrings_for_module_overhead_is_flat(mock_function, mock_module):
+    mock_function.side_effect = lambda function, *args: FunctionDocstring(function_name=function.name, summary="s", description="d")
+    mock_module.return_value = ModuleDocstring(summary="Module")
+
+    small = min(document_module_with_summaries(1_000) for _ in range(3))
+    large = min(document_module_with_summaries(100_000) for _ in range(3))
+
+    # a module of 20 functions costs the same among 1k or 100k summaries
+    assert large < small * 3
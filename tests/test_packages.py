@@ -0,0 +1,66 @@
+import ast
+import pytest
+
+from unittest.mock import patch
+
+from docgen.packages import docgen_packages, find_packages, get_summary, reduce_items
+from docgen.pydantic_models import ModuleDocstring
+
+
+def fake_package_docstring(package_name, items, part=None, prev_response=None):
+    names = ", ".join(name for name, _ in items)
+    if part is not None:
+        return ModuleDocstring(summary=f"Part {part[0]} of {package_name}: {names}")
+    return ModuleDocstring(summary=f"Package {package_name}: {names}")
+
+def make_tree(tmp_path):
+    root = tmp_path / "tree"
+    (root / "sub" / "leaf").mkdir(parents=True)
+    (root / "__init__.py").write_text("")
+    (root / "main.py").write_text('"""Runs the tree.\n\nMore detail."""\n')
+    (root / "sub" / "__init__.py").write_text("from tree.sub.a import f\n")
+    (root / "sub" / "a.py").write_text('"""Module a."""\n')
+    (root / "sub" / "b.py").write_text("def g():\n\treturn 1\n")
+    (root / "sub" / "leaf" / "__init__.py").write_text("")
+    (root / "sub" / "leaf" / "c.py").write_text('"""Module c."""\n')
+    return root
+
+def test_get_summary():
+    assert get_summary('"""First line\ncontinued.\n\nMore."""\n') == "First line continued."
+    assert get_summary("x = 1\n") is None
+
+def test_find_packages(tmp_path):
+    root = make_tree(tmp_path)
+
+    assert find_packages(root) == [root, root / "sub", root / "sub" / "leaf"]
+
+@patch("docgen.packages.generate_package_docstring")
+def test_reduce_items_batches_siblings(mock_generate):
+    mock_generate.side_effect = fake_package_docstring
+    items = [(f"pkg.m{i}", f"Module {i}") for i in range(7)]
+
+    reduced = reduce_items("pkg", items, 3)
+
+    # 7 items become 3 batch summaries, which fit in a single request
+    assert [part for *_, part in (call.args for call in mock_generate.call_args_list)] == [(1, 3), (2, 3), (3, 3)]
+    assert reduced[0] == ("pkg.m0 to pkg.m2", "Part 1 of pkg: pkg.m0, pkg.m1, pkg.m2")
+    assert len(reduced) == 3
+    assert reduce_items("pkg", items[:3], 3) == items[:3]
+    with pytest.raises(ValueError):
+        reduce_items("pkg", items, 1)
+
+@patch("docgen.packages.generate_package_docstring")
+def test_docgen_packages_bottom_up(mock_generate, tmp_path):
+    mock_generate.side_effect = fake_package_docstring
+    root = make_tree(tmp_path)
+
+    summaries = docgen_packages(root, max_concurrency=2)
+
+    assert summaries == {
+        "tree.sub.leaf": "Package tree.sub.leaf: tree.sub.leaf.c",
+        "tree.sub": "Package tree.sub: tree.sub.a, tree.sub.leaf",
+        "tree": "Package tree: tree.main, tree.sub",
+    }
+    sub_init = (root / "sub" / "__init__.py").read_text()
+    assert ast.get_docstring(ast.parse(sub_init)) == "Package tree.sub: tree.sub.a, tree.sub.leaf"
+    assert "from tree.sub.a import f" in sub_init
@@ -0,0 +1,91 @@
+import networkx as nx
+import pytest
+import threading
+import time
+
+from unittest.mock import patch
+
+from docgen.docgen import docgen
+from docgen.pipeline import ModuleSummaries, docgen_streaming, run_stage
+from docgen.pydantic_models import ModuleDocstring
+
+
+def test_run_stage_applies_function_in_order():
+    assert list(run_stage(lambda x: x * 2, range(20))) == [x * 2 for x in range(20)]
+    assert sorted(run_stage(lambda x: x * 2, range(20), workers=4)) == [x * 2 for x in range(20)]
+
+def test_run_stage_applies_backpressure():
+    pulled = []
+
+    def source():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    stream = run_stage(lambda x: x, source(), maxsize=2)
+    next(stream)
+    time.sleep(0.1)
+    # the input queue, the item being processed and the output queue bound how far the producer runs ahead
+    assert len(pulled) <= 8
+
+def test_run_stage_reraises_errors():
+    def fail(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    with pytest.raises(ValueError):
+        list(run_stage(fail, range(10)))
+
+def test_module_summaries_released_after_last_importer():
+    G = nx.DiGraph([("pkg/a.py", "pkg/b.py"), ("pkg/a.py", "pkg/c.py")])
+    summaries = ModuleSummaries(G, "pkg")
+
+    summaries.publish("pkg/a.py", {"pkg.a.f": "Summary of f", "pkg.a.sub.g": "Not in a"})
+    assert summaries.wait_for(["pkg/a.py"]) == {"pkg.a.f": "Summary of f"}
+    summaries.publish("pkg/b.py", {})
+    assert "pkg/a.py" in summaries.summaries
+    summaries.publish("pkg/c.py", {})
+    assert summaries.summaries == {}
+
+def test_module_summaries_wait_for_blocks_until_published():
+    summaries = ModuleSummaries(nx.DiGraph([("pkg/a.py", "pkg/b.py")]), "pkg")
+    timer = threading.Timer(0.05, summaries.publish, ("pkg/a.py", {"pkg.a.f": "Summary of f"}))
+    timer.start()
+
+    assert summaries.wait_for(["pkg/a.py"]) == {"pkg.a.f": "Summary of f"}
+
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_docgen_streaming(mock_function, mock_module, tmp_path, fake_function_docstring):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.side_effect = lambda module_name, *args: ModuleDocstring(summary=f"Module {module_name}")
+    package = tmp_path / "streampkg"
+    package.mkdir()
+    helper = package / "helper.py"
+    helper.write_text("def inner():\n\treturn 1\n")
+    ping = package / "ping.py"
+    ping.write_text("from streampkg.helper import inner\nimport streampkg.pong\n\ndef ping():\n\treturn inner()\n")
+    pong = package / "pong.py"
+    pong.write_text("import streampkg.ping\n\ndef pong():\n\treturn 2\n")
+    main = package / "main.py"
+    main.write_text("from streampkg.helper import inner\n\ndef main():\n\treturn inner()\n")
+    G = nx.DiGraph([(str(helper), str(ping)), (str(ping), str(pong)), (str(pong), str(ping)), (str(helper), str(main))])
+
+    written = docgen_streaming(G, "streampkg", max_concurrency=3, queue_size=1)
+
+    assert written[0] == "streampkg.helper"
+    assert sorted(written) == ["streampkg.helper", "streampkg.main", "streampkg.ping", "streampkg.pong"]
+    for name in ("main", "ping"):
+        call = [call for call in mock_function.call_args_list if call.args[0].startswith(f"def {name}")][0]
+        assert call.args[1] == [("inner", "Summary of inner")]
+    assert main.read_text().startswith('"""Module streampkg.main"""')
+    assert '"""Summary of pong' in pong.read_text()
+
+@patch("docgen.pipeline.docgen_streaming")
+def test_docgen_streaming_flag(mock_streaming):
+    G = nx.DiGraph([("a", "b")])
+
+    docgen(G, "package", max_concurrency=2, streaming=True)
+
+    mock_streaming.assert_called_once_with(G, "package", None, False, 2)
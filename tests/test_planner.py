@@ -0,0 +1,75 @@
+import networkx as nx
+import pytest
+
+from docgen.planner import (
+    build_task_graph,
+    count_tokens,
+    estimate_tokens,
+    get_critical_path,
+    plan_run,
+    simulate_schedule,
+)
+
+
+def make_package(write_package):
+    paths = write_package("planpkg", {
+        "helper.py": "def inner():\n\treturn 1\n\ndef outer():\n\treturn inner()\n",
+        "main.py": "from planpkg.helper import outer\n\ndef main():\n\treturn outer()\n\nif __name__ == \"__main__\":\n\tmain()\n",
+    })
+    return nx.DiGraph([(str(paths["helper.py"]), str(paths["main.py"]))])
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 400) == 101
+
+def test_count_tokens_is_positive():
+    assert count_tokens("def foo():\n\treturn 1\n") > 0
+
+def test_build_task_graph(write_package):
+    tasks = build_task_graph(make_package(write_package), "planpkg")
+
+    assert set(tasks.nodes) == {
+        "planpkg.helper.inner", "planpkg.helper.outer", "module:planpkg.helper", "planpkg.main.main", "module:planpkg.main"
+    }
+    assert ("planpkg.helper.inner", "planpkg.helper.outer") in tasks.edges
+    assert ("planpkg.helper.outer", "planpkg.main.main") in tasks.edges
+    assert ("planpkg.main.main", "module:planpkg.main") in tasks.edges
+    assert all(tokens > 0 for _, tokens in tasks.nodes(data="input_tokens"))
+
+def test_get_critical_path():
+    C = nx.DiGraph([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+
+    assert get_critical_path(C, {"a": 1.0, "b": 5.0, "c": 2.0, "d": 1.0}) == (["a", "b", "d"], 7.0)
+    assert get_critical_path(nx.DiGraph(), {}) == ([], 0.0)
+
+def test_simulate_schedule():
+    C = nx.DiGraph()
+    C.add_nodes_from(["a", "b", "c", "d"])
+    duration = {"a": 4.0, "b": 3.0, "c": 2.0, "d": 1.0}
+
+    assert simulate_schedule(C, duration, 1) == 10.0
+    assert simulate_schedule(C, duration, 2) == 5.0
+    assert simulate_schedule(nx.DiGraph([("a", "b")]), duration, 4) == 7.0
+
+def test_simulate_schedule_starts_the_critical_path_first():
+    C = nx.DiGraph([("x1", "x2"), ("x2", "x3")])
+    C.add_nodes_from(["a", "b", "c", "d"])
+    duration = {node: 1.0 for node in C.nodes}
+
+    # starting the independent tasks first by name would take 5
+    assert simulate_schedule(C, duration, 2) == 4.0
+
+def test_plan_run(write_package):
+    G = make_package(write_package)
+    plan = plan_run(G, "planpkg", max_concurrency=4, latency=1.0, output_tokens_per_second=100.0)
+
+    assert plan.requests == 5
+    assert plan.output_tokens == 3 * 200 + 2 * 150
+    assert plan.critical_path == ["planpkg.helper.inner", "planpkg.helper.outer", "planpkg.main.main", "module:planpkg.main"]
+    assert plan.critical_path_seconds == pytest.approx(3 * 3.0 + 2.5)
+    assert plan.predicted_seconds == pytest.approx(plan.critical_path_seconds)
+    assert plan.cost == pytest.approx(plan.input_tokens * 0.03 / 1000 + plan.output_tokens * 0.06 / 1000)
+
+    limited = plan_run(G, "planpkg", requests_per_minute=1)
+    assert limited.predicted_seconds == 300
+    assert "Predicted wall time: 300s" in str(limited)
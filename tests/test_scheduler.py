@@ -0,0 +1,135 @@
+import networkx as nx
+import pytest
+import threading
+
+from docgen.scheduler import PipelineScheduler, get_priorities, get_required_symbols
+from docgen.store import SummaryStore
+
+
+def test_summary_store_notifies_subscribers():
+    store = SummaryStore()
+    seen = []
+    store.subscribe(lambda key, value: seen.append((key, value)))
+    store["package.foo.bar"] = "summary"
+
+    assert seen == [("package.foo.bar", "summary")]
+    assert store == {"package.foo.bar": "summary"}
+
+def test_summary_store_indexes_summaries_by_module():
+    store = SummaryStore({"package.a.f": "f"})
+    seen = []
+    store.subscribe(lambda key, value: seen.append(key))
+    store["package.a.g"] = "g"
+    store.update({"package.b.h": "h"})
+    store |= {"package.b.i": "i"}
+    store.setdefault("package.c.j", "j")
+
+    assert store.get_module_summaries("package.a") == {"package.a.f": "f", "package.a.g": "g"}
+    assert store.get_module_summaries("package.b") == {"package.b.h": "h", "package.b.i": "i"}
+    # summaries merged with update come from elsewhere, so only assignments notify
+    assert seen == ["package.a.g", "package.c.j"]
+
+    del store["package.a.f"]
+    store.pop("package.b.h")
+    assert store.get_module_summaries("package.a") == {"package.a.g": "g"}
+    assert store.get_module_summaries("package.b") == {"package.b.i": "i"}
+    store.clear()
+    assert store.get_module_summaries("package.a") == {}
+
+def test_get_required_symbols_ignores_internal_and_unknown_calls(make_analysis):
+    analyses = {
+        "a.py": make_analysis("package.a", {"f": [], "g": ["package.a.f"]}),
+        "b.py": make_analysis("package.b", {"h": ["package.a.g", "package.a.SomeClass", "package.b.i"], "i": []}),
+    }
+
+    assert get_required_symbols(analyses) == {"a.py": set(), "b.py": {"package.a.g"}}
+
+def test_pipeline_scheduler_starts_downstream_before_upstream_finishes():
+    G = nx.DiGraph([("a.py", "b.py")])
+    visited = SummaryStore()
+    b_started = threading.Event()
+    order = []
+
+    def document_module(node):
+        if node == "a.py":
+            visited["package.a.f"] = "Summary of f"
+            # b only needs f, so it must start before a finishes
+            assert b_started.wait(timeout=5)
+            visited["package.a.g"] = "Summary of g"
+            order.append("a done")
+        else:
+            b_started.set()
+            order.append("b started")
+
+    scheduler = PipelineScheduler(G.nodes, {"a.py": set(), "b.py": {"package.a.f"}}, document_module, visited, max_workers=2)
+    scheduler.run()
+
+    assert order == ["b started", "a done"]
+
+def test_pipeline_scheduler_breaks_cycles_with_partial_summaries():
+    G = nx.DiGraph([("a.py", "b.py"), ("b.py", "a.py")])
+    visited = SummaryStore()
+    documented = []
+
+    def document_module(node):
+        documented.append(node)
+        visited[f"package.{node[0]}.f"] = "summary"
+
+    required = {"a.py": {"package.b.f"}, "b.py": {"package.a.f"}}
+    PipelineScheduler(G.nodes, required, document_module, visited, max_workers=2).run()
+
+    assert documented == ["a.py", "b.py"]
+
+def test_pipeline_scheduler_raises_module_errors():
+    G = nx.DiGraph()
+    G.add_node("a.py")
+
+    def document_module(node):
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        PipelineScheduler(G.nodes, {}, document_module, SummaryStore()).run()
+
+
+def test_get_priorities():
+    G = nx.DiGraph([("helper", "a"), ("helper", "b"), ("a", "c"), ("b", "c"), ("c", "d"), ("d", "c")])
+    G.add_node("script")
+
+    priorities = get_priorities(G)
+
+    assert priorities["helper"] == (4.0, 4)
+    assert priorities["a"] == (3.0, 2)
+    assert priorities["c"] == priorities["d"] == (2.0, 1)
+    assert priorities["script"] == (1.0, 0)
+    assert get_priorities(G, {"b": 5})["helper"] == (8.0, 4)
+
+def test_pipeline_scheduler_starts_highest_priority_first():
+    visited = SummaryStore()
+    started = []
+
+    def document_module(node):
+        started.append(node)
+
+    units = ["leaf.py", "script.py", "helper.py", "other.py"]
+    priorities = {"helper.py": (3.0, 10), "other.py": (3.0, 2), "leaf.py": (1.0, 0)}
+    PipelineScheduler(units, {}, document_module, visited, max_workers=1, priorities=priorities).run()
+
+    assert started == ["helper.py", "other.py", "leaf.py", "script.py"]
+
+def test_pipeline_scheduler_limits_running_units():
+    visited = SummaryStore()
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def document_module(node):
+        with lock:
+            running.append(node)
+            peak.append(len(running))
+        threading.Event().wait(0.01)
+        with lock:
+            running.remove(node)
+
+    PipelineScheduler([f"{i}.py" for i in range(8)], {}, document_module, visited, max_workers=3).run()
+
+    assert max(peak) <= 3
@@ -0,0 +1,71 @@
+import networkx as nx
+import pytest
+import threading
+
+from unittest.mock import patch
+
+from docgen.exceptions import ShardTimeoutError
+from docgen.pydantic_models import ModuleDocstring
+from docgen.shards import merge_results, partition_modules, run_shard
+from docgen.store import DirectoryResultStore, SQLiteResultStore
+
+
+def make_package(write_package):
+    paths = write_package("shardpkg", {
+        "base.py": "def base():\n\treturn 1\n",
+        "left.py": "from shardpkg.base import base\n\ndef left():\n\treturn base()\n",
+        "right.py": "from shardpkg.base import base\n\ndef right():\n\treturn base() + 1\n",
+    })
+    base, left, right = paths["base.py"], paths["left.py"], paths["right.py"]
+    G = nx.DiGraph([(str(base), str(left)), (str(base), str(right))])
+    return base, left, right, G
+
+def test_partition_modules_balances_cost_and_keeps_cycles_together():
+    G = nx.DiGraph([("a", "b"), ("b", "a"), ("a", "c"), ("c", "d")])
+    costs = {"a": 5, "b": 5, "c": 6, "d": 3}
+
+    shards = partition_modules(G, 2, costs)
+
+    assert shards == [["a", "b"], ["c", "d"]]
+    assert partition_modules(G, 2, costs) == shards
+
+def test_partition_modules_orders_each_shard_by_dependency():
+    G = nx.DiGraph([("a", "b"), ("b", "c")])
+
+    assert partition_modules(G, 1, {"a": 1, "b": 1, "c": 1}) == [["a", "b", "c"]]
+
+@pytest.mark.parametrize("store_type", ["directory", "sqlite"])
+@patch("docgen.modules.generate_module_docstring")
+@patch("docgen.functions.generate_function_docstring")
+def test_shards_exchange_summaries_and_merge(mock_function, mock_module, store_type, tmp_path, fake_function_docstring, write_package):
+    mock_function.side_effect = fake_function_docstring
+    mock_module.return_value = ModuleDocstring(summary="A module")
+    base, left, right, G = make_package(write_package)
+    store = DirectoryResultStore(tmp_path / "store") if store_type == "directory" else SQLiteResultStore(tmp_path / "store.db")
+    shards = partition_modules(G, 2, {str(base): 1, str(left): 3, str(right): 2})
+    assert shards == [[str(left)], [str(base), str(right)]]
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(left=run_shard(G, "shardpkg", shards[0], store, poll_interval=0.01, timeout=10)))
+    thread.start()
+    results["right"] = run_shard(G, "shardpkg", shards[1], store)
+    thread.join()
+
+    assert results == {"left": ["shardpkg.left"], "right": ["shardpkg.base", "shardpkg.right"]}
+    left_call = [call for call in mock_function.call_args_list if call.args[0].startswith("def left")][0]
+    assert left_call.args[1] == [("base", "Summary of base")]
+    assert '"""Summary of left' not in left.read_text()
+
+    summaries = merge_results(G, "shardpkg", store)
+
+    assert list(summaries) == ["shardpkg.base.base", "shardpkg.left.left", "shardpkg.right.right"]
+    assert '"""Summary of left' in left.read_text()
+    assert '"""Summary of base' in base.read_text()
+    # a restarted worker does not document its modules again
+    assert run_shard(G, "shardpkg", shards[1], store) == []
+
+def test_run_shard_times_out_waiting_for_other_shards(tmp_path, write_package):
+    base, left, right, G = make_package(write_package)
+
+    with pytest.raises(ShardTimeoutError):
+        run_shard(G, "shardpkg", [str(left)], DirectoryResultStore(tmp_path / "store"), poll_interval=0.01, timeout=0.05)
@@ -0,0 +1,85 @@
+import ast
+import pytest
+import tracemalloc
+
+from docgen.modules import get_all_internal_functions, insert_function_docstrings
+from docgen.pydantic_models import FunctionDocstring
+from docgen.sources import SourceIndex, open_source
+
+
+def build_module(functions: int, lines: int) -> str:
+    body = "".join(f"    x{j} = bar(x{j - 1}, 'ünïcode {j}')\n" for j in range(1, lines))
+    return "".join(
+        f'def foo{i}(x0):\n    """Old docstring of foo{i}."""\n{body}    return x{lines - 1}\n\n'
+        for i in range(functions)
+    )
+
+
+def test_source_index_offsets():
+    index = SourceIndex('x = "é"\ny = 1\n')
+
+    assert list(index.lines) == [0, 9, 15]
+    assert index.offset(2, 4) == 13
+    assert index.line_offset(5) == len(index) == 15
+    assert index.get_line(1) == 'x = "é"'
+    node = ast.parse(index.view).body[0].value # type: ignore
+    assert index.text(index.offset(node.lineno, node.col_offset), index.offset(node.end_lineno, node.end_col_offset)) == '"é"'
+
+
+def test_splice_rejects_overlapping_edits():
+    index = SourceIndex("abcdef")
+
+    assert index.splice([(4, 5, "E"), (0, 1, "A")]) == "AbcdEf"
+    with pytest.raises(ValueError):
+        index.splice([(0, 3, "A"), (2, 4, "B")])
+
+
+def test_open_source(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text("def foo():\n    pass\n")
+    (tmp_path / "empty.py").write_text("")
+
+    with open_source(path) as index:
+        assert index.get_line(2) == "    pass"
+    with open_source(tmp_path / "empty.py") as index:
+        assert len(index) == 0
+
+
+def test_insert_function_docstrings_nested_and_methods():
+    source = (
+        'class A:\n    def foo(self):\n        """Old"""\n        def inner():\n            return 1\n        return inner\n'
+    )
+    docstrings = [
+        (function, FunctionDocstring(function_name=name, summary=f"New {name}.", description="Desc."))
+        for name, function in get_all_internal_functions(ast.parse(source))
+    ]
+
+    updated = insert_function_docstrings(source, docstrings)
+
+    tree = ast.parse(updated)
+    assert [ast.get_docstring(function) for _, function in get_all_internal_functions(tree)] == [
+        "New foo.\n\nDesc.", "New inner.\n\nDesc."
+    ]
+
+
+def test_insert_function_docstrings_peak_memory(tmp_path):
+    path = tmp_path / "huge.py"
+    path.write_text(build_module(2000, 30))
+    size = path.stat().st_size
+    assert size > 2_000_000
+
+    with open_source(path) as index:
+        docstrings = [
+            (function, FunctionDocstring(function_name=name, summary=f"New {name}.", description="Desc."))
+            for name, function in get_all_internal_functions(ast.parse(index.view))
+        ]
+        tracemalloc.start()
+        try:
+            updated = insert_function_docstrings(index, docstrings)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    # the rewritten module and its UTF-8 encoding, with nothing proportional to the number of functions on top
+    assert peak < 2.5 * size
+    assert updated.count('"""New foo') == 2000
@@ -0,0 +1,62 @@
+from docgen.llm import FUNCTION_DOCSTRING_TOOL, build_function_docstring_request, build_module_docstring_request
+from docgen.pydantic_models import FunctionDocstring
+from docgen.templates import (
+    render_function_prompt,
+    render_module_context,
+    render_module_prompt,
+    render_package_prompt,
+    render_repair_prompt,
+)
+
+
+def test_render_function_prompt_no_used_functions():
+    assert render_function_prompt("def foo():\n    pass", []) == '"""def foo():\n    pass\n\n"""'
+
+def test_render_function_prompt_used_functions():
+    prompt = render_function_prompt("def foo():\n    bar()", [("bar", "Summary of bar")])
+    expected = '"""def foo():\n    bar()\n\nThe following functions are used in the above code:\n\nbar:\n\tSummary of bar\n\n"""'
+    assert prompt == expected
+
+def test_render_module_prompt_if_name_main():
+    prompt = render_module_prompt("package.foo", [("package.foo.bar", "Summary of bar")], "main()")
+    expected = (
+        "The following functions are used in this module (package.foo):\n\n"
+        "Function: package.foo.bar, Summary: Summary of bar\n\n"
+        "The following code is in the if __name__ == '__main__' block:\n\nmain()\n\n"
+    )
+    assert prompt == expected
+
+def test_render_module_prompt_no_if_name_main():
+    prompt = render_module_prompt("package.foo", [], None)
+    assert prompt.endswith("This module does not have a if __name__ == '__main__' block.\n\n")
+
+def test_render_module_context_no_used_functions():
+    context = render_module_context("package.foo", [])
+    assert context == "The following code is from the module package.foo.\n\nThe module does not use any functions from other modules in the package.\n"
+
+def test_function_tool_schema_built_once():
+    first = build_function_docstring_request("def foo():\n    pass", [])
+    second = build_function_docstring_request("def bar():\n    pass", [])
+
+    assert first["tools"] is second["tools"] is FUNCTION_DOCSTRING_TOOL["tools"]
+    assert first["tools"][0]["function"]["parameters"] == FunctionDocstring.model_json_schema()
+
+def test_module_request_uses_module_tool():
+    request = build_module_docstring_request("package.foo", [], None)
+    assert request["tool_choice"] == {"type": "function", "function": {"name": "ModuleDocstring"}}
+
+def test_render_repair_prompt():
+    prompt = render_repair_prompt('{"summary": 1}', ["'summary' must be a string", "'description' is required"])
+
+    assert prompt == (
+        'The following output is invalid:\n\n{"summary": 1}\n\n'
+        "The problems are:\n\n- 'summary' must be a string\n- 'description' is required\n"
+    )
+
+def test_render_package_prompt():
+    items = [("pkg.a", "Module a."), ("pkg.sub", "Subpackage.")]
+
+    assert render_package_prompt("pkg", items) == (
+        "The following modules and subpackages are in the package (pkg):\n\npkg.a: Module a.\n\npkg.sub: Subpackage.\n\n"
+    )
+    assert render_package_prompt("pkg", items[:1], (2, 3)).startswith("The following modules and subpackages are part 2 of 3")
@@ -0,0 +1,117 @@
+import json
+import openai
+import pytest
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from docgen import llm
+from docgen.llm import FUNCTION_DOCSTRING_TOOL, build_request_with_tool, configure_client, send_request
+from docgen.transport import ClientOptions, PoolStats, build_http_client
+
+TOOL_ARGUMENTS = json.dumps({"function_name": "f", "summary": "Summary.", "description": "Description."})
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """A stand-in for the chat completions endpoint, answering every request with the same tool call."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay) # type: ignore
+        body = json.dumps({
+            "id": "1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{"id": "call", "type": "function", "function": {"name": "FunctionDocstring", "arguments": TOOL_ARGUMENTS}}],
+                },
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+    httpd.delay = 0.0 # type: ignore
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def stats(server, monkeypatch):
+    stats = PoolStats()
+    monkeypatch.setattr(llm, "pool_stats", stats)
+    yield stats
+    # configure_client closed the previous client, so the default one is rebuilt, recording into the global stats
+    monkeypatch.undo()
+    llm.client.close()
+    llm.client = llm.build_client(ClientOptions())
+
+
+def get_base_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_client_options_build_timeout():
+    timeout = ClientOptions(timeout=30.0, connect_timeout=2.0).build_timeout()
+
+    assert (timeout.read, timeout.connect, timeout.pool) == (30.0, 2.0, 30.0)
+    assert ClientOptions(pool_timeout=1.0).build_timeout().pool == 1.0
+
+
+def test_http2_falls_back_without_h2(monkeypatch, caplog):
+    monkeypatch.setattr("docgen.transport.h2", None)
+
+    with build_http_client(ClientOptions(http2=True), PoolStats()):
+        pass
+
+    assert "falling back to HTTP/1.1" in caplog.text
+
+
+def test_send_request_reuses_pooled_connections(server, stats):
+    configure_client(ClientOptions(base_url=get_base_url(server), max_connections=2, max_keepalive_connections=2))
+    request = build_request_with_tool("system", "user", FUNCTION_DOCSTRING_TOOL)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: send_request(request), range(12)))
+
+    assert results == [TOOL_ARGUMENTS] * 12
+    assert stats.requests == 12
+    assert 1 <= stats.connections_opened <= 2
+    assert stats.reused >= 10
+    assert stats.peak_in_flight <= 2
+    assert stats.in_flight == 0
+    assert "12 requests" in str(stats)
+
+
+def test_send_request_times_out(server, stats):
+    server.delay = 1.0
+    configure_client(ClientOptions(base_url=get_base_url(server), timeout=0.1, max_retries=0))
+    request = build_request_with_tool("system", "user", FUNCTION_DOCSTRING_TOOL)
+
+    with pytest.raises(openai.APITimeoutError):
+        send_request(request)
+    assert stats.in_flight == 0
@@ -0,0 +1,125 @@
+import ast
+import pytest
+
+from docgen.pydantic_models import FunctionDocstring, ModuleDocstring
+from docgen.validation import (
+    CompiledSchema,
+    check_function_docstring,
+    coerce,
+    extract_json,
+    get_item_name,
+    validate_tool_output,
+)
+
+FUNCTION_SCHEMA = CompiledSchema(FunctionDocstring)
+MODULE_SCHEMA = CompiledSchema(ModuleDocstring)
+
+
+def test_compiled_schema_fields():
+    assert FUNCTION_SCHEMA.fields["summary"].required
+    assert FUNCTION_SCHEMA.fields["summary"].kind == "string"
+    assert not FUNCTION_SCHEMA.fields["parameters"].required
+    assert FUNCTION_SCHEMA.fields["parameters"].kind == "array"
+
+def test_validate_fills_missing_optional_fields_and_drops_unknown_keys():
+    data, errors = validate_tool_output('{"function_name": "foo", "summary": "s", "description": "d", "extra": 1}', FUNCTION_SCHEMA)
+
+    assert errors == []
+    assert data == {
+        "function_name": "foo", "summary": "s", "description": "d", "parameters": None, "returns": None,
+        "raises": None, "example": None, "yields": None
+    }
+    assert FUNCTION_SCHEMA.build(data) == FunctionDocstring(function_name="foo", summary="s", description="d")
+
+@pytest.mark.parametrize("args", [
+    '```json\n{"summary": "s"}\n```',
+    'Here is the docstring: {"summary": "s"} Hope this helps!',
+    '[{"summary": "s"}]',
+    '{"ModuleDocstring": {"summary": "s"}}',
+    '{"properties": {"summary": "s"}}',
+])
+def test_validate_removes_stray_wrapping(args):
+    assert validate_tool_output(args, MODULE_SCHEMA) == ({"summary": "s", "additional_info": None, "usage": None}, [])
+
+def test_validate_coerces_values():
+    data, errors = validate_tool_output(
+            '{"function_name": "foo", "summary": ["a", "b"], "description": "d", "parameters": "x: an int", "returns": 1}',
+            FUNCTION_SCHEMA
+    )
+
+    assert errors == []
+    assert data["summary"] == "a\nb"
+    assert data["parameters"] == ["x: an int"]
+    assert data["returns"] == "1"
+
+def test_coerce_rejects_objects():
+    assert coerce({"a": 1}, "string") is None
+    assert coerce([{"a": 1}], "array") is None
+
+def test_validate_uses_defaults_and_base():
+    data, errors = validate_tool_output('{"description": "d"}', FUNCTION_SCHEMA, {"function_name": "foo"}, {"summary": "s"})
+
+    assert errors == []
+    assert (data["function_name"], data["summary"], data["description"]) == ("foo", "s", "d")
+
+def test_validate_reports_unfixable_problems():
+    assert validate_tool_output('{"summary": "s"', MODULE_SCHEMA)[0] is None
+    assert validate_tool_output('"just a string"', MODULE_SCHEMA) == (None, ["The output must be a JSON object"])
+    data, errors = validate_tool_output('{"function_name": "foo", "summary": {"a": 1}}', FUNCTION_SCHEMA)
+    assert errors == ["'summary' must be a string", "'description' is required"]
+
+def test_extract_json_raises_without_object():
+    with pytest.raises(ValueError):
+        extract_json("no json here")
+
+
+def parse_function(code: str) -> ast.FunctionDef:
+    return ast.parse(code).body[0] # type: ignore
+
+def make_docstring(**fields) -> FunctionDocstring:
+    return FunctionDocstring(function_name="foo", summary="s", description="d", **fields)
+
+def test_get_item_name():
+    assert get_item_name("x (int): the value") == "x"
+    assert get_item_name("*args: extra values") == "args"
+    assert get_item_name("`y` - the other value") == "y"
+    assert get_item_name("errors.ParseError: if it fails") == "ParseError"
+
+def test_check_function_docstring_accepts_matching_docstring():
+    function = parse_function(
+        "def foo(self, x, *args, key=None):\n\tif x < 0:\n\t\traise ValueError('negative')\n\tfor a in args:\n\t\tyield a\n"
+    )
+    docstring = make_docstring(
+        parameters=["x (int): the value", "*args: the values", "key: a key"],
+        raises=["ValueError: if x is negative"],
+        yields="each value",
+    )
+
+    assert check_function_docstring(function, docstring) == []
+
+def test_check_function_docstring_parameters():
+    function = parse_function("def foo(x, y):\n\treturn x + y\n")
+
+    problems = check_function_docstring(function, make_docstring(parameters=["x: the value", "z: not a parameter"]))
+
+    assert problems == ["'parameters' documents ['z'], which are not parameters of foo", "'parameters' must document ['y']"]
+
+def test_check_function_docstring_raises():
+    raising = parse_function("def foo():\n\ttry:\n\t\tpass\n\texcept KeyError:\n\t\traise\n\traise errors.ParseError\n")
+    assert check_function_docstring(raising, make_docstring()) == ["'raises' must document ['ParseError']"]
+
+    # an exception documented without a raise statement may come from a called function
+    calling = parse_function("def foo():\n\treturn bar()\n")
+    assert check_function_docstring(calling, make_docstring(raises=["KeyError: from bar"])) == []
+    leaf = parse_function("def foo():\n\treturn 1\n")
+    assert check_function_docstring(leaf, make_docstring(raises=["KeyError: never"])) == [
+        "'raises' documents ['KeyError'], which foo never raises"
+    ]
+
+def test_check_function_docstring_yields_only_for_generators():
+    function = parse_function("def foo():\n\tdef inner():\n\t\tyield 1\n\treturn inner\n")
+
+    assert check_function_docstring(function, make_docstring(yields="1")) == ["'yields' must be empty, as foo is not a generator"]
+    assert check_function_docstring(parse_function("def foo():\n\tyield 1\n"), make_docstring()) == [
+        "'yields' must describe what foo yields"
+    ]